@@ -0,0 +1,413 @@
+"""
+Cross-Framework Inference Benchmark
+
+Run the same 28x28 grayscale classifier in its three forms on the same
+feature batches from the dataset and compare them:
+
+  torch: SimpleCNN weights (best_model.pth, or a pruned model exported by
+         compress.py)
+  keras: create_model() from the TF notebooks (best_model.h5 if present,
+         otherwise random weights, which are timed but not compared)
+  eim:   the Edge Impulse model used in deployement/ (one classify() call per
+         sample, the runner is a separate process)
+
+Every backend and thread count runs in a fresh process, so thread settings
+take effect (TensorFlow fixes them at start-up) and peak RSS is per backend.
+Batch sizes are swept within each process. Reported are batch latency
+percentiles, per-sample latency, throughput, peak RSS, top-1 accuracy on the
+benchmark samples and pairwise top-1 agreement between backends. Backends
+whose framework or model file is missing are skipped.
+
+All backends receive the normalized features of the notebooks
+((x / 255 - 0.5) / 0.5, as uploaded to Edge Impulse) and their outputs are
+reordered to the sorted class folder names.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+# Dataset location
+DATASET_PATH = "Datasets/electronic-components-png"
+
+# resolution of images
+TARGET_WIDTH = 28
+TARGET_HEIGHT = 28
+
+GRAY_MEAN = 0.5
+GRAY_STD = 0.5
+
+BACKENDS = ('torch', 'keras', 'eim')
+
+# Default model files
+TORCH_MODEL = "best_model.pth"
+KERAS_WEIGHTS = "best_model.h5"
+EIM_MODEL = os.path.join("..", "deployement", "electronic-component-dnn", "modefied.eim")
+
+# ITU-R 601-2 luma weights, as in simple_cnn.decode_image()
+_GRAY_WEIGHTS = np.array([0.2989, 0.587, 0.114], dtype=np.float32)
+
+# Exit status of a worker whose backend is not available
+SKIPPED = 3
+
+
+class BackendUnavailable(Exception):
+    pass
+
+
+def load_features(path, samples):
+    """
+    Decode an evenly spaced subset of the dataset (same preprocessing as
+    simple_cnn.decode_image, without needing torch)
+
+    Returns:
+        (features float32 (N, 28, 28), labels int64 (N,), sorted class names)
+    """
+    class_names = sorted(d for d in os.listdir(path) if os.path.isdir(os.path.join(path, d)))
+    files = []
+    for class_id, label in enumerate(class_names):
+        class_dir = os.path.join(path, label)
+        files.extend((os.path.join(class_dir, f), class_id) for f in sorted(os.listdir(class_dir))
+                     if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+    if samples and samples < len(files):
+        picks = np.linspace(0, len(files) - 1, samples).round().astype(int)
+        files = [files[i] for i in picks]
+
+    features = np.empty((len(files), TARGET_HEIGHT, TARGET_WIDTH), dtype=np.float32)
+    for i, (img_path, _) in enumerate(files):
+        image = Image.open(img_path).convert('RGB').resize((TARGET_WIDTH, TARGET_HEIGHT),
+                                                          Image.BILINEAR)
+        gray = (np.asarray(image, dtype=np.float32) / 255.0) @ _GRAY_WEIGHTS
+        features[i] = (gray - GRAY_MEAN) / GRAY_STD
+    labels = np.array([class_id for _, class_id in files], dtype=np.int64)
+    return features, labels, class_names
+
+
+class TorchBackend:
+    def __init__(self, model_path, class_names, threads):
+        """SimpleCNN (or a model exported by compress.py) on CPU"""
+        try:
+            import torch
+        except ImportError as e:
+            raise BackendUnavailable(f"torch not installed ({e})")
+        if not os.path.exists(model_path):
+            raise BackendUnavailable(f"{model_path} not found")
+        from simple_cnn import SimpleCNN
+        from compress import load_pruned_model
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.torch = torch
+        checkpoint = torch.load(model_path)
+        if isinstance(checkpoint, dict) and 'config' in checkpoint:
+            self.model = load_pruned_model(model_path)
+        else:
+            self.model = SimpleCNN(in_channels=1, num_classes=len(class_names))
+            self.model.load_state_dict(checkpoint)
+        self.model.eval()
+        self.trained = True
+        self.threads = torch.get_num_threads()
+
+    def predict(self, batch):
+        with self.torch.inference_mode():
+            logits = self.model(self.torch.from_numpy(batch[:, None]))
+            return self.torch.softmax(logits, dim=1).numpy()
+
+
+def create_model(input_shape=(28, 28, 1), num_classes=5):
+    """The model of Image-classifier-with-tf.ipynb"""
+    from tensorflow import keras
+    from tensorflow.keras import layers
+
+    return keras.Sequential([
+        layers.Conv2D(32, kernel_size=3, padding='same', activation='relu', input_shape=input_shape),
+        layers.BatchNormalization(),
+        layers.MaxPooling2D(pool_size=2),
+        layers.Dropout(0.4),
+
+        layers.Flatten(),
+        layers.Dense(128, activation='relu'),
+        layers.Dropout(0.4),
+        layers.Dense(num_classes, activation='softmax')
+    ])
+
+
+class KerasBackend:
+    def __init__(self, weights_path, class_names, threads, dataset_path):
+        """create_model() with the notebook's weights, if available"""
+        if threads:
+            # Must be set before TensorFlow initializes
+            os.environ['TF_NUM_INTRAOP_THREADS'] = str(threads)
+            os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+        os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+        try:
+            import tensorflow as tf
+        except ImportError as e:
+            raise BackendUnavailable(f"tensorflow not installed ({e})")
+        if threads:
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        from tf_input import load_dataset
+
+        self.tf = tf
+        self.model = create_model(num_classes=len(class_names))
+        self.trained = os.path.exists(weights_path)
+        if self.trained:
+            self.model.load_weights(weights_path)
+
+        # The notebooks number classes in os.walk order, not sorted
+        _, keras_names, _ = load_dataset(dataset_path)
+        self.order = [keras_names.index(name) for name in class_names]
+        self.infer = tf.function(lambda x: self.model(x, training=False), reduce_retracing=True)
+        self.threads = threads or tf.config.threading.get_intra_op_parallelism_threads()
+
+    def predict(self, batch):
+        probs = self.infer(self.tf.constant(batch[..., None])).numpy()
+        return probs[:, self.order]
+
+
+class EimBackend:
+    def __init__(self, model_path, class_names):
+        """Edge Impulse runner, one classify() per sample"""
+        try:
+            from edge_impulse_linux.runner import ImpulseRunner
+        except ImportError as e:
+            raise BackendUnavailable(f"edge_impulse_linux not installed ({e})")
+        if not os.path.exists(model_path):
+            raise BackendUnavailable(f"{model_path} not found")
+
+        self.runner = ImpulseRunner(model_path)
+        model_info = self.runner.init()
+        self.labels = list(model_info['model_parameters']['labels'])
+        missing = set(class_names) - set(self.labels)
+        if missing:
+            self.runner.stop()
+            raise BackendUnavailable(f"model labels {self.labels} lack {sorted(missing)}")
+        self.class_names = class_names
+        self.trained = True
+        self.threads = None
+
+    def predict(self, batch):
+        probs = np.empty((len(batch), len(self.class_names)), dtype=np.float32)
+        for i, features in enumerate(batch.reshape(len(batch), -1)):
+            predictions = self.runner.classify(features.tolist())['result']['classification']
+            probs[i] = [predictions[name] for name in self.class_names]
+        return probs
+
+    def child_peak_rss_mb(self):
+        """Peak RSS of the runner process (VmHWM), if it can be found"""
+        process = getattr(self.runner, '_runner', None)
+        try:
+            with open(f"/proc/{process.pid}/status") as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        return int(line.split()[1]) / 1024.0
+        except (AttributeError, OSError, ValueError):
+            pass
+        return None
+
+    def stop(self):
+        self.runner.stop()
+
+
+def percentiles(times_ms):
+    times = np.array(times_ms)
+    return {f'p{p}': float(np.percentile(times, p)) for p in (50, 90, 95, 99)}
+
+
+def run_worker(args):
+    """Benchmark one backend and thread count; print the result as JSON"""
+    data = np.load(args.features)
+    features, class_names = data['features'], list(data['class_names'])
+    rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+    try:
+        t_start = time.perf_counter()
+        if args.worker == 'torch':
+            backend = TorchBackend(args.torch_model, class_names, args.threads)
+        elif args.worker == 'keras':
+            backend = KerasBackend(args.keras_weights, class_names, args.threads, args.dataset)
+        else:
+            backend = EimBackend(args.eim_model, class_names)
+        load_s = time.perf_counter() - t_start
+    except BackendUnavailable as e:
+        print(json.dumps({'backend': args.worker, 'skipped': str(e)}))
+        sys.exit(SKIPPED)
+
+    try:
+        # Top-1 predictions of every sample, in order
+        chunk = max(args.batch_sizes)
+        predictions = np.concatenate([backend.predict(features[i:i + chunk]).argmax(axis=1)
+                                      for i in range(0, len(features), chunk)])
+
+        sweeps = []
+        for batch_size in args.batch_sizes:
+            starts = range(0, max(len(features) - batch_size, 0) + 1, batch_size)
+            batches = [features[s:s + batch_size] for s in starts]
+            for i in range(args.warmup):
+                backend.predict(batches[i % len(batches)])
+            times = []
+            for i in range(args.runs):
+                batch = batches[i % len(batches)]
+                t0 = time.perf_counter()
+                backend.predict(batch)
+                times.append((time.perf_counter() - t0) * 1000.0)
+            batch_ms = percentiles(times)
+            sweeps.append({
+                'batch_size': len(batches[0]),
+                'batch_latency_ms': batch_ms,
+                'sample_latency_p50_ms': batch_ms['p50'] / len(batches[0]),
+                'throughput_per_s': len(batches[0]) * len(times) / (sum(times) / 1000.0),
+            })
+
+        result = {
+            'backend': args.worker,
+            'threads': backend.threads,
+            'trained': backend.trained,
+            'load_s': load_s,
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+            'start_rss_mb': rss_start,
+            'sweeps': sweeps,
+            'predictions': predictions.tolist(),
+        }
+        if isinstance(backend, EimBackend):
+            result['runner_peak_rss_mb'] = backend.child_peak_rss_mb()
+    finally:
+        if isinstance(backend, EimBackend):
+            backend.stop()
+    print(json.dumps(result))
+
+
+def run_backend(args, backend, threads, features_path):
+    """Start a worker process; returns its result dict"""
+    command = [sys.executable, os.path.realpath(__file__), '--worker', backend,
+               '--features', features_path, '--dataset', args.dataset,
+               '--torch-model', args.torch_model, '--keras-weights', args.keras_weights,
+               '--eim-model', args.eim_model, '--runs', str(args.runs),
+               '--warmup', str(args.warmup), '--batch-sizes', *map(str, args.batch_sizes)]
+    if threads:
+        command += ['--threads', str(threads)]
+    out = subprocess.run(command, capture_output=True, text=True)
+    lines = out.stdout.strip().splitlines()
+    if out.returncode not in (0, SKIPPED) or not lines:
+        return {'backend': backend, 'threads': threads, 'error': out.stderr.strip()[-2000:]}
+    return json.loads(lines[-1])
+
+
+def agreement(results, labels):
+    """Top-1 accuracy per backend and pairwise top-1 agreement"""
+    predictions = {}
+    for r in results:
+        if 'predictions' in r and r['backend'] not in predictions:
+            predictions[r['backend']] = np.array(r['predictions'])
+    accuracy = {name: float((p == labels).mean()) for name, p in predictions.items()}
+    pairs = {}
+    names = list(predictions)
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            pairs[f"{a}/{b}"] = float((predictions[a] == predictions[b]).mean())
+    return accuracy, pairs
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Cross-framework inference benchmark")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS,
+                        help="Backends to benchmark (default: all)")
+    parser.add_argument("--dataset", type=str, default=DATASET_PATH,
+                        help=f"Dataset folder (default: {DATASET_PATH})")
+    parser.add_argument("--samples", type=int, default=512,
+                        help="Benchmark samples taken from the dataset (default: 512)")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32, 128],
+                        help="Batch sizes to sweep (default: 1 8 32 128)")
+    parser.add_argument("--threads", nargs="+", type=int, default=[1, 2, 4],
+                        help="Thread counts to sweep for torch and keras (default: 1 2 4)")
+    parser.add_argument("--runs", type=int, default=50,
+                        help="Timed calls per batch size (default: 50)")
+    parser.add_argument("--warmup", type=int, default=5,
+                        help="Untimed calls per batch size (default: 5)")
+    parser.add_argument("--torch-model", type=str, default=TORCH_MODEL,
+                        help=f"SimpleCNN weights (default: {TORCH_MODEL})")
+    parser.add_argument("--keras-weights", type=str, default=KERAS_WEIGHTS,
+                        help=f"Keras weights (default: {KERAS_WEIGHTS})")
+    parser.add_argument("--eim-model", type=str, default=EIM_MODEL,
+                        help=f"Edge Impulse model (default: {EIM_MODEL})")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Write the results to this JSON file")
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--features", type=str, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    """Main application entry point"""
+    args = parse_arguments()
+    if args.worker:
+        args.threads = args.threads[0] if args.threads else None
+        run_worker(args)
+        return
+
+    features, labels, class_names = load_features(args.dataset, args.samples)
+    print(f"{len(features)} samples, {len(class_names)} classes, "
+          f"batch sizes {args.batch_sizes}, threads {args.threads}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        features_path = os.path.join(tmp, "features.npz")
+        np.savez(features_path, features=features, class_names=np.array(class_names))
+        for backend in args.backends:
+            # The Edge Impulse runner manages its own threads
+            for threads in ([None] if backend == 'eim' else args.threads):
+                result = run_backend(args, backend, threads, features_path)
+                results.append(result)
+                if 'skipped' in result:
+                    print(f"{backend:<6} skipped: {result['skipped']}")
+                    break
+                if 'error' in result:
+                    print(f"{backend:<6} threads {threads} failed:\n{result['error']}")
+                    continue
+                for s in result['sweeps']:
+                    lat = s['batch_latency_ms']
+                    print(f"{backend:<6} threads {str(result['threads']):>4} batch {s['batch_size']:>4}: "
+                          f"p50 {lat['p50']:8.3f} ms | p95 {lat['p95']:8.3f} ms | "
+                          f"p99 {lat['p99']:8.3f} ms | {s['throughput_per_s']:9.0f} samples/s | "
+                          f"peak RSS {result['peak_rss_mb']:6.0f} MB")
+
+    accuracy, pairs = agreement([r for r in results if r.get('trained')], labels)
+    print("\nTop-1 accuracy on the benchmark samples:")
+    for name, acc in accuracy.items():
+        print(f"  {name:<12} {acc:.4f}")
+    for name in dict.fromkeys(r['backend'] for r in results if r.get('trained') is False):
+        print(f"  {name:<12} random weights, not compared")
+    if pairs:
+        print("Top-1 agreement:")
+        for pair, value in pairs.items():
+            print(f"  {pair:<12} {value:.4f}")
+
+    if args.output:
+        report = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'platform': {'machine': platform.machine(), 'python': platform.python_version(),
+                         'processor': platform.processor(), 'cpus': os.cpu_count()},
+            'samples': len(features),
+            'class_names': class_names,
+            'results': [{k: v for k, v in r.items() if k != 'predictions'} for r in results],
+            'accuracy': accuracy,
+            'agreement': pairs,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
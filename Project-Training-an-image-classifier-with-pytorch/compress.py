@@ -0,0 +1,265 @@
+"""
+Structured Pruning and Latency-Aware Model Search
+
+Shrink the trained SimpleCNN (best_model.pth) for faster CPU inference. Each
+candidate keeps the most important conv1 channels (L1 norm of the filter
+scaled by its batch norm gain) and the most important fc1 neurons (norm of
+incoming and outgoing weights). Pruning conv1 also removes the matching
+14x14 input blocks of fc1, which holds most of the parameters.
+
+Every candidate is fine-tuned, batch norm is folded into conv1 and the real
+single-image CPU latency is measured. The Pareto frontier of validation
+accuracy versus latency and size is printed and saved, and the fastest
+frontier model within --max-acc-drop of the unpruned validation accuracy is
+exported. The test split is only used to report the accuracy of the exported
+model, so it plays no part in the selection.
+
+With the bundled dataset the validation split holds about 50 images, so one
+image moves validation accuracy by 0.02, the default --max-acc-drop. The
+margin is noisy at this size: a model chosen within it can still score
+several points lower on the test split than the unpruned one (0.88 against
+0.96 in one run). Check the reported test accuracy before deploying the
+export.
+"""
+
+import argparse
+import copy
+import csv
+import itertools
+import time
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+import torch.optim as optim
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+from dedup import read_groups
+from simple_cnn import SimpleCNN, DATASET_PATH, load_dataset, split_indices
+
+# Candidate widths (the trained model has 32 channels and 128 hidden neurons)
+CHANNELS = [32, 24, 16, 12, 8, 4]
+HIDDEN = [128, 64, 32, 16]
+
+
+def prune(model, channels, hidden):
+    """
+    Structured pruning of a trained SimpleCNN
+
+    Args:
+        model: Trained SimpleCNN
+        channels: conv1 output channels to keep
+        hidden: fc1 neurons to keep
+
+    Returns:
+        New, smaller SimpleCNN initialized from the kept weights
+    """
+    conv, bn, fc1, fc2 = model.conv1, model.bn1, model.fc1, model.fc2
+    pooled = fc1.in_features // conv.out_channels  # 14 * 14 inputs per channel
+
+    # Channel importance: filter L1 norm scaled by the batch norm gain
+    channel_score = conv.weight.detach().abs().sum(dim=(1, 2, 3)) * bn.weight.detach().abs()
+    keep_c = channel_score.argsort(descending=True)[:channels].sort().values
+
+    # fc1 columns are laid out channel by channel (x.view(-1, C * 14 * 14))
+    fc1_weight = fc1.weight.detach().view(fc1.out_features, conv.out_channels, pooled)
+    fc1_weight = fc1_weight[:, keep_c]
+
+    # Neuron importance: incoming (after channel pruning) times outgoing weights
+    neuron_score = fc1_weight.flatten(1).norm(dim=1) * fc2.weight.detach().norm(dim=0)
+    keep_h = neuron_score.argsort(descending=True)[:hidden].sort().values
+
+    pruned = SimpleCNN(in_channels=conv.in_channels, num_classes=fc2.out_features,
+                       dropout=model.dropout.p, channels=channels, hidden=hidden)
+    with torch.no_grad():
+        pruned.conv1.weight.copy_(conv.weight[keep_c])
+        pruned.conv1.bias.copy_(conv.bias[keep_c])
+        for name in ('weight', 'bias', 'running_mean', 'running_var'):
+            getattr(pruned.bn1, name).copy_(getattr(bn, name)[keep_c])
+        pruned.fc1.weight.copy_(fc1_weight[keep_h].flatten(1))
+        pruned.fc1.bias.copy_(fc1.bias[keep_h])
+        pruned.fc2.weight.copy_(fc2.weight[:, keep_h])
+        pruned.fc2.bias.copy_(fc2.bias)
+    return pruned
+
+
+def fine_tune(model, images, labels, indices, epochs, lr=0.0005, batch_size=32, seed=0):
+    """Train `model` for a few epochs on the samples at `indices`"""
+    generator = torch.Generator().manual_seed(seed)
+    optimizer = optim.Adam(model.parameters(), lr=lr)
+    for _ in range(epochs):
+        model.train()
+        order = indices[torch.randperm(len(indices), generator=generator)]
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            optimizer.zero_grad()
+            F.cross_entropy(model(images[batch]), labels[batch]).backward()
+            optimizer.step()
+    return model
+
+
+def accuracy(model, images, labels, indices):
+    model.eval()
+    with torch.no_grad():
+        preds = model(images[indices])
+    return preds.argmax(dim=1).eq(labels[indices]).float().mean().item()
+
+
+def fold_batch_norm(model):
+    """Copy of `model` in eval mode with bn1 folded into conv1"""
+    fused = copy.deepcopy(model).eval()
+    fused.conv1 = fuse_conv_bn_eval(fused.conv1, fused.bn1)
+    fused.bn1 = nn.Identity()
+    return fused
+
+
+def load_pruned_model(path):
+    """Load a model exported by this script, ready for inference"""
+    checkpoint = torch.load(path)
+    config = checkpoint['config']
+    model = SimpleCNN(in_channels=1, num_classes=config['num_classes'],
+                      channels=config['channels'], hidden=config['hidden'])
+    if config.get('batch_norm_folded'):
+        model.bn1 = nn.Identity()
+    model.load_state_dict(checkpoint['state_dict'])
+    return model.eval()
+
+
+def measure_latency(model, runs=200, warmup=20, batch_size=1):
+    """Median CPU latency in ms of one forward pass"""
+    x = torch.randn(batch_size, model.conv1.in_channels, 28, 28)
+    times = []
+    with torch.inference_mode():
+        for _ in range(warmup):
+            model(x)
+        for _ in range(runs):
+            t_start = time.perf_counter()
+            model(x)
+            times.append(time.perf_counter() - t_start)
+    times.sort()
+    return times[len(times) // 2] * 1000.0
+
+
+def model_size(model):
+    """(parameter count, size in bytes as float32)"""
+    params = sum(p.numel() for p in model.parameters())
+    return params, params * 4
+
+
+def pareto_front(rows, cost):
+    """Rows not dominated in (higher validation accuracy, lower `cost`)"""
+    front = []
+    for r in rows:
+        dominated = any(o['val_acc'] >= r['val_acc'] and o[cost] <= r[cost]
+                        and (o['val_acc'] > r['val_acc'] or o[cost] < r[cost])
+                        for o in rows)
+        if not dominated:
+            front.append(r)
+    return sorted(front, key=lambda r: r[cost])
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="SimpleCNN pruning and latency search")
+    parser.add_argument("--model", type=str, default="best_model.pth",
+                        help="Trained SimpleCNN weights (default: best_model.pth)")
+    parser.add_argument("--dataset", type=str, default=DATASET_PATH,
+                        help=f"Dataset folder (default: {DATASET_PATH})")
+    parser.add_argument("--epochs", type=int, default=5,
+                        help="Fine-tuning epochs per candidate (default: 5)")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Torch threads for latency measurement (default: 1)")
+    parser.add_argument("--runs", type=int, default=200,
+                        help="Timed forward passes per candidate (default: 200)")
+    parser.add_argument("--max-acc-drop", type=float, default=0.02,
+                        help="Allowed validation accuracy drop for the export (default: 0.02)")
+    parser.add_argument("--output", type=str, default="pruning_results.csv",
+                        help="Results table (default: pruning_results.csv)")
+    parser.add_argument("--export", type=str, default="pruned_model.pth",
+                        help="Chosen model (default: pruned_model.pth)")
+    parser.add_argument("--groups", type=str, default=None,
+                        help="Near-duplicate groups from dedup.py, kept within one split")
+    return parser.parse_args()
+
+
+def main():
+    """Main application entry point"""
+    args = parse_arguments()
+    torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+
+    images, labels, class_names = load_dataset(args.dataset)
+    groups = read_groups(args.groups, args.dataset) if args.groups else None
+    train_idx, val_idx, test_idx = split_indices(len(labels), groups=groups)
+    base = SimpleCNN(in_channels=1, num_classes=len(class_names))
+    base.load_state_dict(torch.load(args.model))
+    base.eval()
+
+    rows = []
+    models = {}
+    for channels, hidden in itertools.product(CHANNELS, HIDDEN):
+        pruned_acc = None
+        if (channels, hidden) == (32, 128):
+            model = copy.deepcopy(base)
+        else:
+            model = prune(base, channels, hidden)
+            pruned_acc = accuracy(model, images, labels, val_idx)
+            fine_tune(model, images, labels, train_idx, args.epochs)
+        fused = fold_batch_norm(model)
+        params, size = model_size(fused)
+        row = {
+            'channels': channels,
+            'hidden': hidden,
+            'params': params,
+            'size_kb': size / 1024,
+            'latency_ms': measure_latency(fused, runs=args.runs),
+            'val_acc': accuracy(fused, images, labels, val_idx),
+            'pruned_acc': pruned_acc,
+        }
+        rows.append(row)
+        models[(channels, hidden)] = fused
+        print(f"channels {channels:>2} hidden {hidden:>3}: {params:>7} params | "
+              f"{row['latency_ms']:.3f} ms | val {row['val_acc']:.4f}")
+
+    baseline = next(r for r in rows if (r['channels'], r['hidden']) == (32, 128))
+    front = pareto_front(rows, 'latency_ms')
+    front_keys = {(r['channels'], r['hidden']) for r in front}
+    size_keys = {(r['channels'], r['hidden']) for r in pareto_front(rows, 'params')}
+    for r in rows:
+        r['pareto_latency'] = (r['channels'], r['hidden']) in front_keys
+        r['pareto_size'] = (r['channels'], r['hidden']) in size_keys
+
+    print("\nPareto frontier (validation accuracy vs latency):")
+    print(f"{'channels':>8} {'hidden':>6} {'params':>8} {'size_kb':>8} {'latency_ms':>10} {'val_acc':>8}")
+    for r in front:
+        print(f"{r['channels']:>8} {r['hidden']:>6} {r['params']:>8} {r['size_kb']:>8.1f} "
+              f"{r['latency_ms']:>10.3f} {r['val_acc']:>8.4f}")
+
+    fields = ['channels', 'hidden', 'params', 'size_kb', 'latency_ms', 'pruned_acc',
+              'val_acc', 'pareto_latency', 'pareto_size']
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"\nResults saved to {args.output}")
+
+    # Fastest frontier model that stays within the allowed accuracy drop
+    eligible = [r for r in front if r['val_acc'] >= baseline['val_acc'] - args.max_acc_drop]
+    chosen = min(eligible, key=lambda r: r['latency_ms']) if eligible else baseline
+    key = (chosen['channels'], chosen['hidden'])
+    print(f"Chosen on {len(val_idx)} validation images "
+          f"(one image is {1 / max(len(val_idx), 1):.3f} accuracy)")
+    # Test accuracy only once the choice is made
+    test_acc = accuracy(models[key], images, labels, test_idx)
+    baseline_test_acc = accuracy(models[(32, 128)], images, labels, test_idx)
+    torch.save({'config': {'channels': key[0], 'hidden': key[1], 'num_classes': len(class_names),
+                           'batch_norm_folded': True},
+                'state_dict': models[key].state_dict()}, args.export)
+    print(f"Exported channels={key[0]} hidden={key[1]} to {args.export}: "
+          f"{baseline['latency_ms'] / chosen['latency_ms']:.1f}x faster, "
+          f"{baseline['params'] / chosen['params']:.1f}x smaller, "
+          f"test accuracy {test_acc:.4f} (baseline {baseline_test_acc:.4f})")
+
+
+if __name__ == "__main__":
+    main()
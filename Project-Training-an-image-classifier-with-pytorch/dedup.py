@@ -0,0 +1,474 @@
+"""
+Near-Duplicate Detection for Captured Datasets
+
+Bursts from the Pi capture scripts put many nearly identical frames into each
+class folder. They inflate training time and, split at random, leak between
+train, validation and test. This tool finds them and either reports them,
+prunes them or writes group ids for leakage-free splits.
+
+Every image gets two compact signatures, computed in parallel:
+
+  hash:      64-bit difference hash (dHash) of a 9x8 grayscale thumbnail
+  embedding: 16x16 grayscale thumbnail in [0, 1] (float16)
+
+They are stored in an index file (cache/<dataset>-dedup_index.npz, outside
+the dataset) together with each file's label, size and mtime, so later runs
+only hash new or changed files. Near-duplicate pairs are found with
+
+  --metric hamming  Hamming distance of the hashes; candidates come from
+                    multi-index hashing (t + 1 hash bands, one must match
+                    exactly), so the search does not compare all pairs
+  --metric l2       RMS pixel difference of the embeddings; exact, computed
+                    block-wise with matrix products
+
+within each class (or across classes with --cross-class, which also reports
+the same image filed under two labels). Images with identical signatures are
+merged before the search, which then only compares distinct signatures and
+merges matches into clusters as it goes, so long bursts of identical frames
+do not produce a pair for every two of them.
+
+  python3 dedup.py                                  # update index, report
+  python3 dedup.py --report clusters.json
+  python3 dedup.py --groups groups.json             # for sweep.py/compress.py --groups
+  python3 dedup.py --prune                          # move duplicates aside
+
+--prune with --metric l2 only acts on pairs whose hashes also match: the
+thumbnails of two plain, evenly lit frames are close whatever is on them.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from simple_cnn import DATASET_PATH, list_images
+
+INDEX_DIR = "cache"
+INDEX_FILE = "dedup_index.npz"
+# Index files of an older signature format are rebuilt
+INDEX_VERSION = 2
+
+# dHash compares HASH_SIZE + 1 columns per row -> 64 bits
+HASH_SIZE = 8
+EMBED_SIZE = 16
+
+# Default near-duplicate thresholds
+HAMMING_THRESHOLD = 4      # Differing hash bits (of 64)
+L2_THRESHOLD = 0.02        # RMS pixel difference (0..1 intensity)
+
+# Distances computed per block (--metric l2), 16 MB of float32
+BLOCK_ELEMENTS = 1 << 22
+
+if hasattr(np, 'bitwise_count'):
+    def popcount(x):
+        return np.bitwise_count(x)
+else:
+    _BYTE_BITS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def popcount(x):
+        return _BYTE_BITS[x.view(np.uint8).reshape(-1, 8)].sum(axis=1)
+
+
+def image_signature(img_path):
+    """(64-bit dHash, flattened float16 embedding) of one image"""
+    gray = Image.open(img_path).convert('L')
+    thumb = np.asarray(gray.resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR), dtype=np.int16)
+    bits = np.packbits(thumb[:, 1:] > thumb[:, :-1])
+    hash_value = int.from_bytes(bits.tobytes(), 'big')
+
+    embedding = np.asarray(gray.resize((EMBED_SIZE, EMBED_SIZE), Image.BOX),
+                           dtype=np.float32).ravel() / 255.0
+    return hash_value, embedding.astype(np.float16)
+
+
+def _file_state(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+class DedupIndex:
+    def __init__(self, dataset=DATASET_PATH, index_file=None):
+        """
+        Signatures of every image of a dataset, updated incrementally
+
+        Args:
+            dataset: Dataset folder with one sub-folder per class
+            index_file: Index location (default:
+                cache/<dataset name>-dedup_index.npz)
+        """
+        self.dataset = dataset
+        self.index_file = index_file or os.path.join(
+            INDEX_DIR, f"{os.path.basename(os.path.normpath(dataset))}-{INDEX_FILE}")
+        self.paths = np.array([], dtype=str)
+        self.labels = np.array([], dtype=np.int64)
+        self.class_names = []
+        self.sizes = np.array([], dtype=np.int64)
+        self.mtimes = np.array([], dtype=np.int64)
+        self.hashes = np.array([], dtype=np.uint64)
+        self.embeddings = np.empty((0, EMBED_SIZE * EMBED_SIZE), dtype=np.float16)
+        if os.path.exists(self.index_file):
+            self._load()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def _load(self):
+        with np.load(self.index_file) as data:
+            if 'version' not in data or int(data['version']) != INDEX_VERSION:
+                print(f"Rebuilding {self.index_file} (older format)")
+                return
+            self.paths = data['paths']
+            self.labels = data['labels']
+            self.class_names = data['class_names'].tolist()
+            self.sizes = data['sizes']
+            self.mtimes = data['mtimes']
+            self.hashes = data['hashes']
+            self.embeddings = data['embeddings']
+
+    def save(self):
+        """Write the index atomically"""
+        os.makedirs(os.path.dirname(self.index_file) or '.', exist_ok=True)
+        tmp = self.index_file + ".tmp.npz"
+        np.savez(tmp, version=INDEX_VERSION, paths=self.paths, labels=self.labels,
+                 class_names=np.array(self.class_names, dtype=str), sizes=self.sizes,
+                 mtimes=self.mtimes, hashes=self.hashes, embeddings=self.embeddings)
+        os.replace(tmp, self.index_file)
+
+    def update(self, workers=None):
+        """
+        Bring the index in line with the dataset folder; only new or changed
+        files are hashed. Rows follow list_images() order afterwards.
+
+        Returns:
+            (added, removed) file counts
+        """
+        samples, self.class_names = list_images(self.dataset)
+        paths = [os.path.relpath(p, self.dataset) for p, _ in samples]
+        states = [_file_state(p) for p, _ in samples]
+        known = {p: i for i, p in enumerate(self.paths.tolist())}
+
+        rows = np.full(len(paths), -1, dtype=np.int64)
+        for i, (path, (size, mtime)) in enumerate(zip(paths, states)):
+            j = known.get(path)
+            if j is not None and self.sizes[j] == size and self.mtimes[j] == mtime:
+                rows[i] = j
+        reused = rows >= 0
+        todo = np.flatnonzero(~reused)
+
+        hashes = np.zeros(len(paths), dtype=np.uint64)
+        embeddings = np.empty((len(paths), EMBED_SIZE * EMBED_SIZE), dtype=np.float16)
+        hashes[reused] = self.hashes[rows[reused]]
+        embeddings[reused] = self.embeddings[rows[reused]]
+        if len(todo):
+            files = [samples[i][0] for i in todo]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for i, (h, e) in zip(todo, executor.map(image_signature, files, chunksize=256)):
+                    hashes[i] = h
+                    embeddings[i] = e
+
+        removed = len(self.paths) - int(reused.sum())
+        self.paths = np.array(paths, dtype=str)
+        self.labels = np.array([class_id for _, class_id in samples], dtype=np.int64)
+        self.sizes = np.array([s for s, _ in states], dtype=np.int64)
+        self.mtimes = np.array([m for _, m in states], dtype=np.int64)
+        self.hashes = hashes
+        self.embeddings = embeddings
+        return len(todo), removed
+
+    def _scopes(self, cross_class):
+        """Index arrays searched independently (one per class by default)"""
+        if cross_class:
+            return [np.arange(len(self))]
+        return [np.flatnonzero(self.labels == c) for c in range(len(self.class_names))]
+
+    def find_clusters(self, metric='hamming', threshold=None, cross_class=False, hash_bits=None):
+        """
+        Near-duplicate clusters
+
+        Identical signatures are merged first and only distinct ones are
+        compared; matches are merged into the clusters as each band or block
+        is searched, so bursts of identical frames cost linear time and
+        memory instead of one stored pair per two frames.
+
+        Args:
+            metric: 'hamming' or 'l2'
+            threshold: Largest near-duplicate distance (default per metric)
+            cross_class: Also match images of different classes
+            hash_bits: With 'l2', only merge pairs whose hashes also differ
+                in at most this many bits
+
+        Returns:
+            Cluster id per image (the lowest member index); singletons keep
+            their own
+        """
+        if len(self.labels) != len(self.paths):
+            raise ValueError(f"{self.index_file} has no labels, run update() first")
+        if threshold is None:
+            threshold = HAMMING_THRESHOLD if metric == 'hamming' else L2_THRESHOLD
+        parent = np.arange(len(self))
+        for scope in self._scopes(cross_class):
+            if len(scope) < 2:
+                continue
+            if metric == 'hamming':
+                self._hamming_search(parent, scope, threshold)
+            else:
+                self._l2_search(parent, scope, threshold, hash_bits)
+        return find_roots(parent, np.arange(len(self)))
+
+    def _hamming_search(self, parent, scope, threshold):
+        """Merge images within `scope` at Hamming distance <= threshold"""
+        threshold = int(threshold)
+        hashes, first, inverse = np.unique(self.hashes[scope], return_index=True,
+                                           return_inverse=True)
+        # Images with the same hash join the first one, the rest searches
+        # distinct hashes; `members` maps them back to an image each
+        members = scope[first]
+        union(parent, members[inverse], scope)
+        if len(hashes) < 2:
+            return
+        # Pigeonhole: pairs within t bits agree exactly on one of t + 1 bands
+        bands = min(threshold + 1, 64)
+        bounds = np.linspace(0, 64, bands + 1).round().astype(int)
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            mask = np.uint64((1 << (hi - lo)) - 1)
+            keys = (hashes >> np.uint64(lo)) & mask
+            order = np.argsort(keys, kind='stable')
+            sorted_keys = keys[order]
+            # Last position of each element's run of equal keys
+            run_end = np.flatnonzero(np.append(sorted_keys[1:] != sorted_keys[:-1], True))
+            remaining = np.repeat(run_end, np.diff(np.append(-1, run_end))) - np.arange(len(keys))
+
+            # Compare every element with the ones d positions later in its run
+            active = np.flatnonzero(remaining > 0)
+            d = 1
+            while len(active):
+                a, b = order[active], order[active + d]
+                hit = popcount(hashes[a] ^ hashes[b]) <= threshold
+                union(parent, members[a[hit]], members[b[hit]])
+                d += 1
+                active = active[remaining[active] >= d]
+
+    def _l2_search(self, parent, scope, threshold, hash_bits=None):
+        """Merge images within `scope` at RMS embedding distance <= threshold"""
+        signatures = self.embeddings[scope].view(np.uint16)
+        if hash_bits is not None:
+            # Equal thumbnails can still differ in hash; keep those apart
+            signatures = np.concatenate([signatures, self.hashes[scope, None].view(np.uint16)], axis=1)
+        _, first, inverse = np.unique(signatures, axis=0, return_index=True, return_inverse=True)
+        members = scope[first]
+        union(parent, members[inverse.ravel()], scope)
+        if len(members) < 2:
+            return
+        embeddings = self.embeddings[members].astype(np.float32)
+        squared = (embeddings ** 2).sum(axis=1)
+        limit = threshold ** 2 * embeddings.shape[1]
+        block_rows = max(1, BLOCK_ELEMENTS // len(embeddings))
+        for start in range(0, len(embeddings), block_rows):
+            block = embeddings[start:start + block_rows]
+            # Only the upper triangle: columns from the first row of the block on
+            d2 = squared[start:start + block_rows, None] + squared[None, start:] \
+                - 2.0 * block @ embeddings[start:].T
+            i, j = np.nonzero(d2 <= limit)
+            keep = j > i
+            a, b = members[i[keep] + start], members[j[keep] + start]
+            if hash_bits is not None:
+                hit = popcount(self.hashes[a] ^ self.hashes[b]) <= hash_bits
+                a, b = a[hit], b[hit]
+            union(parent, a, b)
+
+    def clusters(self, pairs):
+        """Cluster id per image (the lowest member index) from (M, 2) index pairs"""
+        parent = np.arange(len(self))
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        union(parent, pairs[:, 0], pairs[:, 1])
+        return find_roots(parent, np.arange(len(self)))
+
+
+def find_roots(parent, items):
+    """Root of each item in the forest `parent`, compressing the paths walked"""
+    roots = parent[items]
+    while True:
+        up = parent[roots]
+        if np.array_equal(up, roots):
+            break
+        roots = up
+    parent[items] = roots
+    return roots
+
+
+def union(parent, a, b):
+    """Merge the trees of a[k] and b[k] for every k; each root stays the lowest member"""
+    a, b = np.asarray(a), np.asarray(b)
+    while len(a):
+        root_a, root_b = find_roots(parent, a), find_roots(parent, b)
+        differ = root_a != root_b
+        a, b, root_a, root_b = a[differ], b[differ], root_a[differ], root_b[differ]
+        # A root hooked by several pairs takes the lowest; the rest go round again
+        np.minimum.at(parent, np.maximum(root_a, root_b), np.minimum(root_a, root_b))
+
+
+def summarize(index, groups):
+    """Per-class counts and the duplicate clusters, largest first"""
+    ids, inverse, counts = np.unique(groups, return_inverse=True, return_counts=True)
+    sizes = counts[inverse]
+    rows = []
+    for c, name in enumerate(index.class_names):
+        members = index.labels == c
+        in_clusters = members & (sizes > 1)
+        rows.append({
+            'class': name,
+            'images': int(members.sum()),
+            'clusters': len(np.unique(groups[in_clusters])),
+            'in_clusters': int(in_clusters.sum()),
+            'unique': len(np.unique(groups[members])),
+        })
+
+    clusters = []
+    for k in np.flatnonzero(counts > 1)[np.argsort(-counts[counts > 1], kind='stable')]:
+        members = np.flatnonzero(inverse == k)
+        names = sorted({index.class_names[c] for c in index.labels[members]})
+        clusters.append({
+            'keep': str(index.paths[ids[k]]),
+            'members': index.paths[members].tolist(),
+            'classes': names,
+        })
+    conflicts = sum(len(c['classes']) > 1 for c in clusters)
+    return rows, clusters, conflicts
+
+
+def prune(index, groups, target):
+    """Move every cluster member except its first image to `target`; returns the count"""
+    # Clusters spanning classes are labelling problems, not duplicates to drop
+    mixed = np.isin(groups, groups[index.labels != index.labels[groups]])
+    moved = 0
+    for i in np.flatnonzero((groups != np.arange(len(index))) & ~mixed):
+        src = os.path.join(index.dataset, index.paths[i])
+        dst = os.path.join(target, index.paths[i])
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.move(src, dst)
+        moved += 1
+    return moved
+
+
+def write_groups(path, index, groups, metric, threshold):
+    """Cluster id per image path, the input of read_groups()"""
+    with open(path, 'w') as f:
+        json.dump({
+            'metric': metric,
+            'threshold': threshold,
+            'groups': dict(zip(index.paths.tolist(), groups.tolist())),
+        }, f)
+
+
+def read_groups(path, dataset=DATASET_PATH):
+    """
+    Group id per sample of list_images(dataset), for split_indices(groups=...)
+
+    Images missing from the groups file (captured after it was written)
+    become groups of their own.
+    """
+    with open(path) as f:
+        groups = json.load(f)['groups']
+    samples, _ = list_images(dataset)
+    next_id = max(groups.values(), default=-1) + 1
+    ids = np.empty(len(samples), dtype=np.int64)
+    for i, (img_path, _) in enumerate(samples):
+        group = groups.get(os.path.relpath(img_path, dataset))
+        if group is None:
+            group, next_id = next_id, next_id + 1
+        ids[i] = group
+    return ids
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Find near-duplicate images in a dataset")
+    parser.add_argument("--dataset", type=str, default=DATASET_PATH,
+                        help=f"Dataset folder (default: {DATASET_PATH})")
+    parser.add_argument("--index", type=str, default=None,
+                        help=f"Index file (default: {INDEX_DIR}/<dataset name>-{INDEX_FILE})")
+    parser.add_argument("--metric", choices=["hamming", "l2"], default="hamming",
+                        help="Distance used for near-duplicates (default: hamming)")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help=f"Largest near-duplicate distance (default: {HAMMING_THRESHOLD} "
+                             f"bits for hamming, {L2_THRESHOLD} for l2)")
+    parser.add_argument("--cross-class", action="store_true",
+                        help="Also match images of different classes")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Hashing processes (default: number of CPU cores)")
+    parser.add_argument("--top", type=int, default=10,
+                        help="Largest clusters to print (default: 10)")
+    parser.add_argument("--report", type=str, default=None,
+                        help="Write the clusters to this JSON file")
+    parser.add_argument("--groups", type=str, default=None,
+                        help="Write cluster ids for leakage-free splits to this JSON file")
+    parser.add_argument("--prune", action="store_true",
+                        help="Move all but the first image of each cluster out of the dataset "
+                             "(l2 pairs must also match by hash)")
+    parser.add_argument("--prune-to", type=str, default=None,
+                        help="Where pruned images go (default: <dataset>-duplicates)")
+    return parser.parse_args()
+
+
+def main():
+    """Main application entry point"""
+    args = parse_arguments()
+    threshold = args.threshold
+    if threshold is None:
+        threshold = HAMMING_THRESHOLD if args.metric == 'hamming' else L2_THRESHOLD
+
+    t_start = time.perf_counter()
+    index = DedupIndex(args.dataset, args.index)
+    added, removed = index.update(args.workers)
+    index.save()
+    print(f"Index: {len(index)} images ({added} hashed, {removed} removed) "
+          f"in {time.perf_counter() - t_start:.1f} s")
+
+    t_start = time.perf_counter()
+    groups = index.find_clusters(args.metric, threshold, args.cross_class)
+    print(f"Search: {args.metric} <= {threshold:g} in {time.perf_counter() - t_start:.1f} s\n")
+
+    rows, clusters, conflicts = summarize(index, groups)
+    print(f"{'class':<14} {'images':>7} {'clusters':>9} {'in clusters':>12} {'unique':>7}")
+    for r in rows:
+        print(f"{r['class']:<14} {r['images']:>7} {r['clusters']:>9} "
+              f"{r['in_clusters']:>12} {r['unique']:>7}")
+    unique = len(np.unique(groups))
+    print(f"{'total':<14} {len(index):>7} {len(clusters):>9} "
+          f"{sum(r['in_clusters'] for r in rows):>12} {unique:>7}")
+    if conflicts:
+        print(f"\n{conflicts} clusters mix images of different classes")
+    for c in clusters[:args.top]:
+        more = f" (+{len(c['members']) - 4} more)" if len(c['members']) > 4 else ""
+        print(f"  {len(c['members']):>4} x {'/'.join(c['classes'])}: "
+              f"{', '.join(c['members'][:4])}{more}")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({'metric': args.metric, 'threshold': threshold,
+                       'classes': rows, 'clusters': clusters}, f, indent=2)
+        print(f"\nClusters saved to {args.report}")
+    if args.groups:
+        write_groups(args.groups, index, groups, args.metric, threshold)
+        print(f"Groups saved to {args.groups} (use with --groups in sweep.py and compress.py)")
+    if args.prune:
+        if args.metric == 'l2':
+            # Flat images are close in l2 whatever they show; prune only pairs
+            # the hash confirms
+            groups = index.find_clusters(args.metric, threshold, args.cross_class,
+                                         hash_bits=HAMMING_THRESHOLD)
+            print(f"Pruning clusters of pairs also within {HAMMING_THRESHOLD} hash bits")
+        target = args.prune_to or os.path.normpath(args.dataset) + "-duplicates"
+        moved = prune(index, groups, target)
+        index.update(args.workers)
+        index.save()
+        print(f"Moved {moved} duplicates to {target}, {len(index)} images remain")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+SimpleCNN model and in-memory dataset loading
+
+The model from Image-classifier-training.ipynb, importable by scripts that
+train or evaluate it outside the notebook (and by worker processes, which
+cannot unpickle classes defined in a notebook). load_dataset() decodes the
+whole image folder once into contiguous arrays with the same preprocessing
+as the notebook's CustomDataset (resize to 28x28, grayscale, normalize with
+mean 0.5 / std 0.5).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from PIL import Image
+
+# Dataset location
+DATASET_PATH = "Datasets/electronic-components-png"
+
+# resolution of images
+TARGET_WIDTH = 28
+TARGET_HEIGHT = 28
+
+GRAY_MEAN = 0.5
+GRAY_STD = 0.5
+
+# 20%-validation, 20%-test
+VAL_RATIO = 0.2
+TEST_RATIO = 0.2
+
+# ITU-R 601-2 luma weights, as used by torchvision's rgb_to_grayscale
+_GRAY_WEIGHTS = np.array([0.2989, 0.587, 0.114], dtype=np.float32)
+
+
+class SimpleCNN(nn.Module):
+    def __init__(self, in_channels=1, num_classes=5, dropout=0.4, channels=32, hidden=128):
+        super(SimpleCNN, self).__init__()
+
+        # Single convolution block
+        self.conv1 = nn.Conv2d(in_channels, channels, kernel_size=3, padding=1)  # Output: [channels, 28, 28]
+        self.bn1 = nn.BatchNorm2d(channels)  # Batch norm for conv output
+        self.pool = nn.MaxPool2d(2, 2)  # Reduces to [channels, 14, 14]
+
+        # Dropout
+        self.dropout = nn.Dropout(dropout)
+
+        # Calculate flattened size
+        self.flattened_size = channels * 14 * 14  # After pooling
+
+        # Classifier
+        self.fc1 = nn.Linear(self.flattened_size, hidden)
+        self.fc2 = nn.Linear(hidden, num_classes)
+
+    def forward(self, x):
+        # Conv block
+        x = self.pool(F.relu(self.bn1(self.conv1(x))))
+        x = self.dropout(x)
+
+        # Classifier
+        x = x.view(-1, self.flattened_size)
+        x = F.relu(self.fc1(x))
+        x = self.dropout(x)  # Dropout before final layer
+        x = self.fc2(x)
+        return x
+
+
+def list_images(path):
+    """
+    Collect (image path, class id) pairs from one sub-folder per class
+
+    Returns:
+        (samples, class_names) with class ids indexing the sorted folder names
+    """
+    class_names = sorted(d for d in os.listdir(path)
+                         if os.path.isdir(os.path.join(path, d)))
+    samples = []
+    for class_id, label in enumerate(class_names):
+        class_dir = os.path.join(path, label)
+        for file in sorted(os.listdir(class_dir)):
+            if file.lower().endswith(('.png', '.jpg', '.jpeg')):
+                samples.append((os.path.join(class_dir, file), class_id))
+    return samples, class_names
+
+
+def decode_image(img_path, width=TARGET_WIDTH, height=TARGET_HEIGHT):
+    """Load one image as a normalized (1, height, width) float32 array"""
+    image = Image.open(img_path).convert('RGB').resize((width, height), Image.BILINEAR)
+    rgb = np.asarray(image, dtype=np.float32) / 255.0
+    gray = rgb @ _GRAY_WEIGHTS
+    return ((gray - GRAY_MEAN) / GRAY_STD)[None]
+
+
+def load_dataset(path=DATASET_PATH, workers=None):
+    """
+    Decode every image of the dataset into memory, in parallel
+
+    Args:
+        path: Dataset folder with one sub-folder per class
+        workers: Decoding processes (default: number of CPU cores)
+
+    Returns:
+        (images, labels, class_names) with images a float32 tensor of shape
+        (N, 1, 28, 28) and labels an int64 tensor of shape (N,)
+    """
+    samples, class_names = list_images(path)
+    paths = [p for p, _ in samples]
+    images = np.empty((len(samples), 1, TARGET_HEIGHT, TARGET_WIDTH), dtype=np.float32)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for i, image in enumerate(executor.map(decode_image, paths, chunksize=64)):
+            images[i] = image
+    labels = np.array([class_id for _, class_id in samples], dtype=np.int64)
+    return torch.from_numpy(images), torch.from_numpy(labels), class_names
+
+
+def split_indices(num_samples, val_ratio=VAL_RATIO, test_ratio=TEST_RATIO, seed=42, groups=None):
+    """
+    Shuffled (train, val, test) index tensors, like random_split in the notebook
+
+    With `groups` (one id per sample, e.g. near-duplicate clusters from
+    dedup.py) each group goes to a single split, so near-duplicates cannot
+    leak from training into validation or test. Groups are assigned largest
+    first (shuffled among equal sizes) to the split furthest below its
+    requested size, so one large cluster cannot take a whole split, and no
+    split is left empty while there are enough groups.
+    """
+    num_test = int(test_ratio * num_samples)
+    num_val = int(val_ratio * num_samples)
+    num_train = num_samples - num_val - num_test
+    generator = torch.Generator().manual_seed(seed)
+    if groups is None:
+        perm = torch.randperm(num_samples, generator=generator)
+        return perm[:num_train], perm[num_train:num_train + num_val], perm[num_train + num_val:]
+
+    _, group_ids = torch.unique(torch.as_tensor(groups), return_inverse=True)
+    sizes = torch.bincount(group_ids)
+    num_groups = len(sizes)
+    shuffled = torch.randperm(num_groups, generator=generator)
+    order = shuffled[torch.sort(sizes[shuffled], descending=True, stable=True).indices]
+
+    targets = [num_train, num_val, num_test]
+    # Splits asked to be empty (e.g. test_ratio=0) never get a group
+    wanted = [split for split in range(3) if targets[split] > 0]
+    filled = [0, 0, 0]
+    split_of = torch.empty(num_groups, dtype=torch.int64)
+    for position, (group, size) in enumerate(zip(order.tolist(), sizes[order].tolist())):
+        empty = [split for split in wanted if filled[split] == 0]
+        if num_groups - position <= len(empty):
+            # Just enough groups left for the empty splits
+            split = empty[0]
+        else:
+            split = max(wanted, key=lambda k: targets[k] - filled[k])
+        split_of[group] = split
+        filled[split] += size
+
+    # Samples ordered by shuffled group, each group contiguous
+    rank = torch.empty(num_groups, dtype=torch.int64)
+    rank[shuffled] = torch.arange(num_groups)
+    perm = torch.sort(rank[group_ids], stable=True).indices
+    sample_split = split_of[group_ids[perm]]
+    return tuple(perm[sample_split == split] for split in range(3))
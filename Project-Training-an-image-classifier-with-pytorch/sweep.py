@@ -0,0 +1,286 @@
+"""
+Hyperparameter Sweep for SimpleCNN
+
+Run many short SimpleCNN trainings in parallel on the CPU. The dataset is
+decoded once into shared memory and every worker process trains from that
+copy with a fixed number of torch threads, so workers do not oversubscribe
+the cores. Trials are pruned with successive halving: all configurations
+train for a few epochs, the best 1/eta continue for eta times as many epochs,
+and so on up to --max-epochs.
+
+The results table (validation accuracy, loss and training samples/sec per
+trial) is printed and written to a CSV file.
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import torch
+import torch.nn.functional as F
+import torch.optim as optim
+from torch.optim.lr_scheduler import ReduceLROnPlateau
+
+from dedup import read_groups
+from simple_cnn import SimpleCNN, DATASET_PATH, load_dataset, split_indices
+
+# Search space (the notebook uses LR=0.001, BATCH_SIZE=10, dropout 0.4)
+SEARCH_SPACE = {
+    'lr': [0.0003, 0.001, 0.003],
+    'batch_size': [10, 32, 64],
+    'dropout': [0.2, 0.4, 0.5],
+}
+
+# Shared between trials in a worker process, set by _init_worker()
+_images = None
+_labels = None
+_splits = None
+
+
+def _init_worker(images, labels, splits, num_threads):
+    """Keep a reference to the shared dataset and pin torch threads"""
+    global _images, _labels, _splits
+    _images, _labels, _splits = images, labels, splits
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+
+
+def _evaluate(model, indices, batch_size=256):
+    """Mean loss and accuracy on the samples at `indices`"""
+    model.eval()
+    loss = 0.0
+    correct = 0
+    with torch.no_grad():
+        for start in range(0, len(indices), batch_size):
+            batch = indices[start:start + batch_size]
+            preds = model(_images[batch])
+            labels = _labels[batch]
+            loss += F.cross_entropy(preds, labels, reduction='sum').item()
+            correct += preds.argmax(dim=1).eq(labels).sum().item()
+    return loss / len(indices), correct / len(indices)
+
+
+def train_trial(trial_id, config, epochs, state, num_classes, seed=0):
+    """
+    Train one configuration for `epochs` more epochs
+
+    Args:
+        trial_id: Trial number (also seeds the initialization and shuffling)
+        config: Dict with lr, batch_size and dropout
+        epochs: Number of epochs to add
+        state: Serialized checkpoint from the previous rung, or None
+        num_classes: Number of output classes
+
+    Returns:
+        Dict with the new checkpoint and metrics of the last epoch
+    """
+    torch.manual_seed(seed + trial_id)
+    train_idx, val_idx, _ = _splits
+
+    model = SimpleCNN(in_channels=1, num_classes=num_classes, dropout=config['dropout'])
+    optimizer = optim.Adam(model.parameters(), lr=config['lr'])
+    scheduler = ReduceLROnPlateau(optimizer, 'min', patience=2, factor=0.5)
+    epochs_done = 0
+    if state is not None:
+        checkpoint = torch.load(io.BytesIO(state), weights_only=False)
+        model.load_state_dict(checkpoint['model'])
+        optimizer.load_state_dict(checkpoint['optimizer'])
+        scheduler.load_state_dict(checkpoint['scheduler'])
+        epochs_done = checkpoint['epochs']
+
+    generator = torch.Generator().manual_seed(seed + trial_id * 1000 + epochs_done)
+    batch_size = config['batch_size']
+    samples = 0
+    train_time = 0.0
+    val_loss, val_acc = float('nan'), 0.0
+    for _ in range(epochs):
+        model.train()
+        t_start = time.perf_counter()
+        order = train_idx[torch.randperm(len(train_idx), generator=generator)]
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            optimizer.zero_grad()
+            loss = F.cross_entropy(model(_images[batch]), _labels[batch])
+            loss.backward()
+            optimizer.step()
+        train_time += time.perf_counter() - t_start
+        samples += len(order)
+
+        val_loss, val_acc = _evaluate(model, val_idx)
+        scheduler.step(val_loss)
+        epochs_done += 1
+
+    buffer = io.BytesIO()
+    torch.save({'model': model.state_dict(), 'optimizer': optimizer.state_dict(),
+                'scheduler': scheduler.state_dict(), 'epochs': epochs_done}, buffer)
+    return {
+        'trial': trial_id,
+        'state': buffer.getvalue(),
+        'epochs': epochs_done,
+        'val_loss': val_loss,
+        'val_acc': val_acc,
+        'samples': samples,
+        'train_time': train_time,
+    }
+
+
+def make_configs(search_space, num_trials=None, seed=0):
+    """Full grid of the search space, or `num_trials` random picks from it"""
+    keys = list(search_space)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*search_space.values())]
+    if num_trials is not None and num_trials < len(grid):
+        grid = random.Random(seed).sample(grid, num_trials)
+    return grid
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def run_sweep(configs, images, labels, splits, num_classes, workers, threads,
+              min_epochs=1, max_epochs=9, eta=3):
+    """
+    Successive halving over `configs`
+
+    Returns:
+        (rows, states): one result row per trial, and the final checkpoint
+        of every trial
+    """
+    rows = {i: {'trial': i, **config, 'epochs': 0, 'val_acc': 0.0, 'val_loss': float('inf'),
+                'samples': 0, 'train_time': 0.0, 'rung': 0}
+            for i, config in enumerate(configs)}
+    states = {i: None for i in rows}
+    active = list(rows)
+    rung = 0
+    rung_epochs = min(min_epochs, max_epochs)
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker,
+                             initargs=(images, labels, splits, threads)) as executor:
+        while True:
+            print(f"Rung {rung}: {len(active)} trials to {rung_epochs} epochs")
+            futures = [executor.submit(train_trial, i, configs[i], rung_epochs - rows[i]['epochs'],
+                                       states[i], num_classes)
+                       for i in active]
+            for future in futures:
+                result = future.result()
+                row = rows[result['trial']]
+                states[result['trial']] = result['state']
+                row.update(epochs=result['epochs'], val_acc=result['val_acc'],
+                           val_loss=result['val_loss'], rung=rung)
+                row['samples'] += result['samples']
+                row['train_time'] += result['train_time']
+
+            if len(active) <= 1 or rung_epochs >= max_epochs:
+                break
+            active.sort(key=lambda i: (-rows[i]['val_acc'], rows[i]['val_loss']))
+            active = active[:max(1, math.ceil(len(active) / eta))]
+            rung += 1
+            rung_epochs = min(rung_epochs * eta, max_epochs)
+
+    for row in rows.values():
+        row['samples_per_s'] = row['samples'] / row['train_time'] if row['train_time'] else 0.0
+    return sorted(rows.values(), key=lambda r: (-r['epochs'], -r['val_acc'])), states
+
+
+def print_table(rows):
+    header = f"{'trial':>5} {'lr':>8} {'batch':>5} {'drop':>5} {'epochs':>6} " \
+             f"{'val_acc':>8} {'val_loss':>8} {'samples/s':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(f"{r['trial']:>5} {r['lr']:>8g} {r['batch_size']:>5} {r['dropout']:>5} "
+              f"{r['epochs']:>6} {r['val_acc']:>8.4f} {r['val_loss']:>8.4f} "
+              f"{r['samples_per_s']:>10.0f}")
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="SimpleCNN hyperparameter sweep")
+    parser.add_argument("--dataset", type=str, default=DATASET_PATH,
+                        help=f"Dataset folder (default: {DATASET_PATH})")
+    parser.add_argument("--trials", type=int, default=None,
+                        help="Random trials from the search space (default: full grid)")
+    parser.add_argument("--min-epochs", type=int, default=1,
+                        help="Epochs in the first rung (default: 1)")
+    parser.add_argument("--max-epochs", type=int, default=9,
+                        help="Epochs for the surviving trials (default: 9)")
+    parser.add_argument("--eta", type=int, default=3,
+                        help="Keep 1/eta of the trials per rung (default: 3)")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Torch threads per worker (default: 1)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: CPU cores / threads)")
+    parser.add_argument("--output", type=str, default="sweep_results.csv",
+                        help="Results table (default: sweep_results.csv)")
+    parser.add_argument("--save-best", type=str, default=None,
+                        help="Save the best trial's model weights to this file")
+    parser.add_argument("--groups", type=str, default=None,
+                        help="Near-duplicate groups from dedup.py, kept within one split")
+    args = parser.parse_args()
+    # Every rung must train for at least one more epoch
+    if args.min_epochs < 1:
+        parser.error("--min-epochs must be at least 1")
+    if args.max_epochs < args.min_epochs:
+        parser.error("--max-epochs must be at least --min-epochs")
+    if args.eta < 2:
+        parser.error("--eta must be at least 2")
+    return args
+
+
+def main():
+    """Main application entry point"""
+    args = parse_arguments()
+    workers = args.workers or max(1, available_cores() // args.threads)
+
+    t_start = time.perf_counter()
+    images, labels, class_names = load_dataset(args.dataset)
+    # Workers read the dataset from shared memory instead of their own copy
+    images.share_memory_()
+    labels.share_memory_()
+    groups = read_groups(args.groups, args.dataset) if args.groups else None
+    splits = split_indices(len(labels), groups=groups)
+    print(f"Decoded {len(labels)} images ({len(class_names)} classes) "
+          f"in {time.perf_counter() - t_start:.1f} s")
+
+    configs = make_configs(SEARCH_SPACE, args.trials)
+    print(f"Sweeping {len(configs)} configurations on {workers} workers "
+          f"x {args.threads} threads")
+    t_start = time.perf_counter()
+    rows, states = run_sweep(configs, images, labels, splits, len(class_names),
+                             workers, args.threads, args.min_epochs, args.max_epochs, args.eta)
+    print(f"Sweep finished in {time.perf_counter() - t_start:.1f} s\n")
+
+    print_table(rows)
+    fields = ['trial', 'lr', 'batch_size', 'dropout', 'epochs', 'rung',
+              'val_acc', 'val_loss', 'samples_per_s']
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"\nResults saved to {args.output}")
+
+    if args.save_best:
+        best = rows[0]
+        checkpoint = torch.load(io.BytesIO(states[best['trial']]), weights_only=False)
+        torch.save(checkpoint['model'], args.save_best)
+        print(f"Best trial {best['trial']} saved to {args.save_best}")
+
+
+if __name__ == "__main__":
+    main()
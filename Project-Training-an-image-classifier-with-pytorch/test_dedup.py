@@ -0,0 +1,157 @@
+"""
+Near-duplicate search, clustering, index reuse and grouped splits
+"""
+
+import os
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from dedup import DedupIndex, popcount
+from simple_cnn import split_indices
+
+
+def make_index(tmp_path, hashes, embeddings, labels):
+    index = DedupIndex(str(tmp_path / "dataset"), index_file=str(tmp_path / "index.npz"))
+    index.paths = np.array([f"{i}.png" for i in range(len(hashes))])
+    index.labels = np.asarray(labels, dtype=np.int64)
+    index.class_names = [str(c) for c in range(int(index.labels.max()) + 1)]
+    index.hashes = np.asarray(hashes, dtype=np.uint64)
+    index.embeddings = np.asarray(embeddings, dtype=np.float16)
+    return index
+
+
+def brute_force(index, metric, threshold, cross_class=False, hash_bits=None):
+    """Clusters from comparing every pair"""
+    bits = popcount(index.hashes[:, None] ^ index.hashes[None, :])
+    embeddings = index.embeddings.astype(np.float32)
+    rms = np.sqrt(((embeddings[:, None] - embeddings[None, :]) ** 2).mean(axis=2))
+    near = bits <= threshold if metric == 'hamming' else rms <= threshold
+    if hash_bits is not None:
+        near &= bits <= hash_bits
+    if not cross_class:
+        near &= index.labels[:, None] == index.labels[None, :]
+    i, j = np.nonzero(np.triu(near, 1))
+    return index.clusters(np.stack([i, j], axis=1))
+
+
+def synthetic_signatures(seed, count=200):
+    """Bursts of identical and near-identical signatures among random ones"""
+    rng = np.random.default_rng(seed)
+    bases = rng.integers(0, 2 ** 63, 15, dtype=np.uint64) * np.uint64(2)
+    flips = (np.uint64(1) << rng.integers(0, 64, count).astype(np.uint64)) * (rng.random(count) < 0.5)
+    hashes = bases[rng.integers(0, 15, count)] ^ flips.astype(np.uint64)
+    thumbs = rng.random((10, 256))
+    embeddings = thumbs[rng.integers(0, 10, count)] \
+        + rng.normal(0, 0.02, (count, 256)) * (rng.random((count, 1)) < 0.5)
+    return hashes, embeddings, rng.integers(0, 2, count)
+
+
+@pytest.mark.parametrize("metric, threshold, cross_class, hash_bits", [
+    ('hamming', 1, False, None),
+    ('hamming', 4, True, None),
+    ('l2', 0.03, False, None),
+    ('l2', 0.03, True, 2),
+])
+def test_clusters_match_brute_force(tmp_path, metric, threshold, cross_class, hash_bits):
+    for seed in range(3):
+        index = make_index(tmp_path, *synthetic_signatures(seed))
+        groups = index.find_clusters(metric, threshold, cross_class, hash_bits=hash_bits)
+        expected = brute_force(index, metric, threshold, cross_class, hash_bits)
+        np.testing.assert_array_equal(groups, expected)
+        # Cluster ids are the lowest member index
+        assert np.all(groups <= np.arange(len(index)))
+
+
+def test_union_find_matches_connected_components(tmp_path):
+    rng = np.random.default_rng(0)
+    count = 300
+    index = make_index(tmp_path, np.zeros(count), np.zeros((count, 256)), np.zeros(count))
+    pairs = rng.integers(0, count, (200, 2))
+    groups = index.clusters(pairs)
+
+    # Reference: relabel to the smallest reachable index until nothing changes
+    expected = np.arange(count)
+    changed = True
+    while changed:
+        changed = False
+        for a, b in pairs:
+            low = min(expected[a], expected[b])
+            for k in (a, b):
+                if expected[k] != low:
+                    expected[expected == expected[k]] = low
+                    changed = True
+    np.testing.assert_array_equal(groups, expected)
+
+
+def test_bursts_of_identical_frames_form_one_cluster(tmp_path):
+    rng = np.random.default_rng(1)
+    hashes = np.concatenate([np.full(5000, 12345, dtype=np.uint64),
+                             rng.integers(0, 2 ** 63, 5000, dtype=np.uint64) * np.uint64(2) + np.uint64(1)])
+    index = make_index(tmp_path, hashes, np.zeros((len(hashes), 256)), np.zeros(len(hashes)))
+    groups = index.find_clusters('hamming', 0)
+    assert np.all(groups[:5000] == 0)
+    assert len(np.unique(groups)) == 5001
+
+
+def test_index_reuses_unchanged_files(tmp_path):
+    dataset = tmp_path / "dataset"
+    rng = np.random.default_rng(0)
+    for label in ("led", "resistor"):
+        os.makedirs(dataset / label)
+        for i in range(3):
+            pixels = rng.integers(0, 256, (32, 32), dtype=np.uint8)
+            Image.fromarray(pixels).save(dataset / label / f"{i}.png")
+    index_file = str(tmp_path / "index.npz")
+
+    index = DedupIndex(str(dataset), index_file)
+    assert index.update(workers=1) == (6, 0)
+    index.save()
+
+    os.remove(dataset / "led" / "0.png")
+    Image.fromarray(np.zeros((32, 32), dtype=np.uint8)).save(dataset / "resistor" / "3.png")
+    reloaded = DedupIndex(str(dataset), index_file)
+    # Labels come from the index file, so it can be searched without update()
+    assert reloaded.class_names == ["led", "resistor"]
+    assert len(reloaded.find_clusters()) == 6
+    assert reloaded.update(workers=1) == (1, 1)
+    np.testing.assert_array_equal(reloaded.labels, [0, 0, 1, 1, 1, 1])
+
+
+def test_index_without_labels_raises(tmp_path):
+    index = make_index(tmp_path, np.zeros(3), np.zeros((3, 256)), np.zeros(3))
+    index.labels = index.labels[:0]
+    with pytest.raises(ValueError, match="update"):
+        index.find_clusters()
+
+
+def check_split(groups, splits):
+    indices = torch.cat(splits).sort().values
+    assert torch.equal(indices, torch.arange(len(groups)))
+    members = [set(groups[s.numpy()].tolist()) for s in splits]
+    assert not (members[0] & members[1] or members[0] & members[2] or members[1] & members[2])
+
+
+def test_grouped_split_keeps_groups_together():
+    groups = np.random.default_rng(0).integers(0, 300, 1000)
+    splits = split_indices(len(groups), groups=groups)
+    check_split(groups, splits)
+    sizes = [len(s) for s in splits]
+    assert abs(sizes[1] - 200) <= 10 and abs(sizes[2] - 200) <= 10
+
+
+def test_grouped_split_with_one_large_cluster():
+    # One burst holds 90% of the samples
+    groups = np.concatenate([np.zeros(900, dtype=np.int64), np.arange(1, 101)])
+    train, val, test = split_indices(len(groups), groups=groups)
+    check_split(groups, (train, val, test))
+    assert len(train) == 900 and len(val) > 0 and len(test) > 0
+
+
+def test_grouped_split_without_test_split():
+    groups = np.random.default_rng(1).integers(0, 50, 500)
+    train, val, test = split_indices(len(groups), val_ratio=0.2, test_ratio=0.0, groups=groups)
+    check_split(groups, (train, val, test))
+    assert len(test) == 0 and len(val) > 0
@@ -0,0 +1,269 @@
+"""
+tf.data input pipeline for the TensorFlow / Edge Impulse notebooks
+
+Same preprocessing as the notebooks (decode, resize to 28x28, grayscale,
+normalize, optional invert and flatten), but:
+
+  - images are decoded and preprocessed in parallel (num_parallel_calls)
+    with a deterministic element order
+  - the preprocessed tensors can be cached to a file, so only the first
+    epoch reads and decodes the PNGs; the cache file name is derived from the
+    image list (path, label, size and mtime of every file) and the
+    preprocessing settings, so an added, removed or rewritten image never
+    hits a stale cache
+  - shuffling is seeded, so runs are reproducible
+  - extract_samples_and_labels() copies batches straight into preallocated
+    contiguous float32 arrays instead of growing Python lists
+
+Run this file to benchmark epoch time and peak memory against the notebook's
+original pipeline.
+"""
+
+import argparse
+import hashlib
+import os
+import resource
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import tensorflow as tf
+
+# Dataset location
+DATASET_PATH = "Datasets/electronic-components-png"
+
+# resolution of images
+TARGET_WIDTH = 28
+TARGET_HEIGHT = 28
+
+# Normalization mean
+MEAN = (0.0864, 0.3011, 0.6495)
+STD = (1.212, 1.425, 1.505)
+
+GRAY_MEAN = 0.5
+GRAY_STD = 0.5
+
+
+def load_dataset(path):
+    """
+    Collect (image path, class id) pairs from one sub-folder per class
+
+    Returns:
+        (data, class_names, class_map) like the notebooks' load_dataset()
+    """
+    data = []
+    class_names = []
+    class_map = {}
+    for root, dirs, files in os.walk(path):
+        # Skip the root directory itself (only process subdirectories)
+        if root == path:
+            continue
+        label = os.path.basename(root)
+        if label not in class_map:
+            class_map[label] = len(class_map)
+            class_names.append(label)
+        for file in files:
+            if file.lower().endswith(('.png', '.jpg', '.jpeg')):
+                data.append((os.path.join(root, file), class_map[label]))
+    return data, class_names, class_map
+
+
+def preprocess_image(image_path, label, grayscale=True, invert=False, flatten=False):
+    """Read, decode, resize and normalize one image"""
+    image = tf.io.read_file(image_path)
+    image = tf.image.decode_image(image, channels=3, expand_animations=False)
+    image = tf.image.resize(image, [TARGET_HEIGHT, TARGET_WIDTH])
+
+    if grayscale:
+        image = tf.image.rgb_to_grayscale(image)
+        image = (image / 255.0 - GRAY_MEAN) / GRAY_STD
+    else:
+        image = (image / 255.0 - MEAN) / STD
+
+    if invert:
+        image = 1.0 - image
+
+    # Flatten the image (for DNN)
+    if flatten:
+        channels = 1 if grayscale else 3
+        image = tf.reshape(image, [TARGET_HEIGHT * TARGET_WIDTH * channels])
+
+    return image, label
+
+
+def cache_path(cache_dir, data, **settings):
+    """Cache file for `data` preprocessed with `settings`"""
+    digest = hashlib.sha1()
+    for img_path, label in data:
+        # Size and mtime catch files rewritten in place under the same name
+        st = os.stat(img_path)
+        digest.update(f"{img_path}\0{label}\0{st.st_size}\0{st.st_mtime_ns}\n".encode('utf-8'))
+    digest.update(repr(sorted(settings.items())).encode('utf-8'))
+    digest.update(f"{TARGET_WIDTH}x{TARGET_HEIGHT}".encode('utf-8'))
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, f"tfdata-{digest.hexdigest()[:16]}")
+
+
+def create_dataset(data, batch_size=10, shuffle=False, grayscale=True, invert=False,
+                   flatten=False, cache_dir=None, seed=42):
+    """
+    Build a batched tf.data pipeline over (image path, label) pairs
+
+    Args:
+        data: List of (image path, class id)
+        batch_size: Batch size
+        shuffle: Shuffle every epoch (seeded, so the order is reproducible)
+        grayscale: Convert to one channel
+        invert: Invert the normalized image
+        flatten: Flatten each image to a vector (for DNN)
+        cache_dir: Directory for a file-backed cache of the preprocessed
+            images ('' caches in memory, None disables caching)
+        seed: Shuffle seed
+    """
+    image_paths = [item[0] for item in data]
+    labels = [item[1] for item in data]
+
+    dataset = tf.data.Dataset.from_tensor_slices((image_paths, labels))
+    dataset = dataset.map(
+        lambda x, y: preprocess_image(x, y, grayscale, invert, flatten),
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=True
+    )
+
+    if cache_dir == '':
+        dataset = dataset.cache()
+    elif cache_dir is not None:
+        dataset = dataset.cache(cache_path(cache_dir, data, grayscale=grayscale,
+                                           invert=invert, flatten=flatten))
+
+    if shuffle:
+        dataset = dataset.shuffle(buffer_size=len(data), seed=seed,
+                                  reshuffle_each_iteration=True)
+
+    dataset = dataset.batch(batch_size)
+    dataset = dataset.prefetch(tf.data.AUTOTUNE)
+
+    return dataset
+
+
+def extract_samples_and_labels(dataset, num_samples=None):
+    """
+    Copy a batched dataset into contiguous numpy arrays
+
+    Args:
+        dataset: Batched dataset of (samples, labels)
+        num_samples: Number of samples, if known (e.g. len(data)); otherwise
+            the arrays grow geometrically and are trimmed at the end
+
+    Returns:
+        (X, y) with X float32 of shape (N, ...) and y int64 of shape (N,)
+    """
+    sample_spec, _ = dataset.element_spec
+    capacity = num_samples or 1024
+    X = np.empty((capacity, *sample_spec.shape[1:]), dtype=np.float32)
+    y = np.empty(capacity, dtype=np.int64)
+    count = 0
+    for samples, labels in dataset:
+        n = samples.shape[0]
+        if count + n > len(X):
+            capacity = max(2 * len(X), count + n)
+            X = np.resize(X, (capacity, *X.shape[1:]))
+            y = np.resize(y, capacity)
+        X[count:count + n] = samples.numpy()
+        y[count:count + n] = labels.numpy()
+        count += n
+    if count != len(X):
+        X, y = X[:count].copy(), y[:count].copy()
+    return X, y
+
+
+def _original_dataset(data, batch_size, shuffle, flatten):
+    """The notebooks' create_dataset(), for comparison"""
+    image_paths = [item[0] for item in data]
+    labels = [item[1] for item in data]
+    dataset = tf.data.Dataset.from_tensor_slices((image_paths, labels))
+    dataset = dataset.map(lambda x, y: preprocess_image(x, y, True, False, flatten))
+    if shuffle:
+        dataset = dataset.shuffle(buffer_size=len(data))
+    dataset = dataset.batch(batch_size)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def _original_extract(dataset):
+    """The notebooks' extract_samples_and_labels(), for comparison"""
+    X = []
+    y = []
+    for samples, labels in dataset:
+        X.extend(samples.numpy())
+        y.extend(labels.numpy())
+    return np.array(X), np.array(y)
+
+
+def _epoch_times(dataset, epochs):
+    times = []
+    for _ in range(epochs):
+        t_start = time.perf_counter()
+        for _ in dataset:
+            pass
+        times.append(time.perf_counter() - t_start)
+    return times
+
+
+def _traced(fn, *args):
+    """Run fn, return (result, seconds, peak traced numpy/Python memory in MB)"""
+    tracemalloc.start()
+    t_start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - t_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1e6
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Benchmark the tf.data input pipeline")
+    parser.add_argument("--dataset", type=str, default=DATASET_PATH,
+                        help=f"Dataset folder (default: {DATASET_PATH})")
+    parser.add_argument("--epochs", type=int, default=3,
+                        help="Epochs to time per pipeline (default: 3)")
+    parser.add_argument("--batch-size", type=int, default=10,
+                        help="Batch size (default: 10)")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Repeat the image list to simulate a larger dataset (default: 1)")
+    return parser.parse_args()
+
+
+def main():
+    """Compare the original and the parallel, cached pipeline"""
+    args = parse_arguments()
+    data, class_names, _ = load_dataset(args.dataset)
+    data = data * args.repeat
+    print(f"{len(data)} images, {len(class_names)} classes, batch size {args.batch_size}")
+
+    cache_dir = tempfile.mkdtemp(prefix="tf_input_cache_")
+    try:
+        original = _original_dataset(data, args.batch_size, True, False)
+        optimized = create_dataset(data, args.batch_size, shuffle=True, cache_dir=cache_dir)
+        print("\nEpoch time (s):")
+        for name, dataset in (("original", original), ("parallel+cache", optimized)):
+            times = _epoch_times(dataset, args.epochs)
+            print(f"  {name:<16} " + " | ".join(f"{t:.3f}" for t in times))
+
+        print("\nFeature extraction (flattened, batch size 200):")
+        flat = create_dataset(data, 200, flatten=True, cache_dir=cache_dir)
+        _epoch_times(flat, 1)  # fill the cache so both runs read the same way
+        (X0, y0), t0, peak0 = _traced(_original_extract, flat)
+        (X1, y1), t1, peak1 = _traced(extract_samples_and_labels, flat, len(data))
+        assert np.array_equal(X0, X1) and np.array_equal(y0, y1)
+        print(f"  {'list + np.array':<16} {t0:.3f} s | peak {peak0:.1f} MB | {X0.dtype}")
+        print(f"  {'preallocated':<16} {t1:.3f} s | peak {peak1:.1f} MB | {X1.dtype}")
+        print(f"\nPeak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,19 @@ Also display the framerate (fps) to the screen. Use this to adjust the camera's
 focus. Press ctrl + c in the console or 'q' on the preview window to stop.
 """
 
+import os
+import sys
 import cv2
 import subprocess
 import numpy as np
 
+# On-demand profiler (kill -USR1 <pid> or the control socket) from the deployment scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'deployement', 'electronic-component-dnn'))
+from sampling_profiler import install as install_profiler
+
+profiler = install_profiler("pi-cam-preview", socket_path="/tmp/pi-cam-preview-profile.sock")
+
 # GStreamer pipeline string (identical to terminal command)
 pipeline = (
     "v4l2src device=/dev/video0 ! "
@@ -19,36 +28,39 @@ pipeline = (
     "appsink drop=true sync=false"
 )
 
-# Open capture
-cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
-print(cap)
-
-if not cap.isOpened():
-    # Fallback to terminal command if OpenCV fails
-    print("OpenCV GStreamer failed, using subprocess fallback")
-    proc = subprocess.Popen(
-        ['gst-launch-1.0', 'v4l2src', 'device=/dev/video0', '!',
-         'video/x-raw,width=640,height=480,framerate=30/1', '!',
-         'videoconvert', '!', 'autovideosink'],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
-    try:
-        proc.wait()
-    except KeyboardInterrupt:
-        proc.terminate()
-else:
-    print("Streaming - Press 'q' to quit")
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("Frame read error")
-            break
-            
-        cv2.imshow("Camera", frame)
-        if cv2.waitKey(1) == ord('q'):
-            break
-    cap.release()
-    cv2.destroyAllWindows()
+try:
+    # Open capture
+    cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+    print(cap)
 
+    if not cap.isOpened():
+        # Fallback to terminal command if OpenCV fails
+        print("OpenCV GStreamer failed, using subprocess fallback")
+        proc = subprocess.Popen(
+            ['gst-launch-1.0', 'v4l2src', 'device=/dev/video0', '!',
+             'video/x-raw,width=640,height=480,framerate=30/1', '!',
+             'videoconvert', '!', 'autovideosink'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        try:
+            proc.wait()
+        except KeyboardInterrupt:
+            proc.terminate()
+    else:
+        print("Streaming - Press 'q' to quit")
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                print("Frame read error")
+                break
+            
+            cv2.imshow("Camera", frame)
+            if cv2.waitKey(1) == ord('q'):
+                break
+        cap.release()
+        cv2.destroyAllWindows()
+finally:
+    # Remove the control socket on every exit path
+    profiler.close()
@@ -1,7 +1,14 @@
+import argparse
+import os
+import sys
 import cv2
-import numpy as np
 import subprocess
-import select
+
+# Shared frame sources (recording/replay) live next to the deployment scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'deployement', 'electronic-component-dnn'))
+from frame_sources import LoopStats, PipeSource, RecordingSource, ReplaySource
+from sampling_profiler import install as install_profiler
 
 # GStreamer pipeline configuration
 WIDTH, HEIGHT = 640, 480
@@ -25,28 +32,61 @@ def run_gstreamer_pipeline():
         universal_newlines=False
     )
 
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="GStreamer camera preview")
+    parser.add_argument("--record", type=str, default=None,
+                        help="Record frames to this session file")
+    parser.add_argument("--replay", type=str, default=None,
+                        help="Replay a recorded session instead of using the camera")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay speed (1.0 real-time, 0 as fast as possible)")
+    parser.add_argument("--headless", action="store_true",
+                        help="Do not open a preview window")
+    parser.add_argument("--stats", type=str, default=None,
+                        help="Write loop statistics to this JSON file on exit")
+    parser.add_argument("--profile-socket", type=str, default="/tmp/pi-cam-preview_1-profile.sock",
+                        help="Control socket for on-demand profiling ('' to disable)")
+    parser.add_argument("--profile-seconds", type=float, default=10.0,
+                        help="Duration of a profile started with SIGUSR1 (default: 10)")
+    return parser.parse_args()
+
 def main():
-    process = run_gstreamer_pipeline()
+    args = parse_arguments()
+    profiler = install_profiler("pi-cam-preview_1", seconds=args.profile_seconds,
+                                socket_path=args.profile_socket)
+    if args.replay:
+        source = ReplaySource(args.replay, speed=args.speed)
+    else:
+        source = PipeSource(run_gstreamer_pipeline(), WIDTH, HEIGHT)
+    if args.record:
+        source = RecordingSource(source, args.record)
+    stats = LoopStats()
     
     try:
         while True:
-            # Read raw frame data from pipe
-            raw_frame = process.stdout.read(WIDTH*HEIGHT*3)
-            if not raw_frame:
+            # Read frame (raw frame data from pipe, or replayed session)
+            ret, frame = source.read()
+            if not ret:
                 break
                 
-            # Convert to numpy array
-            frame = np.frombuffer(raw_frame, dtype=np.uint8)
-            frame = frame.reshape((HEIGHT, WIDTH, 3))
-            
             # Display with OpenCV
-            cv2.imshow('GStreamer + OpenCV', frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            if not args.headless:
+                cv2.imshow('GStreamer + OpenCV', frame)
+            stats.record(source.timestamp)
+            if not args.headless and cv2.waitKey(1) & 0xFF == ord('q'):
                 break
                 
+    except KeyboardInterrupt:
+        pass
     finally:
-        process.terminate()
+        replay = source if isinstance(source, ReplaySource) else getattr(source, 'source', None)
+        print(stats.report(replay))
+        if args.stats:
+            stats.save(args.stats, replay)
+        source.release()
         cv2.destroyAllWindows()
+        profiler.close()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
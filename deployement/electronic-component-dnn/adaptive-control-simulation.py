@@ -0,0 +1,201 @@
+"""
+Adaptive Control Simulation
+
+Replay synthetic load curves through AdaptiveController without a camera or
+a Pi, and compare it with the fixed 96x96 @ 30 FPS configuration. The
+simulated Pi is a single inference worker fed by a camera with a bounded
+frame queue:
+
+  service time = (inference_ms * load(t) + preprocess_ms * pixels / 96^2)
+                 * throttle factor
+  temperature  = first-order model heating with worker utilization, the
+                 SoC throttles (slower service) above throttle_temp
+
+Load curves multiply the inference time (other processes competing for the
+cores) or raise the ambient temperature:
+
+  steady: constant load
+  step:   load doubles after a third of the run
+  spike:  short bursts of 3x load
+  ramp:   load rises linearly to 2.5x
+  heat:   ambient temperature climbs, passive cooling cannot keep up
+
+During a spike no operating point meets a 50 ms SLO (the inference alone
+takes 60 ms), so the controller steps down while frames queue and climbs
+back right after; each spike costs a few steps down and up, which shows in
+the change count, but no frames are dropped.
+"""
+
+import argparse
+import collections
+import json
+import math
+
+import numpy as np
+
+from adaptive_control import AdaptiveController, DEFAULT_LEVELS
+
+# Simulated Pi
+inference_ms = 20.0        # Model inference time at load 1.0
+preprocess_ms = 6.0        # Capture and scaling cost of a 96x96 frame
+queue_frames = 4           # Camera frames buffered before dropping
+ambient_temp = 45.0        # Ambient plus idle heating (C)
+heating = 40.0             # Temperature rise at 100% utilization (C)
+thermal_tau = 20.0         # Thermal time constant (s)
+throttle_temp = 80.0       # SoC throttles above this temperature (C)
+throttle_factor = 1.8      # Service time multiplier while throttled
+
+
+def load_curve(name, t, duration):
+    """(load multiplier, ambient temperature offset) at time t"""
+    if name == 'step':
+        return (2.0 if t > duration / 3 else 1.0), 0.0
+    if name == 'spike':
+        return (3.0 if t % 20.0 < 3.0 else 1.0), 0.0
+    if name == 'ramp':
+        return 1.0 + 1.5 * t / duration, 0.0
+    if name == 'heat':
+        return 1.0, 15.0 * min(t / (duration / 2), 1.0)
+    return 1.0, 0.0
+
+
+class SimulatedThermal:
+    """Temperature sensor reading the simulation's temperature"""
+
+    def __init__(self):
+        self.temperature = ambient_temp
+
+    def read(self):
+        return self.temperature
+
+
+def simulate(curve, duration, slo_ms, controller=None, seed=0):
+    """
+    Run one load curve
+
+    Returns:
+        Summary dict and per-second trace
+    """
+    rng = np.random.default_rng(seed)
+    thermal = controller.thermal if controller is not None else SimulatedThermal()
+    setting = DEFAULT_LEVELS[0]
+
+    t = 0.0
+    frame_index = 0
+    server_free = 0.0
+    busy = collections.deque()  # (start, end) of recent service intervals
+    latencies = []
+    trace = []
+    dropped = 0
+    throttled_s = 0.0
+    next_trace = 0.0
+    temps = []
+
+    while t < duration:
+        if controller is not None:
+            setting = controller.setting
+        period = 1.0 / setting.fps
+        load, ambient_offset = load_curve(curve, t, duration)
+
+        # Thermal model, updated once per captured frame
+        while busy and busy[0][1] < t - 1.0:
+            busy.popleft()
+        utilization = min(sum(min(end, t) - max(start, t - 1.0) for start, end in busy
+                              if start < t), 1.0)
+        target = ambient_temp + ambient_offset + heating * utilization
+        thermal.temperature += (target - thermal.temperature) * (1 - math.exp(-period / thermal_tau))
+        throttled = thermal.temperature > throttle_temp
+        if throttled:
+            throttled_s += period
+        temps.append(thermal.temperature)
+
+        if frame_index % setting.stride == 0:
+            waiting = max(server_free - t, 0.0) / (period * setting.stride)
+            if waiting > queue_frames:
+                dropped += 1
+            else:
+                pixels = setting.width * setting.height / (96 * 96)
+                service = (inference_ms * load + preprocess_ms * pixels) / 1000.0
+                service *= (throttle_factor if throttled else 1.0) * rng.uniform(0.9, 1.1)
+                start = max(server_free, t)
+                server_free = start + service
+                busy.append((start, server_free))
+                latency = server_free - t
+                latencies.append(latency)
+                if controller is not None:
+                    controller.update(latency, int(waiting), now=server_free)
+
+        if t >= next_trace:
+            trace.append({'t': round(t, 1), 'load': load, 'temp': round(thermal.temperature, 1),
+                          'level': controller.level if controller is not None else 0,
+                          'fps': setting.fps, 'stride': setting.stride,
+                          'latency_ms': round(latencies[-1] * 1000.0, 1) if latencies else None})
+            next_trace += 1.0
+        frame_index += 1
+        t += period
+
+    lat = np.array(latencies) * 1000.0
+    summary = {
+        'inferred_fps': len(latencies) / duration,
+        'latency_p50_ms': float(np.percentile(lat, 50)),
+        'latency_p95_ms': float(np.percentile(lat, 95)),
+        'latency_max_ms': float(lat.max()),
+        'within_slo': float(np.mean(lat <= slo_ms)),
+        'dropped': dropped,
+        'max_temp': float(max(temps)),
+        'throttled_s': throttled_s,
+        'changes': len(controller.decisions) if controller is not None else 0,
+    }
+    return summary, trace
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Simulate the adaptive frame rate controller")
+    parser.add_argument("--curves", nargs="+", default=["steady", "step", "spike", "ramp", "heat"],
+                        choices=["steady", "step", "spike", "ramp", "heat"],
+                        help="Load curves to replay (default: all)")
+    parser.add_argument("--duration", type=float, default=180.0,
+                        help="Simulated seconds per curve (default: 180)")
+    parser.add_argument("--slo-ms", type=float, default=50.0,
+                        help="Latency SLO in ms (default: 50)")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Write summaries, traces and decisions to this JSON file")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Print every controller decision")
+    return parser.parse_args()
+
+
+def main():
+    """Main application entry point"""
+    args = parse_arguments()
+    results = {}
+    print(f"{'curve':<8} {'mode':<9} {'fps':>6} {'p50 ms':>8} {'p95 ms':>8} {'in slo':>7} "
+          f"{'dropped':>8} {'max C':>6} {'throttled s':>11} {'changes':>7}")
+    for curve in args.curves:
+        results[curve] = {}
+        for mode in ("fixed", "adaptive"):
+            controller = None
+            if mode == "adaptive":
+                controller = AdaptiveController(args.slo_ms, thermal=SimulatedThermal(),
+                                                verbose=args.verbose)
+            summary, trace = simulate(curve, args.duration, args.slo_ms, controller)
+            print(f"{curve:<8} {mode:<9} {summary['inferred_fps']:>6.1f} "
+                  f"{summary['latency_p50_ms']:>8.1f} {summary['latency_p95_ms']:>8.1f} "
+                  f"{summary['within_slo'] * 100:>6.1f}% {summary['dropped']:>8} "
+                  f"{summary['max_temp']:>6.1f} {summary['throttled_s']:>11.1f} "
+                  f"{summary['changes']:>7}")
+            results[curve][mode] = {
+                'summary': summary,
+                'trace': trace,
+                'decisions': controller.decisions if controller is not None else [],
+            }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Adaptive frame rate and resolution control
+
+Closed-loop controller for the live inference path. Each frame reports its
+capture-to-result latency and the number of frames queued behind it; the
+controller also reads the SoC temperature from /sys/class/thermal. Once per
+interval it compares the 95th percentile latency against the latency SLO
+and steps along a ladder of operating points, each a capture size, capture
+frame rate and inference stride (classify every n-th frame):
+
+  - step down (cheaper) when the SLO is missed, frames queue up or the SoC
+    reaches temp_limit; two steps at temp_critical. A queue longer than
+    queue_limit is acted on immediately instead of at the next interval
+  - step up again once latency has stayed well below the SLO (headroom) and
+    the temperature below temp_limit - temp_hysteresis for upgrade_after_s
+    since the last step down, then one level per interval, so a short load
+    spike does not leave it at a low level for long. After a thermal step
+    down every step up waits upgrade_after_s, as the temperature reacts
+    slowly. An upgrade that has to be undone within upgrade_after_s doubles
+    the wait before the next one (up to max_upgrade_after_s), so it does not
+    oscillate around a limit
+  - reject() marks a capture mode the camera refused, it is skipped from
+    then on
+
+Every change is printed and can be appended to a JSON lines log. The
+temperature sensor is any object with read() returning degrees Celsius (or
+None), so tests and adaptive-control-simulation.py can substitute a model.
+"""
+
+import collections
+import glob
+import json
+import os
+import time
+
+from startup import lazy_import
+
+# Imported on first use, so the live script does not load numpy at startup
+np = lazy_import('numpy')
+
+# Capture width, capture height, capture fps, inference stride
+Setting = collections.namedtuple('Setting', ['width', 'height', 'fps', 'stride'])
+
+# Operating points from best quality to cheapest
+DEFAULT_LEVELS = [
+    Setting(96, 96, 30, 1),
+    Setting(96, 96, 30, 2),
+    Setting(64, 64, 30, 2),
+    Setting(64, 64, 20, 2),
+    Setting(48, 48, 15, 2),
+    Setting(48, 48, 10, 3),
+]
+
+
+def find_thermal_zone(root='/sys/class/thermal'):
+    """Path of the SoC temperature file (cpu/soc zone, else the first zone)"""
+    zones = sorted(glob.glob(os.path.join(root, 'thermal_zone*')))
+    for zone in zones:
+        try:
+            with open(os.path.join(zone, 'type')) as f:
+                kind = f.read().strip().lower()
+        except OSError:
+            continue
+        if 'cpu' in kind or 'soc' in kind:
+            return os.path.join(zone, 'temp')
+    return os.path.join(zones[0], 'temp') if zones else None
+
+
+class ThermalSensor:
+    def __init__(self, path=None, root='/sys/class/thermal'):
+        """
+        SoC temperature from the kernel thermal framework
+
+        Args:
+            path: Temperature file in millidegrees Celsius (default: the
+                cpu/soc thermal zone under `root`)
+            root: Thermal class directory
+        """
+        self.path = path or find_thermal_zone(root)
+
+    def read(self):
+        """Temperature in degrees Celsius, or None if unavailable"""
+        if self.path is None:
+            return None
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip()) / 1000.0
+        except (OSError, ValueError):
+            return None
+
+
+class AdaptiveController:
+    def __init__(self, target_latency_ms=50.0, levels=DEFAULT_LEVELS, thermal=None,
+                 temp_limit=75.0, temp_critical=82.0, temp_hysteresis=5.0,
+                 queue_limit=2, window=30, min_samples=5, interval_s=1.0,
+                 upgrade_after_s=3.0, max_upgrade_after_s=60.0, headroom=0.6,
+                 log_file=None, verbose=True):
+        """
+        Hold a latency SLO by trading capture rate, inference stride and
+        capture resolution
+
+        Args:
+            target_latency_ms: Latency SLO (95th percentile, capture to result)
+            levels: Operating points (Setting) from best to cheapest
+            thermal: Temperature sensor with read() (None to ignore temperature)
+            temp_limit: Step down at or above this temperature (C)
+            temp_critical: Step down two levels at or above this temperature (C)
+            temp_hysteresis: Step up only below temp_limit minus this (C)
+            queue_limit: Step down when more frames than this are queued
+            window: Number of recent latencies evaluated
+            min_samples: Latencies needed before a decision
+            interval_s: Seconds between decisions
+            upgrade_after_s: Seconds since the last step down before stepping up
+            max_upgrade_after_s: Longest wait after repeated failed upgrades
+            headroom: Step up only while p95 latency < headroom * SLO
+            log_file: Append decisions to this JSON lines file
+            verbose: Print decisions
+        """
+        self.target = target_latency_ms / 1000.0
+        self.levels = list(levels)
+        self.thermal = thermal
+        self.temp_limit = temp_limit
+        self.temp_critical = temp_critical
+        self.temp_hysteresis = temp_hysteresis
+        self.queue_limit = queue_limit
+        self.min_samples = min_samples
+        self.interval = interval_s
+        self.upgrade_after = upgrade_after_s
+        self.max_upgrade_after = max_upgrade_after_s
+        self.headroom = headroom
+        self.log_file = log_file
+        self.verbose = verbose
+        self.level = 0
+        self.latencies = collections.deque(maxlen=window)
+        self.decisions = []
+        self.temperature = None
+        self._max_queue = 0
+        self._last_eval = None
+        self._last_change = None
+        self._last_downgrade = None
+        self._last_upgrade = None
+        self._hold = upgrade_after_s
+        self._thermal = False
+        # Capture modes (width, height, fps) the camera refused
+        self.unsupported = set()
+
+    @property
+    def setting(self):
+        return self.levels[self.level]
+
+    def should_infer(self, frame_index):
+        """Whether the frame with this index is classified at the current stride"""
+        return frame_index % self.setting.stride == 0
+
+    def update(self, latency, queue_depth=0, now=None):
+        """
+        Report one classified frame
+
+        Args:
+            latency: Capture-to-result latency in seconds
+            queue_depth: Frames waiting behind this one
+            now: Current time.monotonic() (simulations pass their own clock)
+
+        Returns:
+            True if the operating point changed
+        """
+        now = time.monotonic() if now is None else now
+        if self._last_eval is None:
+            self._last_eval = self._last_change = self._last_downgrade = now
+        self.latencies.append(latency)
+        self._max_queue = max(self._max_queue, queue_depth)
+        if len(self.latencies) < self.min_samples:
+            return False
+        # A growing queue is acted on at once, everything else once per interval
+        if now - self._last_eval < self.interval and queue_depth <= self.queue_limit:
+            return False
+        self._last_eval = now
+        return self._evaluate(now)
+
+    def _evaluate(self, now):
+        p95 = float(np.percentile(self.latencies, 95))
+        queue, self._max_queue = self._max_queue, 0
+        temp = self.thermal.read() if self.thermal is not None else None
+        self.temperature = temp
+        hot = temp is not None and temp >= self.temp_limit
+
+        if temp is not None and temp >= self.temp_critical:
+            step, reason = 2, f"temperature {temp:.1f} C >= {self.temp_critical:.1f} C"
+        elif hot:
+            step, reason = 1, f"temperature {temp:.1f} C >= {self.temp_limit:.1f} C"
+        elif p95 > self.target:
+            step, reason = 1, f"latency p95 {p95 * 1000:.1f} ms > {self.target * 1000:.1f} ms"
+        elif queue > self.queue_limit:
+            step, reason = 1, f"queue depth {queue} > {self.queue_limit}"
+        elif p95 < self.headroom * self.target and queue <= 1 \
+                and (temp is None or temp < self.temp_limit - self.temp_hysteresis) \
+                and now - (self._last_change if self._thermal else self._last_downgrade) >= self._hold:
+            step, reason = -1, f"latency p95 {p95 * 1000:.1f} ms, headroom"
+        else:
+            return False
+
+        level = self._step(step)
+        if level == self.level:
+            return False
+        self._change(now, level, reason, p95, queue, temp)
+        return True
+
+    def _supported(self, level):
+        s = self.levels[level]
+        return (s.width, s.height, s.fps) not in self.unsupported
+
+    def _step(self, step):
+        """Level `step` supported levels away (positive is cheaper)"""
+        level = self.level
+        direction = 1 if step > 0 else -1
+        for _ in range(abs(step)):
+            candidates = [l for l in range(level + direction, -1 if direction < 0 else len(self.levels),
+                                           direction) if self._supported(l)]
+            if not candidates:
+                break
+            level = candidates[0]
+        return level
+
+    def reject(self, now=None):
+        """
+        The camera cannot capture at the current setting: never use its
+        capture mode again and return to the level it came from (or the
+        nearest supported one)
+
+        Returns:
+            The Setting to go back to
+        """
+        now = time.monotonic() if now is None else now
+        s = self.setting
+        self.unsupported.add((s.width, s.height, s.fps))
+        previous = self.decisions[-1]['from_level'] if self.decisions else 0
+        level = previous if self._supported(previous) else self._step(-1)
+        if not self._supported(level):
+            level = self._step(1)
+        if level != self.level:
+            self._change(now, level, f"capture {s.width}x{s.height}@{s.fps} not supported",
+                         0.0, 0, self.temperature)
+            # Going back is not an upgrade that could fail
+            self._last_upgrade = None
+        return self.setting
+
+    def _change(self, now, level, reason, p95, queue, temp):
+        decision = {
+            'time': now,
+            'from_level': self.level,
+            'to_level': level,
+            'reason': reason,
+            'latency_p95_ms': p95 * 1000.0,
+            'queue_depth': queue,
+            'temperature': temp,
+            'setting': self.levels[level]._asdict(),
+        }
+        self.decisions.append(decision)
+        if level > self.level:
+            # An upgrade undone this quickly failed; wait longer before the next
+            failed = self._last_upgrade is not None and now - self._last_upgrade < self.upgrade_after
+            self._hold = min(self._hold * 2, self.max_upgrade_after) if failed else self.upgrade_after
+            self._last_downgrade = now
+            self._thermal = reason.startswith('temperature')
+        else:
+            self._last_upgrade = now
+        self.level = level
+        self._last_change = now
+        # Latencies measured at the old operating point no longer apply
+        self.latencies.clear()
+
+        if self.verbose:
+            s = self.setting
+            print(f"Adaptive: level {decision['from_level']} -> {level} ({reason}): "
+                  f"capture {s.width}x{s.height}@{s.fps} stride {s.stride}")
+        if self.log_file:
+            with open(self.log_file, 'a') as f:
+                f.write(json.dumps(decision) + "\n")
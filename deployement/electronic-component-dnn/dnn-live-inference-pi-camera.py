@@ -1,63 +1,140 @@
+import argparse
 import os
 import sys
 import time
-import cv2
-import numpy as np
-import subprocess
-import select
-from edge_impulse_linux.runner import ImpulseRunner
+from adaptive_control import AdaptiveController, ThermalSensor
+from frame_sources import LoopStats, RecordingSource, ReplaySource
+from gst_pipeline import GstPipeline, ModelInputSpec
+from prediction_log import PredictionLog
+from sampling_profiler import install as install_profiler
+from startup import FastStartup, lazy_import, preload
+
+# Heavy modules are imported on first use, while the camera and runner start
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
 
 # Settings
 model_file = "modefied.eim"            # Trained ML model from Edge Impulse
 draw_fps = True                        # Draw FPS on screen
-res_width = 96                         # Resolution for ML model (width)
-res_height = 96                        # Resolution for ML model (height)
-capture_width = 640                    # Camera capture width
-capture_height = 480                   # Camera capture height
+res_width = 96                         # Camera capture width
+res_height = 96                        # Camera capture height
 rotation = 0                           # Camera rotation (0, 90, 180, or 270)
-img_width = 28                         # Resize width to this for inference
-img_height = 28                        # Resize height to this for inference
+img_width = 28                         # Model input width (scaled by GStreamer)
+img_height = 28                        # Model input height (scaled by GStreamer)
+preview_width = 280                    # Preview window width
+preview_height = 280                   # Preview window height
 fps = 30                               # Camera frames per second
+warmup_runs = 3                        # Dummy classifications before ready
+ready_file = "/tmp/dnn-live-inference.ready"  # Readiness probe (None to disable)
+record_file = None                     # Record captured frames to this session file
+replay_file = None                     # Replay this session instead of the camera
+replay_speed = 1.0                     # Replay speed (1.0 real-time, 0 max speed)
+headless = False                       # Do not open a preview window
+stats_file = None                      # Write FPS/latency/drop statistics (JSON)
+latency_slo_ms = None                  # Adapt capture rate/size/stride to this latency (ms)
+adaptive_log = None                    # Append adaptive control decisions (JSON lines)
+prediction_log_dir = None              # Log every prediction (binary segments) to this directory
+profile_seconds = 10                   # Duration of an on-demand profile (SIGUSR1)
+profile_socket = "/tmp/dnn-live-inference-profile.sock"  # Profiler control socket (None to disable)
+
+parser = argparse.ArgumentParser(description="Edge Impulse live inference")
+parser.add_argument("--record", default=record_file,
+                    help="Record captured frames to this session file")
+parser.add_argument("--replay", default=replay_file,
+                    help="Replay a recorded session instead of using the camera")
+parser.add_argument("--speed", type=float, default=replay_speed,
+                    help="Replay speed (1.0 real-time, 0 as fast as possible)")
+parser.add_argument("--headless", action="store_true", default=headless,
+                    help="Do not open a preview window")
+parser.add_argument("--stats", default=stats_file,
+                    help="Write loop statistics to this JSON file on exit")
+parser.add_argument("--slo-ms", type=float, default=latency_slo_ms,
+                    help="Adapt frame rate, resolution and inference stride to hold this latency")
+parser.add_argument("--adaptive-log", default=adaptive_log,
+                    help="Append adaptive control decisions to this JSON lines file")
+parser.add_argument("--log-predictions", default=prediction_log_dir,
+                    help="Log every prediction to binary segment files in this directory")
+parser.add_argument("--profile-socket", default=profile_socket,
+                    help="Control socket for on-demand profiling ('' to disable)")
+args = parser.parse_args()
+
+# kill -USR1 <pid> or sampling_profiler.py --socket profiles the running loop
+profiler = install_profiler("dnn-live-inference", seconds=profile_seconds,
+                            socket_path=args.profile_socket)
+
+# GStreamer scales, converts to grayscale and rotates; Python gets model-ready frames
+spec = ModelInputSpec(img_width, img_height, 'GRAY8')
 
-def run_gstreamer_pipeline():
-    command = [
-        'gst-launch-1.0',
-        'v4l2src', 'device=/dev/video0', '!',
-        f'video/x-raw,width=96,height=96,framerate={fps}/1', '!',
-        'videoconvert', '!',
-        'video/x-raw,format=BGR', '!',
-        'fdsink', 'fd=1'
-    ]
-    
-    return subprocess.Popen(
-        command,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        bufsize=capture_width*capture_height*3,
-        universal_newlines=False
-    )
-
-# Initialize the model runner
+def camera_pipeline(width, height, rate):
+    return GstPipeline(spec, device='/dev/video0', capture_width=width,
+                       capture_height=height, fps=rate, rotation=rotation)
+
+pipeline = camera_pipeline(res_width, res_height, fps)
+
+def prepare_features(img):
+    """Features for Edge Impulse; frames that are not model-ready (e.g. an
+    older recorded session) are converted in Python"""
+    if img.shape != (img_height, img_width):
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        img = cv2.resize(img, (img_width, img_height))
+    return (np.reshape(img, (img_width * img_height)) / 255.0).tolist()
+
+# Start the camera pipeline and initialize the model runner concurrently
 dir_path = os.path.dirname(os.path.realpath(__file__))
 model_path = os.path.join(dir_path, model_file)
-runner = ImpulseRunner(model_path)
+startup = FastStartup(model_path, None if args.replay else pipeline.open,
+                      warmup_runs=warmup_runs, ready_file=ready_file)
+timeline = startup.timeline
 
 try:
-    # Print model information
-    model_info = runner.init()
+    startup.start()
+
+    # Import cv2 and numpy while the runner initializes in the background
+    preload(cv2, np)
+    timeline.mark("imports_done")
+
+    # Warm up the model and print model information
+    runner, model_info = startup.wait_ready(feature_count=img_width*img_height)
+    # The camera started before the model was loaded; check it delivers what
+    # the model expects
+    model_spec = ModelInputSpec.from_model_info(model_info, img_width, img_height)
+    if model_spec != spec:
+        raise ValueError(f"Model expects {model_spec} frames, the pipeline delivers {spec}; "
+                         "adjust img_width and img_height")
     print("Model name:", model_info['project']['name'])
     print("Model owner:", model_info['project']['owner'])
 except Exception as e:
-    print("ERROR: Could not initialize model")
+    print("ERROR: Could not initialize camera or model")
     print("Exception:", e)
-    if runner:
-        runner.stop()
+    startup.stop()
+    profiler.close()
     sys.exit(1)
 
-# Initialize GStreamer pipeline
-process = run_gstreamer_pipeline()
-poller = select.poll()
-poller.register(process.stdout, select.POLLIN)
+# Frame source: camera pipeline or recorded session, optionally recorded
+if args.replay:
+    source = ReplaySource(args.replay, speed=args.speed)
+else:
+    source = startup.source
+    print("Pipeline:", pipeline.describe())
+if args.record:
+    source = RecordingSource(source, args.record)
+stats = LoopStats()
+
+# Closed-loop control of capture rate, capture size and inference stride
+controller = None
+if args.slo_ms:
+    controller = AdaptiveController(args.slo_ms, thermal=ThermalSensor(),
+                                    log_file=args.adaptive_log)
+    capture = (res_width, res_height, fps)
+frame_index = 0
+res = None
+
+# Predictions are written in batches by a background thread
+predictions_log = None
+if args.log_predictions:
+    predictions_log = PredictionLog(args.log_predictions,
+                                    model_info['model_parameters']['labels'])
 
 print("Streaming - Press 'q' to quit")
 current_fps = 0
@@ -67,87 +144,129 @@ try:
         # Get timestamp for calculating actual framerate
         timestamp = cv2.getTickCount()
         
-        # Check if frame is available
-        if not poller.poll(100):  # 100ms timeout
-            continue
-            
-        # Read raw frame data
-        raw_frame = process.stdout.read(capture_width*capture_height*3)
-        if not raw_frame or len(raw_frame) != capture_width*capture_height*3:
+        # Read frame
+        ret, img = source.read()
+        if not ret:
             print("Frame read error")
             break
+        timeline.mark_once("first_frame")
 
-        # Convert to numpy array and reshape
-        img = np.frombuffer(raw_frame, dtype=np.uint8)
-        img = img.reshape((capture_height, capture_width, 3)).copy()
-
-
-        # Rotate image if needed
-        if rotation == 90:
-            img = cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE)
-        elif rotation == 180:
-            img = cv2.rotate(img, cv2.ROTATE_180)
-        elif rotation == 270:
-            img = cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE)
-        elif rotation != 0:
-            print("ERROR: rotation not supported. Must be 0, 90, 180, or 270.")
-            break
-
-        # Convert image to grayscale
-        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Resize captured image for model
-        img_resize = cv2.resize(img_gray, (img_width, img_height))
-        
         # Prepare features for Edge Impulse
-        features = np.reshape(img_resize, (img_width * img_height)) / 255.0
-        features = features.tolist()
+        features = prepare_features(img)
         
-        # Perform inference
-        res = None
-        try:
-            res = runner.classify(features)
-        except Exception as e:
-            print("ERROR: Could not perform inference")
-            print("Exception:", e)
-            continue
-            
-        # Display predictions
-        if res is not None:
-            predictions = res['result']['classification']
-            max_label = max(predictions, key=predictions.get)
-            max_val = predictions[max_label]
+        # Perform inference (on every stride-th frame when adaptive)
+        inferred = controller is None or controller.should_infer(frame_index)
+        frame_index += 1
+        if inferred:
+            res = None
+            try:
+                res = runner.classify(features)
+            except Exception as e:
+                print("ERROR: Could not perform inference")
+                print("Exception:", e)
+                continue
             
+        if inferred and res is not None and predictions_log is not None:
+            try:
+                predictions_log.log_result(res)
+            except RuntimeError as e:
+                # Keep classifying without the log
+                print("ERROR: Could not log predictions")
+                print("Exception:", e)
+                predictions_log = None
+
+        if res is not None and "first_result" not in timeline.events:
+            timeline.mark("first_result")
+            print(timeline.report())
+
+        # Show the (enlarged) model input with predictions and framerate
+        if not args.headless:
+            display = cv2.resize(img, (preview_width, preview_height),
+                                 interpolation=cv2.INTER_NEAREST)
+            if display.ndim == 2:
+                display = cv2.cvtColor(display, cv2.COLOR_GRAY2BGR)
+
             # Draw prediction on frame
-            cv2.putText(img, f"{max_label}: {max_val:.2f}",
-                        (10, capture_height - 10),
-                        cv2.FONT_HERSHEY_PLAIN,
-                        1,
-                        (255, 255, 255),
-                        1)
-        
-        # Draw framerate
-        if draw_fps:
-            cv2.putText(img, f"FPS: {current_fps:.1f}",
-                        (10, 20),
-                        cv2.FONT_HERSHEY_PLAIN,
-                        1,
-                        (255, 255, 255),
-                        1)
-        
-        # Show the frame
-        cv2.imshow("Edge Impulse Classification", img)
+            if res is not None:
+                predictions = res['result']['classification']
+                max_label = max(predictions, key=predictions.get)
+                max_val = predictions[max_label]
+                cv2.putText(display, f"{max_label}: {max_val:.2f}",
+                            (10, preview_height - 10),
+                            cv2.FONT_HERSHEY_PLAIN,
+                            1,
+                            (255, 255, 255),
+                            1)
+
+            # Draw framerate
+            if draw_fps:
+                cv2.putText(display, f"FPS: {current_fps:.1f}",
+                            (10, 20),
+                            cv2.FONT_HERSHEY_PLAIN,
+                            1,
+                            (255, 255, 255),
+                            1)
+
+            cv2.imshow("Edge Impulse Classification", display)
         
         # Calculate framerate
         frame_time = (cv2.getTickCount() - timestamp) / cv2.getTickFrequency()
         current_fps = 1 / frame_time
+        stats.record(source.timestamp)
+
+        # Adapt to the measured latency, frame backlog and SoC temperature
+        if controller is not None and inferred and source.timestamp is not None:
+            camera = getattr(source, 'source', source)
+            queued = camera.queued() if hasattr(camera, 'queued') else 0
+            if controller.update(time.monotonic() - source.timestamp, queued):
+                setting = controller.setting
+                if not args.replay and (setting.width, setting.height, setting.fps) != capture:
+                    # New capture caps need a new pipeline; the device can
+                    # only be opened once, so the old one goes first
+                    camera.release()
+                    try:
+                        pipeline = camera_pipeline(setting.width, setting.height, setting.fps)
+                        camera = pipeline.open()
+                        capture = (setting.width, setting.height, setting.fps)
+                    except RuntimeError as e:
+                        print(f"Capture {setting.width}x{setting.height}@{setting.fps} failed, "
+                              "restoring the previous setting")
+                        print("Exception:", e)
+                        # Go back up to the level the camera accepted
+                        controller.reject()
+                        pipeline = camera_pipeline(*capture)
+                        try:
+                            camera = pipeline.open()
+                        except RuntimeError as e:
+                            print("ERROR: Could not reopen the camera")
+                            print("Exception:", e)
+                            break
+                    if isinstance(source, RecordingSource):
+                        source.source = camera
+                    else:
+                        source = camera
         
         # Exit on 'q' key
-        if cv2.waitKey(1) == ord('q'):
+        if not args.headless and cv2.waitKey(1) == ord('q'):
             break
 
+except KeyboardInterrupt:
+    pass
+
 finally:
     # Clean up
-    process.terminate()
+    replay = source if isinstance(source, ReplaySource) else getattr(source, 'source', None)
+    print(stats.report(replay))
+    if args.stats:
+        stats.save(args.stats, replay)
+    source.release()
+    if predictions_log is not None:
+        try:
+            predictions_log.close()
+        except RuntimeError as e:
+            print("ERROR: Could not log predictions")
+            print("Exception:", e)
+        print(f"Logged {predictions_log.written} predictions to {args.log_predictions}")
     cv2.destroyAllWindows()
-    runner.stop()
\ No newline at end of file
+    startup.stop()
+    profiler.close()
\ No newline at end of file
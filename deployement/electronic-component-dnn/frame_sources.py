@@ -0,0 +1,489 @@
+"""
+Frame sources, session recording and replay
+
+All sources follow the cv2.VideoCapture interface (read(), isOpened(),
+release()) so they can be swapped into the existing capture loops:
+
+  PipeSource:      raw frames from a gst-launch-1.0 ... ! fdsink pipe
+  RecordingSource: wraps another source and records every frame it returns
+  ReplaySource:    plays back a recorded session at real-time, accelerated or
+                   maximum speed
+  SyntheticSource: generated frames paced like a camera, standing in for
+                   cameras in tests and benchmarks
+
+Recorded sessions are stored in a compact chunked file:
+
+  header: magic b'FRMS' | version u16 | height u16 | width u16 | channels u16
+  chunk:  frame count u32 | timestamps f64[count] | frames u8[count, H, W, C]
+
+Frames are written in chunks so recording costs one write per chunk, and the
+reader can memory-map the file and return frames as zero-copy views.
+
+Each source keeps `timestamp`, the time.monotonic() capture time of the last
+frame returned, so loops can measure end-to-end latency with LoopStats.
+"""
+
+import argparse
+import fcntl
+import json
+import mmap
+import os
+import struct
+import termios
+import time
+
+from startup import lazy_import
+
+# Imported on first use, so opening a camera does not wait for numpy
+np = lazy_import('numpy')
+
+MAGIC = b'FRMS'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sHHHH')
+CHUNK_HEADER = struct.Struct('<I')
+
+
+class PipeSource:
+    def __init__(self, process, width, height, channels=3, stream=None, stride=None):
+        """
+        Read fixed-size raw frames from a GStreamer subprocess
+
+        Args:
+            process: subprocess.Popen of the pipeline
+            width: Frame width in pixels
+            height: Frame height in pixels
+            channels: Bytes per pixel (3 for BGR, 1 for GRAY8)
+            stream: Binary file the frames are read from (default: the
+                process's stdout)
+            stride: Bytes per row including GStreamer's padding (default:
+                width * channels)
+        """
+        self.process = process
+        self.stream = stream if stream is not None else process.stdout
+        # Read unbuffered, so every waiting byte is still in the pipe where
+        # queued() can count it
+        self._raw = getattr(self.stream, 'raw', self.stream)
+        self.shape = (height, width, channels) if channels > 1 else (height, width)
+        self.row_size = width * channels
+        self.stride = stride or self.row_size
+        self.frame_size = self.stride * height
+        self.timestamp = None
+
+    def isOpened(self):
+        return self.process is not None and self.process.poll() is None
+
+    def read(self):
+        raw_frame = bytearray(self.frame_size)
+        view = memoryview(raw_frame)
+        received = 0
+        while received < self.frame_size:
+            count = self._raw.readinto(view[received:])
+            if not count:
+                return False, None
+            received += count
+        self.timestamp = time.monotonic()
+        frame = np.frombuffer(raw_frame, dtype=np.uint8)
+        if self.stride != self.row_size:
+            # Drop the row padding
+            frame = frame.reshape(self.shape[0], self.stride)[:, :self.row_size]
+        return True, frame.reshape(self.shape).copy()
+
+    def queued(self):
+        """Complete frames already waiting in the pipe"""
+        try:
+            available = fcntl.ioctl(self._raw.fileno(), termios.FIONREAD, b'\0\0\0\0')
+        except (OSError, ValueError):
+            return 0
+        return struct.unpack('i', available)[0] // self.frame_size
+
+    def release(self):
+        if self.process is not None:
+            self.process.terminate()
+            if self.stream is not self.process.stdout:
+                self.stream.close()
+            self.process = None
+
+
+class SessionRecorder:
+    def __init__(self, path, frame_shape, chunk_frames=64):
+        """
+        Write frames and capture timestamps to a chunked session file
+
+        Args:
+            path: Output file
+            frame_shape: (height, width) or (height, width, channels)
+            chunk_frames: Frames buffered in memory per chunk write
+        """
+        height, width = frame_shape[:2]
+        channels = frame_shape[2] if len(frame_shape) > 2 else 1
+        self.frame_shape = tuple(frame_shape)
+        self.chunk_frames = chunk_frames
+        self._frames = np.empty((chunk_frames, *self.frame_shape), dtype=np.uint8)
+        self._timestamps = np.empty(chunk_frames, dtype='<f8')
+        self._count = 0
+        self.frames_written = 0
+        self._file = open(path, 'wb')
+        self._file.write(FILE_HEADER.pack(MAGIC, VERSION, height, width, channels))
+
+    def write(self, frame, timestamp=None):
+        """Append one frame; `timestamp` defaults to time.monotonic()"""
+        if frame.shape != self.frame_shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match {self.frame_shape}")
+        self._frames[self._count] = frame
+        self._timestamps[self._count] = time.monotonic() if timestamp is None else timestamp
+        self._count += 1
+        if self._count == self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        """Write buffered frames as one chunk"""
+        if self._count == 0:
+            return
+        self._file.write(CHUNK_HEADER.pack(self._count))
+        self._file.write(self._timestamps[:self._count].tobytes())
+        self._file.write(self._frames[:self._count].tobytes())
+        self.frames_written += self._count
+        self._count = 0
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SessionReader:
+    def __init__(self, path, use_mmap=True):
+        """
+        Random access to a recorded session
+
+        Args:
+            path: Session file written by SessionRecorder
+            use_mmap: Memory-map the file and return zero-copy frame views
+                instead of reading it into memory
+        """
+        self._file = open(path, 'rb')
+        if use_mmap:
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._buffer = self._file.read()
+
+        magic, version, height, width, channels = FILE_HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a recorded session (version {VERSION})")
+        self.frame_shape = (height, width, channels) if channels > 1 else (height, width)
+        frame_size = height * width * channels
+
+        # Index chunks by walking the chunk headers
+        chunks = []
+        timestamps = []
+        offset = FILE_HEADER.size
+        while offset + CHUNK_HEADER.size <= len(self._buffer):
+            (count,) = CHUNK_HEADER.unpack_from(self._buffer, offset)
+            if offset + CHUNK_HEADER.size + count * (8 + frame_size) > len(self._buffer):
+                break
+            offset += CHUNK_HEADER.size
+            timestamps.append(np.frombuffer(self._buffer, dtype='<f8', count=count, offset=offset))
+            offset += 8 * count
+            frames = np.frombuffer(self._buffer, dtype=np.uint8, count=count * frame_size,
+                                   offset=offset)
+            chunks.append(frames.reshape(count, *self.frame_shape))
+            offset += count * frame_size
+        # A recording cut off mid-chunk (Ctrl-C, power loss) keeps its
+        # complete chunks
+        self.truncated = offset < len(self._buffer)
+
+        self._chunks = chunks
+        self._chunk_starts = np.cumsum([0] + [len(c) for c in chunks])
+        self.timestamps = np.concatenate(timestamps) if timestamps else np.empty(0)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def frame(self, index):
+        """Frame `index` (a read-only view when memory-mapped)"""
+        chunk = int(np.searchsorted(self._chunk_starts, index, side='right')) - 1
+        return self._chunks[chunk][index - self._chunk_starts[chunk]]
+
+    def __iter__(self):
+        for chunk, start in zip(self._chunks, self._chunk_starts):
+            for i, frame in enumerate(chunk):
+                yield self.timestamps[start + i], frame
+
+    def duration(self):
+        return float(self.timestamps[-1] - self.timestamps[0]) if len(self) > 1 else 0.0
+
+    def close(self):
+        # Drop numpy views before closing the map
+        self._chunks = []
+        self.timestamps = np.empty(0)
+        if isinstance(self._buffer, mmap.mmap):
+            try:
+                self._buffer.close()
+            except BufferError:
+                # Frames handed out without copying are still alive; the map
+                # is released when they are garbage collected
+                pass
+        self._file.close()
+
+
+class RecordingSource:
+    def __init__(self, source, path, chunk_frames=64):
+        """
+        Pass frames through from `source` while recording them to `path`
+
+        The recorder is created on the first frame so the frame shape does not
+        have to be known in advance.
+        """
+        self.source = source
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.recorder = None
+        self.timestamp = None
+
+    def isOpened(self):
+        return self.source.isOpened()
+
+    def read(self):
+        ret, frame = self.source.read()
+        if ret:
+            self.timestamp = getattr(self.source, 'timestamp', None) or time.monotonic()
+            if self.recorder is None:
+                self.recorder = SessionRecorder(self.path, frame.shape, self.chunk_frames)
+            self.recorder.write(frame, self.timestamp)
+        return ret, frame
+
+    def release(self):
+        if self.recorder is not None:
+            self.recorder.close()
+        self.source.release()
+
+
+class ReplaySource:
+    def __init__(self, path, speed=1.0, loop=False, use_mmap=True, copy=True):
+        """
+        Play back a recorded session like a live camera
+
+        Args:
+            path: Session file written by SessionRecorder
+            speed: Playback speed relative to the recording (1.0 real-time,
+                2.0 twice as fast, 0 as fast as frames are read)
+            loop: Restart from the first frame at the end of the session
+            use_mmap: Memory-map the session file
+            copy: Return writable copies (False returns read-only views,
+                which is faster but breaks in-place drawing on the frame)
+
+        When paced (speed > 0) and the consumer falls behind, frames that are
+        already superseded by a newer frame are skipped and counted in
+        `dropped`, like a camera appsink with drop=true.
+        """
+        self.reader = SessionReader(path, use_mmap=use_mmap)
+        self.speed = speed
+        self.loop = loop
+        self.copy = copy
+        self.index = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.timestamp = None
+        self._start = None
+        self._offsets = self.reader.timestamps - self.reader.timestamps[0] \
+            if len(self.reader) else self.reader.timestamps
+
+    def isOpened(self):
+        return self.reader is not None and (self.loop or self.index < len(self.reader))
+
+    def _restart(self):
+        self.index = 0
+        self._start = time.monotonic()
+
+    def read(self):
+        if self.index >= len(self.reader):
+            if not self.loop or len(self.reader) == 0:
+                return False, None
+            self._restart()
+
+        if self.speed <= 0:
+            self.timestamp = time.monotonic()
+        else:
+            if self._start is None:
+                self._start = time.monotonic()
+            elapsed = (time.monotonic() - self._start) * self.speed
+            # Skip frames whose successor is already due
+            latest = int(np.searchsorted(self._offsets, elapsed, side='right')) - 1
+            if latest > self.index:
+                self.dropped += latest - self.index
+                self.index = latest
+            due = self._start + self._offsets[self.index] / self.speed
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self.timestamp = due
+
+        frame = self.reader.frame(self.index)
+        if self.copy:
+            frame = frame.copy()
+        self.index += 1
+        self.delivered += 1
+        return True, frame
+
+    def release(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+
+class SyntheticSource:
+    def __init__(self, width=28, height=28, channels=1, fps=30.0, frames=None,
+                 seed=0, patterns=16):
+        """
+        Camera stand-in producing random frames at a fixed rate
+
+        Args:
+            width: Frame width in pixels
+            height: Frame height in pixels
+            channels: 1 for grayscale frames, 3 for BGR
+            fps: Frame rate (0 produces frames as fast as they are read)
+            frames: Stop after this many frames (None for endless)
+            seed: Seed of the generated frames
+            patterns: Number of distinct frames, cycled through
+
+        Like a live camera, a frame that is not read before the next one is
+        due is skipped and counted in `dropped`.
+        """
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        rng = np.random.default_rng(seed)
+        self.patterns = rng.integers(0, 256, size=(patterns, *shape), dtype=np.uint8)
+        self.fps = fps
+        self.frames = frames
+        self.index = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.timestamp = None
+        self._start = None
+        self._open = True
+
+    def isOpened(self):
+        return self._open and (self.frames is None or self.index < self.frames)
+
+    def read(self):
+        if not self.isOpened():
+            return False, None
+
+        if self.fps <= 0:
+            self.timestamp = time.monotonic()
+        else:
+            if self._start is None:
+                self._start = time.monotonic()
+            latest = int((time.monotonic() - self._start) * self.fps)
+            if latest > self.index:
+                self.dropped += latest - self.index
+                self.index = latest
+            if self.frames is not None and self.index >= self.frames:
+                return False, None
+            due = self._start + self.index / self.fps
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self.timestamp = due
+
+        frame = self.patterns[self.index % len(self.patterns)].copy()
+        self.index += 1
+        self.delivered += 1
+        return True, frame
+
+    def release(self):
+        self._open = False
+
+
+class LoopStats:
+    def __init__(self):
+        """Collect per-frame latency and throughput of a capture loop"""
+        self.latencies = []
+        self.first = None
+        self.last = None
+
+    def record(self, capture_timestamp):
+        """Record a frame captured at `capture_timestamp` that is done now"""
+        now = time.monotonic()
+        if self.first is None:
+            self.first = now
+        self.last = now
+        if capture_timestamp is not None:
+            self.latencies.append(now - capture_timestamp)
+
+    def summary(self, source=None):
+        """FPS, latency percentiles and drop counts as a dict"""
+        frames = len(self.latencies)
+        elapsed = (self.last - self.first) if frames > 1 else 0.0
+        stats = {'frames': frames, 'fps': (frames - 1) / elapsed if elapsed > 0 else 0.0}
+        if frames:
+            lat = np.array(self.latencies) * 1000.0
+            stats.update({
+                'latency_p50_ms': float(np.percentile(lat, 50)),
+                'latency_p95_ms': float(np.percentile(lat, 95)),
+                'latency_p99_ms': float(np.percentile(lat, 99)),
+                'latency_max_ms': float(lat.max()),
+            })
+        if isinstance(source, (ReplaySource, SyntheticSource)):
+            stats['dropped'] = source.dropped
+            stats['drop_ratio'] = source.dropped / max(source.dropped + source.delivered, 1)
+        return stats
+
+    def report(self, source=None):
+        lines = ["Loop statistics:"]
+        for key, value in self.summary(source).items():
+            lines.append(f"  {key:<16} {value:.2f}" if isinstance(value, float)
+                         else f"  {key:<16} {value}")
+        return "\n".join(lines)
+
+    def save(self, path, source=None):
+        with open(path, 'w') as f:
+            json.dump(self.summary(source), f, indent=2)
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Inspect or benchmark a recorded session")
+    parser.add_argument("session", type=str, help="Recorded session file")
+    parser.add_argument("--speed", type=float, default=0,
+                        help="Replay speed for the read benchmark (default: 0, max)")
+    parser.add_argument("--no-mmap", action="store_false", dest="use_mmap",
+                        help="Read the file into memory instead of memory-mapping it")
+    return parser.parse_args()
+
+
+def main():
+    """Print session information and replay it without a consumer"""
+    args = parse_arguments()
+    reader = SessionReader(args.session, use_mmap=args.use_mmap)
+    size = os.path.getsize(args.session)
+    print(f"Session: {args.session}")
+    print(f"  Frames:     {len(reader)}")
+    print(f"  Frame size: {reader.frame_shape}")
+    print(f"  Duration:   {reader.duration():.2f} s")
+    if reader.duration() > 0:
+        print(f"  Recorded:   {(len(reader) - 1) / reader.duration():.1f} FPS")
+    print(f"  File size:  {size / 1e6:.1f} MB")
+    if reader.truncated:
+        print("  Truncated:  incomplete last chunk ignored")
+    reader.close()
+
+    source = ReplaySource(args.session, speed=args.speed, use_mmap=args.use_mmap, copy=False)
+    stats = LoopStats()
+    while True:
+        ret, _ = source.read()
+        if not ret:
+            break
+        stats.record(source.timestamp)
+    print(stats.report(source))
+    source.release()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+GStreamer Pipeline Benchmark
+
+Compare the CPU cost per frame of preparing model input in Python (capture
+BGR, then cv2 grayscale + resize, as the live script used to) against the
+caps-negotiated pipeline that scales and converts inside GStreamer. Uses
+videotestsrc, so no camera is needed. CPU time of the Python process and of
+the gst-launch-1.0 child are reported separately.
+"""
+
+import argparse
+import resource
+import time
+
+import cv2
+import numpy as np
+
+from gst_pipeline import GstPipeline, ModelInputSpec, source_element
+
+# Settings
+capture_width = 640
+capture_height = 480
+img_width = 28
+img_height = 28
+
+
+def child_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run(pipeline, frames, python_preprocess):
+    """Read `frames` frames, build features, return CPU and wall time stats"""
+    child_start = child_cpu()
+    cpu_start = time.process_time()
+    t_start = time.perf_counter()
+
+    source = pipeline.open()
+    count = 0
+    while count < frames:
+        ret, img = source.read()
+        if not ret:
+            break
+        if python_preprocess:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            img = cv2.resize(img, (img_width, img_height))
+        features = (np.reshape(img, (img_width * img_height)) / 255.0).tolist()
+        count += 1
+
+    elapsed = time.perf_counter() - t_start
+    python_cpu = time.process_time() - cpu_start
+    source.process.wait()
+    source.release()
+    gst_cpu = child_cpu() - child_start
+    if count == 0:
+        # The pipeline ended before delivering a frame
+        nan = float('nan')
+        return {'frames': 0, 'fps': 0.0, 'python_ms': nan, 'gst_ms': nan, 'total_ms': nan}
+    assert len(features) == img_width * img_height
+    return {
+        'frames': count,
+        'fps': count / elapsed,
+        'python_ms': python_cpu / count * 1000.0,
+        'gst_ms': gst_cpu / count * 1000.0,
+        'total_ms': (python_cpu + gst_cpu) / count * 1000.0,
+    }
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="CPU per frame: Python vs GStreamer preprocessing")
+    parser.add_argument("--frames", type=int, default=500,
+                        help="Frames per run (default: 500)")
+    parser.add_argument("--fps", type=int, default=30,
+                        help="Source frame rate caps (default: 30)")
+    parser.add_argument("--live", action="store_true",
+                        help="Pace videotestsrc at --fps instead of running flat out")
+    return parser.parse_args()
+
+
+def main():
+    """Main application entry point"""
+    args = parse_arguments()
+    spec = ModelInputSpec(img_width, img_height, 'GRAY8')
+    options = dict(source='test', capture_width=capture_width, capture_height=capture_height,
+                   fps=args.fps, num_buffers=args.frames, live=args.live)
+
+    # Previous approach: full-size BGR frames, preprocessing in Python
+    legacy = GstPipeline(spec, elements=[
+        source_element('test', num_buffers=args.frames, live=args.live),
+        [f'video/x-raw,width={capture_width},height={capture_height},framerate={args.fps}/1'],
+        ['videoconvert'],
+        ['video/x-raw,format=BGR'],
+    ])
+    negotiated = GstPipeline(spec, **options)
+
+    print(f"videotestsrc {capture_width}x{capture_height} -> {spec}, {args.frames} frames")
+    print(f"{'pipeline':<12} {'fps':>8} {'python ms':>10} {'gst ms':>8} {'total ms':>9}")
+    for name, pipeline, python_preprocess in (("python", legacy, True),
+                                              ("gstreamer", negotiated, False)):
+        r = run(pipeline, args.frames, python_preprocess)
+        print(f"{name:<12} {r['fps']:>8.1f} {r['python_ms']:>10.3f} {r['gst_ms']:>8.3f} "
+              f"{r['total_ms']:>9.3f}")
+    print(f"\nNegotiated pipeline: {negotiated.describe()}")
+    print(f"Negotiated caps: {negotiated.caps}")
+
+
+if __name__ == "__main__":
+    main()
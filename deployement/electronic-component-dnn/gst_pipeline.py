@@ -0,0 +1,237 @@
+"""
+GStreamer pipeline builder that delivers model-ready frames
+
+Instead of capturing full BGR frames and converting, rotating and resizing
+them in Python, the pipeline is built from the model input spec so GStreamer
+does the work: the camera frame is scaled to the model size first (while it
+is still in the camera's native format), then converted to GRAY8 or BGR and
+rotated with videoflip. Python only reads width * height * channels bytes.
+
+The pipeline is launched with `gst-launch-1.0 -v`, which prints the caps
+negotiated on every pad. Frames go to a separate pipe (fdsink fd=N) so that
+output never mixes with the frame data, and the frame size is computed from
+the caps negotiated on the fdsink, including GStreamer's 4-byte row stride.
+
+Note that GRAY8 from videoconvert is the luma plane of the camera image,
+which can differ slightly from cv2.COLOR_BGR2GRAY on the converted BGR frame.
+"""
+
+import os
+import re
+import subprocess
+import threading
+from fractions import Fraction
+
+from frame_sources import PipeSource
+
+# Bytes per pixel of the supported output formats
+FORMAT_CHANNELS = {'GRAY8': 1, 'BGR': 3, 'RGB': 3}
+
+# videoflip methods for the supported rotations
+FLIP_METHODS = {90: 'clockwise', 180: 'rotate-180', 270: 'counterclockwise'}
+
+# Caps line printed by gst-launch-1.0 -v for the fdsink's sink pad
+_FDSINK_CAPS = re.compile(r'GstFdSink:[\w-]+\.GstPad:sink: caps = (.+)$')
+_CAPS_FIELD = re.compile(r'([\w-]+)=\((\w+)\)([^,]+)')
+
+
+class ModelInputSpec:
+    def __init__(self, width=28, height=28, format='GRAY8'):
+        """
+        Frame size and pixel format the model expects
+
+        Args:
+            width: Model input width
+            height: Model input height
+            format: GStreamer raw video format (GRAY8, BGR or RGB)
+        """
+        if format not in FORMAT_CHANNELS:
+            raise ValueError(f"Unsupported format {format}, must be one of {list(FORMAT_CHANNELS)}")
+        self.width = width
+        self.height = height
+        self.format = format
+
+    @property
+    def channels(self):
+        return FORMAT_CHANNELS[self.format]
+
+    @classmethod
+    def from_model_info(cls, model_info, default_width=28, default_height=28):
+        """Spec from the model_info returned by ImpulseRunner.init()"""
+        params = model_info.get('model_parameters', {})
+        channels = params.get('image_channel_count', 1)
+        return cls(params.get('image_input_width', default_width) or default_width,
+                   params.get('image_input_height', default_height) or default_height,
+                   'GRAY8' if channels == 1 else 'BGR')
+
+    def __eq__(self, other):
+        return isinstance(other, ModelInputSpec) and \
+            (self.width, self.height, self.format) == (other.width, other.height, other.format)
+
+    def __repr__(self):
+        return f"ModelInputSpec({self.width}x{self.height} {self.format})"
+
+
+def parse_caps(caps):
+    """Parse a caps string like 'video/x-raw, format=(string)GRAY8, width=(int)28'"""
+    fields = {'media': caps.split(',', 1)[0].strip()}
+    for key, kind, value in _CAPS_FIELD.findall(caps):
+        value = value.strip()
+        fields[key] = int(value) if kind == 'int' else value
+    return fields
+
+
+def frame_layout(format, width, height):
+    """(row stride, frame size) in bytes; GStreamer pads rows to 4 bytes"""
+    stride = (width * FORMAT_CHANNELS[format] + 3) & ~3
+    return stride, stride * height
+
+
+def caps_fraction(value):
+    """Caps fraction for a rate such as 30, 30.0 or 29.97 ('30/1', '2997/100')"""
+    rate = Fraction(value).limit_denominator(1001)
+    return f"{rate.numerator}/{rate.denominator}"
+
+
+def source_element(source='v4l2', device='/dev/video0', num_buffers=None, live=True):
+    """Camera ('v4l2') or videotestsrc ('test') element"""
+    if source == 'test':
+        element = ['videotestsrc', f'is-live={str(live).lower()}']
+    else:
+        element = ['v4l2src', f'device={device}']
+    if num_buffers:
+        element.append(f'num-buffers={num_buffers}')
+    return element
+
+
+def pipeline_elements(spec, source='v4l2', device='/dev/video0', capture_width=None,
+                      capture_height=None, fps=30, rotation=0, scale_method='bilinear',
+                      num_buffers=None, live=True):
+    """
+    Pipeline description from source to model-ready caps (without the sink)
+
+    Args:
+        spec: ModelInputSpec of the frames to deliver
+        source: 'v4l2' for a camera or 'test' for videotestsrc
+        device: V4L2 device
+        capture_width: Camera capture width (None lets the camera choose)
+        capture_height: Camera capture height
+        fps: Camera frame rate
+        rotation: 0, 90, 180 or 270 degrees clockwise
+        scale_method: videoscale interpolation method
+        num_buffers: Stop after this many frames (None for endless)
+        live: Pace videotestsrc like a camera (False produces frames as fast
+            as possible)
+
+    Returns:
+        List of elements, each a list of tokens for gst-launch-1.0
+    """
+    if rotation not in (0, 90, 180, 270):
+        raise ValueError("rotation not supported. Must be 0, 90, 180, or 270.")
+
+    elements = [source_element(source, device, num_buffers, live)]
+
+    capture_caps = f'video/x-raw,framerate={caps_fraction(fps)}'
+    if capture_width and capture_height:
+        capture_caps += f',width={capture_width},height={capture_height}'
+    elements.append([capture_caps])
+
+    # Scale before rotating so the flip only touches the small frame
+    width, height = spec.width, spec.height
+    if rotation in (90, 270):
+        width, height = height, width
+    elements.append(['videoscale', f'method={scale_method}', 'add-borders=false'])
+    elements.append([f'video/x-raw,width={width},height={height}'])
+    elements.append(['videoconvert'])
+    if rotation:
+        elements.append(['videoflip', f'method={FLIP_METHODS[rotation]}'])
+    elements.append([f'video/x-raw,format={spec.format},width={spec.width},'
+                     f'height={spec.height},pixel-aspect-ratio=1/1'])
+    return elements
+
+
+def gst_launch_command(elements, sink, verbose=True):
+    """gst-launch-1.0 argument list linking `elements` and `sink` with '!'"""
+    command = ['gst-launch-1.0']
+    if verbose:
+        command.append('-v')
+    for element in elements + [sink]:
+        command.extend(element)
+        command.append('!')
+    return command[:-1]
+
+
+class GstPipeline:
+    def __init__(self, spec, caps_timeout=10.0, elements=None, **options):
+        """
+        Launch a caps-negotiating pipeline that writes model-ready frames
+
+        Args:
+            spec: ModelInputSpec of the frames to deliver
+            caps_timeout: Seconds to wait for caps negotiation
+            elements: Use these elements instead of building them from spec
+            **options: Passed to pipeline_elements() (source, device,
+                capture_width, capture_height, fps, rotation, scale_method,
+                num_buffers, live)
+        """
+        self.spec = spec
+        self.caps_timeout = caps_timeout
+        self.elements = elements
+        self.options = options
+        self.process = None
+        self.caps = None
+        self._caps_found = threading.Event()
+        self._log = []
+
+    def command(self, fd=1):
+        elements = self.elements or pipeline_elements(self.spec, **self.options)
+        return gst_launch_command(elements, ['fdsink', f'fd={fd}', 'sync=false'])
+
+    def describe(self):
+        """Pipeline description as it would be typed for gst-launch-1.0"""
+        return ' '.join(self.command()[2:])
+
+    def _watch_output(self, process, caps_found, log):
+        """Read gst-launch's text output, looking for the fdsink caps"""
+        for line in iter(process.stdout.readline, b''):
+            line = line.decode('utf-8', 'replace').rstrip()
+            log.append(line)
+            del log[:-50]
+            match = _FDSINK_CAPS.search(line)
+            if match and not caps_found.is_set():
+                self.caps = parse_caps(match.group(1))
+                caps_found.set()
+        caps_found.set()
+
+    def open(self):
+        """
+        Start the pipeline and wait for caps negotiation
+
+        Returns:
+            PipeSource reading frames of the negotiated size
+        """
+        # Fresh state per launch; a watcher of a previous launch keeps its own
+        self.caps = None
+        self._caps_found = threading.Event()
+        self._log = []
+        read_fd, write_fd = os.pipe()
+        self.process = subprocess.Popen(
+            self.command(write_fd),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            pass_fds=(write_fd,)
+        )
+        os.close(write_fd)
+        threading.Thread(target=self._watch_output,
+                         args=(self.process, self._caps_found, self._log), daemon=True).start()
+
+        if not self._caps_found.wait(self.caps_timeout) or self.caps is None:
+            self.process.terminate()
+            os.close(read_fd)
+            raise RuntimeError("GStreamer caps negotiation failed:\n" + "\n".join(self._log))
+
+        fmt, width, height = self.caps['format'], self.caps['width'], self.caps['height']
+        stride, frame_size = frame_layout(fmt, width, height)
+        stream = os.fdopen(read_fd, 'rb', buffering=frame_size)
+        return PipeSource(self.process, width, height, FORMAT_CHANNELS[fmt],
+                          stream=stream, stride=stride)
@@ -0,0 +1,451 @@
+"""
+Inference Service
+
+Serve the Edge Impulse classifier to other local processes over a Unix or TCP
+socket using asyncio. Clients send raw uint8 grayscale frames (28x28 by
+default) in a compact binary format. Requests that arrive close together are
+coalesced into micro-batches and identical frames within a batch are
+classified only once. A bounded queue rejects work when the service is
+overloaded and each connection may only have a limited number of requests in
+flight.
+
+Wire format (little-endian):
+
+  request:  type u8 | request id u32 | height u16 | width u16 | height*width bytes
+  response: type u8 | request id u32 | status u8 | payload length u32 | payload
+
+A classification payload is label id u16 | confidence f32 | probabilities
+f32[n]. A stats payload is a UTF-8 JSON document.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Message types
+MSG_CLASSIFY = 1
+MSG_STATS = 2
+
+# Response status codes
+STATUS_OK = 0
+STATUS_BUSY = 1
+STATUS_BAD_REQUEST = 2
+STATUS_ERROR = 3
+
+REQUEST_HEADER = struct.Struct('<BIHH')
+RESPONSE_HEADER = struct.Struct('<BIBI')
+RESULT_HEADER = struct.Struct('<Hf')
+
+
+class EdgeImpulseBackend:
+    def __init__(self, model_path, warmup_runs=3):
+        """
+        Classify frames with an Edge Impulse .eim model
+
+        Args:
+            model_path: Path to the .eim model
+            warmup_runs: Number of dummy classifications after init
+        """
+        from edge_impulse_linux.runner import ImpulseRunner
+
+        self.runner = ImpulseRunner(model_path)
+        self.model_info = self.runner.init()
+        params = self.model_info['model_parameters']
+        self.labels = list(params['labels'])
+        self.width = params.get('image_input_width', 28)
+        self.height = params.get('image_input_height', 28)
+        dummy = [0.0] * (self.width * self.height)
+        for _ in range(warmup_runs):
+            self.runner.classify(dummy)
+
+    def classify_batch(self, frames):
+        """Return class probabilities (N, classes) for uint8 frames (N, H, W)"""
+        features = frames.reshape(len(frames), -1) / 255.0
+        probs = np.empty((len(frames), len(self.labels)), dtype=np.float32)
+        for i, row in enumerate(features):
+            res = self.runner.classify(row.tolist())
+            predictions = res['result']['classification']
+            probs[i] = [predictions[label] for label in self.labels]
+        return probs
+
+    def stop(self):
+        self.runner.stop()
+
+
+class NullBackend:
+    """Backend returning uniform probabilities, for measuring service overhead"""
+
+    def __init__(self, width=28, height=28, num_classes=5, delay_ms=0.0):
+        self.labels = [str(i) for i in range(num_classes)]
+        self.width = width
+        self.height = height
+        # Simulated inference time per frame
+        self.delay = delay_ms / 1000.0
+
+    def classify_batch(self, frames):
+        if self.delay > 0:
+            time.sleep(self.delay * len(frames))
+        return np.full((len(frames), len(self.labels)), 1.0 / len(self.labels),
+                       dtype=np.float32)
+
+    def stop(self):
+        pass
+
+
+class InferenceService:
+    def __init__(self, backend, max_batch=8, max_wait_ms=2.0,
+                 max_pending=64, per_client=4, latency_window=10000):
+        """
+        Asyncio front end that micro-batches requests for a backend
+
+        Args:
+            backend: Object with classify_batch(frames), labels, width, height
+            max_batch: Maximum number of requests per backend call
+            max_wait_ms: How long the first request of a batch may wait for
+                more requests to arrive
+            max_pending: Queue size; further requests are answered with BUSY
+            per_client: Maximum requests in flight per connection
+            latency_window: Number of recent latencies kept for percentiles
+        """
+        self.backend = backend
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_pending = max_pending
+        self.per_client = per_client
+        self.queue = None
+        # The runner is not thread-safe, so all backend calls share one thread
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.latencies = collections.deque(maxlen=latency_window)
+        self.batch_sizes = collections.deque(maxlen=latency_window)
+        self.counters = collections.Counter()
+        self.clients = 0
+        self.started = time.monotonic()
+        self._batcher = None
+        self._server = None
+
+    async def start(self, unix_path=None, host="127.0.0.1", port=8765):
+        """Start listening on a Unix socket (if given) or TCP host/port"""
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self._batcher = asyncio.create_task(self._batch_loop())
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)
+            self._server = await asyncio.start_unix_server(self._handle_client, path=unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle_client, host, port)
+        self.started = time.monotonic()
+        return self._server
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+            # Requests that never reached the backend get an error reply
+            stopped = RuntimeError("Inference service stopped")
+            while not self.queue.empty():
+                _, future, _ = self.queue.get_nowait()
+                if not future.done():
+                    future.set_exception(stopped)
+        self.executor.shutdown(wait=True)
+        self.backend.stop()
+
+    async def _batch_loop(self):
+        """Collect queued requests into micro-batches and run the backend"""
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await self.queue.get()]
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch:
+                    if not self.queue.empty():
+                        batch.append(self.queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                # Coalesce identical frames so each is classified once
+                unique = {}
+                for payload, _, _ in batch:
+                    unique.setdefault(payload, len(unique))
+                frames = np.frombuffer(b''.join(unique), dtype=np.uint8)
+                frames = frames.reshape(len(unique), self.backend.height, self.backend.width)
+
+                try:
+                    probs = await loop.run_in_executor(self.executor,
+                                                       self.backend.classify_batch, frames)
+                except Exception as e:
+                    for _, future, _ in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    self.counters['errors'] += len(batch)
+                    continue
+
+                self.batch_sizes.append(len(batch))
+                self.counters['batches'] += 1
+                self.counters['coalesced'] += len(batch) - len(unique)
+                for payload, future, _ in batch:
+                    if not future.done():
+                        future.set_result(probs[unique[payload]])
+        except asyncio.CancelledError:
+            # Stopped: fail the batch being collected or classified
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Inference service stopped"))
+            raise
+
+    def stats(self):
+        """Service statistics as a JSON-serializable dict"""
+        latencies = np.array(self.latencies, dtype=np.float64) * 1000.0
+        uptime = time.monotonic() - self.started
+        stats = {
+            'uptime_s': uptime,
+            'clients': self.clients,
+            'queue_depth': self.queue.qsize() if self.queue else 0,
+            'requests': self.counters['requests'],
+            'completed': self.counters['completed'],
+            'busy': self.counters['busy'],
+            'bad_requests': self.counters['bad_requests'],
+            'errors': self.counters['errors'],
+            'batches': self.counters['batches'],
+            'coalesced': self.counters['coalesced'],
+            'mean_batch_size': float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+            'requests_per_s': self.counters['completed'] / uptime if uptime > 0 else 0.0,
+        }
+        if len(latencies):
+            for p in (50, 95, 99):
+                stats[f'latency_p{p}_ms'] = float(np.percentile(latencies, p))
+            stats['latency_max_ms'] = float(latencies.max())
+        return stats
+
+    async def _serve_request(self, request_id, payload, send, slots):
+        """Queue one classification and send its response"""
+        t_start = time.perf_counter()
+        try:
+            if self._batcher is None:
+                # Stopped: nothing would ever take the request off the queue
+                await send(MSG_CLASSIFY, request_id, STATUS_ERROR, b'')
+                return
+            future = asyncio.get_running_loop().create_future()
+            try:
+                self.queue.put_nowait((payload, future, t_start))
+            except asyncio.QueueFull:
+                self.counters['busy'] += 1
+                await send(MSG_CLASSIFY, request_id, STATUS_BUSY, b'')
+                return
+            try:
+                probs = await future
+            except Exception:
+                await send(MSG_CLASSIFY, request_id, STATUS_ERROR, b'')
+                return
+            label_id = int(np.argmax(probs))
+            body = RESULT_HEADER.pack(label_id, float(probs[label_id]))
+            body += np.asarray(probs, dtype='<f4').tobytes()
+            self.latencies.append(time.perf_counter() - t_start)
+            self.counters['completed'] += 1
+            await send(MSG_CLASSIFY, request_id, STATUS_OK, body)
+        finally:
+            slots.release()
+
+    async def _handle_client(self, reader, writer):
+        """Read requests from one connection until it closes"""
+        self.clients += 1
+        slots = asyncio.Semaphore(self.per_client)
+        write_lock = asyncio.Lock()
+        tasks = set()
+        frame_size = self.backend.width * self.backend.height
+
+        async def send(kind, request_id, status, body):
+            async with write_lock:
+                writer.write(RESPONSE_HEADER.pack(kind, request_id, status, len(body)) + body)
+                await writer.drain()
+
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(REQUEST_HEADER.size)
+                    kind, request_id, height, width = REQUEST_HEADER.unpack(header)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                # Check the header before reading the payload, so a client
+                # cannot make the service buffer an arbitrary frame size.
+                # The stream cannot be resynchronized, so close it.
+                if kind == MSG_STATS:
+                    valid = height * width == 0
+                else:
+                    self.counters['requests'] += 1
+                    valid = kind == MSG_CLASSIFY and \
+                        (height, width) == (self.backend.height, self.backend.width)
+                if not valid:
+                    self.counters['bad_requests'] += 1
+                    await send(kind, request_id, STATUS_BAD_REQUEST, b'')
+                    break
+
+                if kind == MSG_STATS:
+                    await send(MSG_STATS, request_id, STATUS_OK,
+                               json.dumps(self.stats()).encode('utf-8'))
+                    continue
+
+                try:
+                    payload = await reader.readexactly(frame_size)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                # Stop reading from this client while it has too much in flight
+                await slots.acquire()
+                task = asyncio.create_task(self._serve_request(request_id, payload, send, slots))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            self.clients -= 1
+            writer.close()
+
+
+class InferenceClient:
+    def __init__(self, reader, writer):
+        """Async client for InferenceService; use InferenceClient.connect()"""
+        self.reader = reader
+        self.writer = writer
+        self.next_id = 0
+        self.pending = {}
+        self._reader_task = asyncio.create_task(self._read_loop())
+
+    @classmethod
+    async def connect(cls, unix_path=None, host="127.0.0.1", port=8765):
+        if unix_path:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _read_loop(self):
+        try:
+            while True:
+                header = await self.reader.readexactly(RESPONSE_HEADER.size)
+                kind, request_id, status, length = RESPONSE_HEADER.unpack(header)
+                body = await self.reader.readexactly(length)
+                future = self.pending.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_result((kind, status, body))
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(str(e)))
+            self.pending.clear()
+
+    async def _request(self, kind, height, width, payload):
+        request_id = self.next_id
+        self.next_id = (self.next_id + 1) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        self.writer.write(REQUEST_HEADER.pack(kind, request_id, height, width) + payload)
+        await self.writer.drain()
+        return await future
+
+    async def classify(self, frame):
+        """
+        Classify a uint8 grayscale frame (H, W)
+
+        Returns:
+            (status, label_id, confidence, probabilities) tuple; label_id,
+            confidence and probabilities are None unless status is STATUS_OK
+        """
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        height, width = frame.shape
+        _, status, body = await self._request(MSG_CLASSIFY, height, width, frame.tobytes())
+        if status != STATUS_OK:
+            return status, None, None, None
+        label_id, confidence = RESULT_HEADER.unpack_from(body)
+        probs = np.frombuffer(body, dtype='<f4', offset=RESULT_HEADER.size)
+        return status, label_id, confidence, probs
+
+    async def stats(self):
+        """Fetch the service statistics"""
+        _, _, body = await self._request(MSG_STATS, 0, 0, b'')
+        return json.loads(body.decode('utf-8'))
+
+    async def close(self):
+        self.writer.close()
+        self._reader_task.cancel()
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Classifier inference service")
+    parser.add_argument("--model", type=str, default="modefied.eim",
+                        help="Edge Impulse model file (default: modefied.eim)")
+    parser.add_argument("--backend", type=str, default="eim", choices=["eim", "null"],
+                        help="Inference backend; 'null' measures service overhead only")
+    parser.add_argument("--unix", type=str, default=None,
+                        help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument("--host", type=str, default="127.0.0.1",
+                        help="TCP listen address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765,
+                        help="TCP listen port (default: 8765)")
+    parser.add_argument("--max-batch", type=int, default=8,
+                        help="Maximum micro-batch size (default: 8)")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0,
+                        help="Micro-batch collection window in ms (default: 2.0)")
+    parser.add_argument("--max-pending", type=int, default=64,
+                        help="Queued requests before answering BUSY (default: 64)")
+    parser.add_argument("--per-client", type=int, default=4,
+                        help="Requests in flight per connection (default: 4)")
+    return parser.parse_args()
+
+
+async def serve(args):
+    if args.backend == "eim":
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        backend = EdgeImpulseBackend(os.path.join(dir_path, args.model))
+        print("Model name:", backend.model_info['project']['name'])
+    else:
+        backend = NullBackend()
+
+    service = InferenceService(backend, max_batch=args.max_batch,
+                               max_wait_ms=args.max_wait_ms,
+                               max_pending=args.max_pending,
+                               per_client=args.per_client)
+    server = await service.start(unix_path=args.unix, host=args.host, port=args.port)
+    where = args.unix if args.unix else f"{args.host}:{args.port}"
+    print(f"Serving {backend.width}x{backend.height} classifier on {where}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main():
+    """Main application entry point"""
+    args = parse_arguments()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
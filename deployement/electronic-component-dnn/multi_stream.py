@@ -0,0 +1,377 @@
+"""
+Multi-camera stream scheduler
+
+Attach several frame sources (cameras, recorded sessions or synthetic
+sources) to one shared inference backend instead of running one script, and
+one runner process, per camera. Each stream has a capture thread that reads
+its source continuously into a small per-stream buffer, and a single
+scheduler thread feeds the backend:
+
+  round-robin: streams take turns, one frame per stream per turn
+  deadline:    the frame with the earliest deadline (capture time + the
+               stream's deadline) goes first, so streams with tight latency
+               budgets are served before relaxed ones
+
+When a stream produces frames faster than the backend can take them, its
+drop policy decides what happens to the buffer:
+
+  drop-oldest: discard the oldest buffered frame (always classify the
+               newest frames, like appsink drop=true)
+  drop-newest: discard the incoming frame (keep the buffered ones)
+  block:       stop reading the source until there is room (no drops in the
+               buffer, the source itself may skip frames)
+
+Frames older than a stream's max_age_ms when they are scheduled are dropped
+as stale. FPS, latency (capture to result) and drop counts are kept per
+stream.
+
+Sources on the command line are 'synthetic[:fps]', a session file recorded
+with frame_sources.py, or a V4L2 device such as /dev/video0.
+"""
+
+import argparse
+import collections
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from frame_sources import LoopStats, ReplaySource, SyntheticSource
+from inference_service import EdgeImpulseBackend, NullBackend
+
+DROP_POLICIES = ('drop-oldest', 'drop-newest', 'block')
+SCHEDULERS = ('round-robin', 'deadline')
+
+
+def to_model_input(frame, width, height):
+    """Grayscale uint8 frame of the model input size"""
+    if frame.shape[:2] == (height, width) and frame.ndim == 2:
+        return frame
+    import cv2
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(frame, (width, height))
+
+
+class Stream:
+    def __init__(self, name, source, policy='drop-oldest', depth=2,
+                 deadline_ms=100.0, max_age_ms=None):
+        """
+        One frame source attached to the scheduler
+
+        Args:
+            name: Stream name used in results and statistics
+            source: Frame source with the cv2.VideoCapture interface
+            policy: What to do when the buffer is full (see DROP_POLICIES)
+            depth: Frames buffered between capture and inference
+            deadline_ms: Latency budget used by the deadline scheduler
+            max_age_ms: Drop frames older than this when scheduled (None
+                keeps them)
+        """
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy {policy}, must be one of {DROP_POLICIES}")
+        self.name = name
+        self.source = source
+        self.policy = policy
+        self.depth = depth
+        self.deadline = deadline_ms / 1000.0
+        self.max_age = max_age_ms / 1000.0 if max_age_ms is not None else None
+        self.buffer = collections.deque()
+        self.stats = LoopStats()
+        self.counters = collections.Counter()
+        self.finished = False
+        self.error = None
+        self.thread = None
+
+    def summary(self):
+        stats = self.stats.summary(self.source)
+        stats.update({
+            'policy': self.policy,
+            'captured': self.counters['captured'],
+            'inferred': self.counters['inferred'],
+            'dropped_buffer': self.counters['dropped_buffer'],
+            'dropped_stale': self.counters['dropped_stale'],
+        })
+        if self.error:
+            stats['error'] = self.error
+        return stats
+
+
+class StreamScheduler:
+    def __init__(self, backend, scheduler='round-robin', max_batch=1, on_result=None):
+        """
+        Share one inference backend between several streams
+
+        Args:
+            backend: Object with classify_batch(frames), labels, width, height
+                (see inference_service.py)
+            scheduler: 'round-robin' or 'deadline'
+            max_batch: Frames per backend call
+            on_result: Called as on_result(stream, frame, probs, timestamp)
+                for every classified frame, on the scheduler thread
+        """
+        if scheduler not in SCHEDULERS:
+            raise ValueError(f"Unknown scheduler {scheduler}, must be one of {SCHEDULERS}")
+        self.backend = backend
+        self.scheduler = scheduler
+        self.max_batch = max_batch
+        self.on_result = on_result
+        self.streams = []
+        self.batches = 0
+        self.busy_time = 0.0
+        self.started = None
+        self.stopped = None
+        self._next = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+
+    def add_stream(self, name, source, **options):
+        """Attach a source; options are passed to Stream"""
+        stream = Stream(name, source, **options)
+        self.streams.append(stream)
+        return stream
+
+    def _capture_loop(self, stream):
+        """Read one source into its stream buffer until it ends or we stop"""
+        width, height = self.backend.width, self.backend.height
+        try:
+            self._read_frames(stream, width, height)
+        except Exception as e:
+            stream.error = repr(e)
+            print(f"ERROR: Stream {stream.name} stopped")
+            print("Exception:", e)
+        with self._cond:
+            stream.finished = True
+            self._cond.notify_all()
+
+    def _read_frames(self, stream, width, height):
+        while not self._stop.is_set():
+            ret, frame = stream.source.read()
+            if not ret:
+                break
+            timestamp = getattr(stream.source, 'timestamp', None) or time.monotonic()
+            frame = to_model_input(frame, width, height)
+            with self._cond:
+                stream.counters['captured'] += 1
+                if stream.policy == 'block':
+                    while len(stream.buffer) >= stream.depth and not self._stop.is_set():
+                        self._cond.wait()
+                elif len(stream.buffer) >= stream.depth:
+                    stream.counters['dropped_buffer'] += 1
+                    if stream.policy == 'drop-newest':
+                        continue
+                    stream.buffer.popleft()
+                stream.buffer.append((timestamp, frame))
+                self._cond.notify_all()
+
+    def _drop_stale(self, now):
+        dropped = False
+        for stream in self.streams:
+            if stream.max_age is None:
+                continue
+            while stream.buffer and now - stream.buffer[0][0] > stream.max_age:
+                stream.buffer.popleft()
+                stream.counters['dropped_stale'] += 1
+                dropped = True
+        if dropped:
+            # Room in the buffers for blocked capture threads
+            self._cond.notify_all()
+
+    def _select(self):
+        """Take up to max_batch (stream, timestamp, frame) from the buffers"""
+        batch = []
+        if self.scheduler == 'deadline':
+            while len(batch) < self.max_batch:
+                ready = [s for s in self.streams if s.buffer]
+                if not ready:
+                    break
+                stream = min(ready, key=lambda s: s.buffer[0][0] + s.deadline)
+                batch.append((stream, *stream.buffer.popleft()))
+        else:
+            count = len(self.streams)
+            idle = 0
+            while len(batch) < self.max_batch and idle < count:
+                stream = self.streams[self._next]
+                self._next = (self._next + 1) % count
+                if stream.buffer:
+                    batch.append((stream, *stream.buffer.popleft()))
+                    idle = 0
+                else:
+                    idle += 1
+        return batch
+
+    def _done(self):
+        return all(s.finished and not s.buffer for s in self.streams)
+
+    def run(self, duration=None):
+        """
+        Capture and classify until all sources end, `duration` seconds have
+        passed or stop() is called
+        """
+        self.started = time.monotonic()
+        end = self.started + duration if duration else None
+        for stream in self.streams:
+            stream.thread = threading.Thread(target=self._capture_loop, args=(stream,),
+                                             name=f"capture-{stream.name}", daemon=True)
+            stream.thread.start()
+
+        try:
+            while not self._stop.is_set():
+                with self._cond:
+                    while True:
+                        self._drop_stale(time.monotonic())
+                        batch = self._select()
+                        if batch or self._done() or self._stop.is_set():
+                            break
+                        timeout = end - time.monotonic() if end else None
+                        if timeout is not None and timeout <= 0:
+                            break
+                        self._cond.wait(timeout)
+                    # Room in the buffers for blocked capture threads
+                    self._cond.notify_all()
+                if not batch:
+                    break
+
+                frames = np.stack([frame for _, _, frame in batch])
+                t_start = time.monotonic()
+                probs = self.backend.classify_batch(frames)
+                self.busy_time += time.monotonic() - t_start
+                self.batches += 1
+
+                for (stream, timestamp, frame), p in zip(batch, probs):
+                    stream.counters['inferred'] += 1
+                    stream.stats.record(timestamp)
+                    if self.on_result is not None:
+                        self.on_result(stream, frame, p, timestamp)
+
+                if end and time.monotonic() >= end:
+                    break
+        finally:
+            self.stopped = time.monotonic()
+            self.stop()
+
+    def stop(self):
+        """Stop capturing and release the sources"""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for stream in self.streams:
+            if stream.thread is not None:
+                stream.thread.join(timeout=1.0)
+            stream.source.release()
+
+    def summary(self):
+        """Per-stream and backend statistics as a JSON-serializable dict"""
+        elapsed = (self.stopped or time.monotonic()) - (self.started or time.monotonic())
+        return {
+            'scheduler': self.scheduler,
+            'elapsed_s': elapsed,
+            'batches': self.batches,
+            'backend_utilization': self.busy_time / elapsed if elapsed > 0 else 0.0,
+            'streams': {s.name: s.summary() for s in self.streams},
+        }
+
+    def report(self):
+        summary = self.summary()
+        lines = [f"Scheduler: {summary['scheduler']}, {summary['elapsed_s']:.1f} s, "
+                 f"backend busy {summary['backend_utilization'] * 100:.0f}%",
+                 f"{'stream':<16} {'policy':<12} {'fps':>6} {'p50 ms':>8} {'p95 ms':>8} "
+                 f"{'max ms':>8} {'captured':>8} {'inferred':>8} {'dropped':>8}"]
+        for name, s in summary['streams'].items():
+            dropped = s['dropped_buffer'] + s['dropped_stale'] + s.get('dropped', 0)
+            lines.append(f"{name:<16} {s['policy']:<12} {s['fps']:>6.1f} "
+                         f"{s.get('latency_p50_ms', 0):>8.1f} {s.get('latency_p95_ms', 0):>8.1f} "
+                         f"{s.get('latency_max_ms', 0):>8.1f} {s['captured']:>8} "
+                         f"{s['inferred']:>8} {dropped:>8}")
+        return "\n".join(lines)
+
+
+def open_source(spec, width, height, fps, seed):
+    """Frame source from a command line spec"""
+    if spec.startswith('synthetic'):
+        rate = float(spec.split(':', 1)[1]) if ':' in spec else fps
+        return SyntheticSource(width, height, fps=rate, seed=seed)
+    if spec.startswith('/dev/'):
+        from gst_pipeline import GstPipeline, ModelInputSpec
+        pipeline = GstPipeline(ModelInputSpec(width, height, 'GRAY8'), device=spec, fps=fps)
+        return pipeline.open()
+    return ReplaySource(spec, speed=1.0, loop=True)
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Classify several camera streams with one model")
+    parser.add_argument("sources", nargs="+",
+                        help="'synthetic[:fps]', a recorded session file or a V4L2 device")
+    parser.add_argument("--model", type=str, default="modefied.eim",
+                        help="Edge Impulse model file (default: modefied.eim)")
+    parser.add_argument("--backend", type=str, default="eim", choices=["eim", "null"],
+                        help="Inference backend; 'null' simulates inference time")
+    parser.add_argument("--null-ms", type=float, default=5.0,
+                        help="Simulated inference time per frame of the null backend (default: 5.0)")
+    parser.add_argument("--scheduler", type=str, default="round-robin", choices=SCHEDULERS,
+                        help="Scheduling between streams (default: round-robin)")
+    parser.add_argument("--policy", nargs="+", default=["drop-oldest"], choices=DROP_POLICIES,
+                        help="Drop policy, one for all streams or one per stream")
+    parser.add_argument("--deadline-ms", nargs="+", type=float, default=[100.0],
+                        help="Latency budget, one for all streams or one per stream")
+    parser.add_argument("--max-age-ms", type=float, default=None,
+                        help="Drop frames older than this when scheduled")
+    parser.add_argument("--depth", type=int, default=2,
+                        help="Frames buffered per stream (default: 2)")
+    parser.add_argument("--max-batch", type=int, default=1,
+                        help="Frames per backend call (default: 1)")
+    parser.add_argument("--fps", type=int, default=30,
+                        help="Camera and synthetic source frame rate (default: 30)")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="Stop after this many seconds")
+    parser.add_argument("--stats", type=str, default=None,
+                        help="Write per-stream statistics to this JSON file")
+    return parser.parse_args()
+
+
+def per_stream(values, count):
+    if len(values) not in (1, count):
+        raise SystemExit(f"Expected 1 or {count} values, got {len(values)}")
+    return values * count if len(values) == 1 else values
+
+
+def main():
+    """Main application entry point"""
+    args = parse_arguments()
+    if args.backend == "eim":
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        backend = EdgeImpulseBackend(os.path.join(dir_path, args.model))
+        print("Model name:", backend.model_info['project']['name'])
+    else:
+        backend = NullBackend(delay_ms=args.null_ms)
+
+    scheduler = StreamScheduler(backend, scheduler=args.scheduler, max_batch=args.max_batch)
+    policies = per_stream(args.policy, len(args.sources))
+    deadlines = per_stream(args.deadline_ms, len(args.sources))
+    for i, spec in enumerate(args.sources):
+        source = open_source(spec, backend.width, backend.height, args.fps, seed=i)
+        scheduler.add_stream(f"{i}:{os.path.basename(spec)}", source, policy=policies[i],
+                             depth=args.depth, deadline_ms=deadlines[i],
+                             max_age_ms=args.max_age_ms)
+
+    print(f"Streaming {len(args.sources)} sources - Press Ctrl+C to quit")
+    try:
+        scheduler.run(duration=args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.stop()
+        backend.stop()
+
+    print(scheduler.report())
+    if args.stats:
+        with open(args.stats, 'w') as f:
+            json.dump(scheduler.summary(), f, indent=2)
+        print(f"Statistics saved to {args.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ import cv2
 import numpy as np
 import subprocess
 from edge_impulse_linux.runner import ImpulseRunner
+from sampling_profiler import install as install_profiler
 
 # Settings
 model_file = "modefied.eim"
@@ -15,6 +16,8 @@ rotation = 0
 img_width = 28
 img_height = 28
 fps = 0
+profile_seconds = 10
+profile_socket = "/tmp/pi-camera-adjustment-profile.sock"
 
 def print_available_controls():
     """Print all available camera controls"""
@@ -41,6 +44,10 @@ def set_control(control_name, value):
     except subprocess.CalledProcessError as e:
         print(f"Failed to set {control_name}: {e}")
 
+# On-demand profiling: 'p' key, kill -USR1 <pid> or the control socket
+profiler = install_profiler("pi-camera-adjustment", seconds=profile_seconds,
+                            socket_path=profile_socket)
+
 # Initialize camera with GStreamer
 pipeline = (
     f"v4l2src device=/dev/video0 ! "
@@ -64,6 +71,7 @@ except Exception as e:
     print("Exception:", e)
     if runner:
         runner.stop()
+    profiler.close()
     sys.exit(1)
 
 # Initialize camera
@@ -71,6 +79,7 @@ cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
 if not cap.isOpened():
     print("ERROR: Could not open camera with GStreamer pipeline")
     runner.stop()
+    profiler.close()
     sys.exit(1)
 
 # Print available controls at startup
@@ -83,6 +92,7 @@ print("2. Contrast: 'c'/'C'")
 print("3. Saturation: 's'/'S'")
 print("4. Sharpness: 'h'/'H'")
 print("5. Exposure: 'e'/'E'")
+print(f"6. Profile for {profile_seconds} s: 'p'")
 
 # Initial values
 brightness = 50
@@ -127,6 +137,9 @@ try:
         elif key == ord('E'):  # Increase exposure
             exposure = min(exposure + 100, 10000)
             set_control("exposure_time_absolute", exposure)
+        elif key == ord('p'):  # Sample the loop in the background
+            if profiler.start(profile_seconds):
+                print(f"Profiling for {profile_seconds} s")
 
         # Capture frame
         ret, img = cap.read()
@@ -190,4 +203,5 @@ try:
 finally:
     cap.release()
     cv2.destroyAllWindows()
-    runner.stop()
\ No newline at end of file
+    runner.stop()
+    profiler.close()
\ No newline at end of file
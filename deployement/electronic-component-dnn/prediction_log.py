@@ -0,0 +1,450 @@
+"""
+Prediction log
+
+Record every classification of the live loop (wall-clock time, label id,
+confidence and the full probability vector) without slowing it down. log()
+only appends to an in-memory queue; a background thread packs queued
+predictions into fixed-width binary records, writes them in batches, fsyncs
+periodically and starts a new segment file when the current one is full.
+
+Segment files (<prefix>-<sequence>.plog) are:
+
+  header:  magic b'PLOG' | version u16 | classes u16 | labels length u32 |
+           labels (UTF-8, newline separated)
+  records: timestamp f64 | label id u16 | confidence f32 | probabilities f32[classes]
+
+PredictionLogReader memory-maps the segments as numpy record arrays, so
+queries by time range only touch the segments (and pages) they need.
+Timestamps are wall-clock time and can step back when NTP corrects the
+clock; segments that are not in time order are filtered record by record
+instead of binary searched. Run
+this file to summarize a log or to compare the cost of log() with a
+per-frame JSON write.
+"""
+
+import argparse
+import collections
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from startup import lazy_import
+
+# Imported on first use, so the live script does not load numpy at startup
+np = lazy_import('numpy')
+
+MAGIC = b'PLOG'
+VERSION = 1
+SEGMENT_HEADER = struct.Struct('<4sHHI')
+
+
+def record_dtype(num_classes):
+    """Packed numpy dtype of one record"""
+    return np.dtype([('timestamp', '<f8'), ('label', '<u2'), ('confidence', '<f4'),
+                     ('probs', '<f4', (num_classes,))])
+
+
+class PredictionLog:
+    def __init__(self, directory, labels, prefix='predictions', segment_bytes=64 * 1024 * 1024,
+                 flush_interval=0.5, fsync_interval=5.0, max_queue=100000):
+        """
+        Append predictions to binary segment files from a background thread
+
+        Args:
+            directory: Directory of the segment files
+            labels: Class labels, in the order of the probability vectors
+            prefix: Segment file name prefix
+            segment_bytes: Start a new segment when a segment reaches this size
+            flush_interval: Seconds between batched writes
+            fsync_interval: Seconds between fsyncs (0 fsyncs every write)
+            max_queue: Predictions queued before new ones are dropped (the
+                loop is never blocked by a slow disk)
+        """
+        self.directory = directory
+        self.labels = list(labels)
+        self.prefix = prefix
+        self.dtype = record_dtype(len(self.labels))
+        self._header = SEGMENT_HEADER.pack(MAGIC, VERSION, len(self.labels),
+                                           len("\n".join(self.labels).encode('utf-8')))
+        self._header += "\n".join(self.labels).encode('utf-8')
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_queue = max_queue
+        self.written = 0
+        self.dropped = 0
+        self.segments = 0
+        self._queue = collections.deque()
+        self._file = None
+        self._size = 0
+        self._sequence = self._next_sequence()
+        self._last_fsync = time.monotonic()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._error = None
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._write_loop, name="prediction-log",
+                                        daemon=True)
+        self._thread.start()
+
+    def _next_sequence(self):
+        """Continue after the segments already in the directory"""
+        existing = glob.glob(os.path.join(self.directory, f"{self.prefix}-*.plog"))
+        numbers = [int(os.path.basename(p)[len(self.prefix) + 1:-5]) for p in existing
+                   if os.path.basename(p)[len(self.prefix) + 1:-5].isdigit()]
+        return max(numbers) + 1 if numbers else 0
+
+    def log(self, probs, label=None, timestamp=None):
+        """
+        Queue one prediction (cheap, safe to call from the capture loop)
+
+        Args:
+            probs: Class probabilities in the order of `labels`
+            label: Predicted label id (default: argmax of probs)
+            timestamp: time.time() of the prediction (default: now)
+
+        Raises:
+            ValueError: probs does not have one value per label, or label is
+                not a label id
+            RuntimeError: The writer thread failed (e.g. disk full)
+        """
+        if self._error is not None:
+            self._raise_error()
+        # Checked here: a bad record would otherwise fail the whole batch in the writer
+        if len(probs) != len(self.labels):
+            raise ValueError(f"Expected {len(self.labels)} probabilities, got {len(probs)}")
+        if label is not None and not 0 <= label < len(self.labels):
+            raise ValueError(f"Label id {label} out of range for {len(self.labels)} labels")
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._queue.append((time.time() if timestamp is None else timestamp, label, probs))
+
+    def log_result(self, res, timestamp=None):
+        """Queue an Edge Impulse classification result"""
+        predictions = res['result']['classification']
+        self.log([predictions[label] for label in self.labels], timestamp=timestamp)
+
+    def _open_segment(self):
+        path = os.path.join(self.directory, f"{self.prefix}-{self._sequence:06d}.plog")
+        self._sequence += 1
+        self._file = open(path, 'wb')
+        self._file.write(self._header)
+        self._size = len(self._header)
+        self.segments += 1
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def _drain(self):
+        """Pack queued predictions into one record array"""
+        items = [self._queue.popleft() for _ in range(len(self._queue))]
+        records = np.empty(len(items), dtype=self.dtype)
+        records['timestamp'] = [timestamp for timestamp, _, _ in items]
+        records['probs'] = [probs for _, _, probs in items]
+        # Predictions logged without a label get the argmax
+        labels = np.array([-1 if label is None else label for _, label, _ in items])
+        labels = np.where(labels < 0, records['probs'].argmax(axis=1), labels)
+        records['label'] = labels
+        records['confidence'] = records['probs'][np.arange(len(items)), labels]
+        return records
+
+    def _write(self, records):
+        data = records.tobytes()
+        if self._file is None or (self._size + len(data) > self.segment_bytes
+                                  and self._size > len(self._header)):
+            self._close_segment()
+            self._open_segment()
+        self._file.write(data)
+        self._size += len(data)
+        self.written += len(records)
+
+        self._file.flush()
+        now = time.monotonic()
+        if now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def _write_loop(self):
+        try:
+            while True:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                closed = self._closed
+                if self._queue:
+                    records = self._drain()
+                    # Keep segments below segment_bytes by splitting large batches
+                    per_segment = max((self.segment_bytes - len(self._header)) // self.dtype.itemsize, 1)
+                    for start in range(0, len(records), per_segment):
+                        self._write(records[start:start + per_segment])
+                if closed:
+                    break
+            self._close_segment()
+        except Exception as e:
+            # Stop writing and report the error to the next log(), flush() or close()
+            self._error = e
+            if self._file is not None:
+                try:
+                    self._file.close()
+                except OSError:
+                    pass
+                self._file = None
+
+    def _raise_error(self):
+        raise RuntimeError(f"Prediction log writer failed: {self._error}") from self._error
+
+    def flush(self):
+        """Write everything queued so far (without waiting for the interval)"""
+        if self._error is not None:
+            self._raise_error()
+        self._wakeup.set()
+
+    def close(self):
+        """Write the remaining predictions, fsync and close"""
+        if not self._closed:
+            self._closed = True
+            self._wakeup.set()
+            self._thread.join()
+        if self._error is not None:
+            self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PredictionLogReader:
+    def __init__(self, directory, prefix='predictions'):
+        """
+        Memory-mapped access to the segments of a prediction log
+
+        Args:
+            directory: Directory of the segment files
+            prefix: Segment file name prefix
+        """
+        self.paths = sorted(glob.glob(os.path.join(directory, f"{prefix}-*.plog")))
+        self.labels = None
+        self._files = []
+        self._maps = []
+        self.segments = []
+        # Per segment: whether timestamps are in order (checked on first query)
+        self._sorted = []
+        for path in self.paths:
+            records = self._map(path)
+            if records is not None and len(records):
+                self.segments.append(records)
+                self._sorted.append(None)
+
+    def _map(self, path):
+        f = open(path, 'rb')
+        size = os.fstat(f.fileno()).st_size
+        if size < SEGMENT_HEADER.size:
+            f.close()
+            return None
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, num_classes, labels_size = SEGMENT_HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            buffer.close()
+            f.close()
+            raise ValueError(f"{path} is not a prediction log segment (version {VERSION})")
+        start = SEGMENT_HEADER.size + labels_size
+        labels = buffer[SEGMENT_HEADER.size:start].decode('utf-8').split("\n")
+        if self.labels is None:
+            self.labels = labels
+        elif labels != self.labels:
+            raise ValueError(f"{path} has labels {labels}, expected {self.labels}")
+        self._files.append(f)
+        self._maps.append(buffer)
+        dtype = record_dtype(num_classes)
+        # A segment still being written may end with a partial record
+        count = (size - start) // dtype.itemsize
+        return np.frombuffer(buffer, dtype=dtype, count=count, offset=start)
+
+    def __len__(self):
+        return sum(len(s) for s in self.segments)
+
+    def _is_sorted(self, index):
+        if self._sorted[index] is None:
+            timestamps = self.segments[index]['timestamp']
+            self._sorted[index] = bool(np.all(timestamps[1:] >= timestamps[:-1]))
+        return self._sorted[index]
+
+    def _bounds(self, index):
+        """(earliest, latest) timestamp of a segment"""
+        timestamps = self.segments[index]['timestamp']
+        if self._is_sorted(index):
+            return timestamps[0], timestamps[-1]
+        return timestamps.min(), timestamps.max()
+
+    def time_range(self):
+        """(earliest, latest) timestamp, or None for an empty log"""
+        if not self.segments:
+            return None
+        bounds = [self._bounds(i) for i in range(len(self.segments))]
+        return float(min(b[0] for b in bounds)), float(max(b[1] for b in bounds))
+
+    def query(self, start=None, end=None):
+        """
+        Records with start <= timestamp < end (None for open ends)
+
+        Returns:
+            Record array with fields timestamp, label, confidence and probs,
+            in log order; a zero-copy view when the range lies within one
+            time-ordered segment
+        """
+        parts = []
+        for i, records in enumerate(self.segments):
+            first, last = self._bounds(i)
+            if (end is not None and first >= end) or (start is not None and last < start):
+                continue
+            timestamps = records['timestamp']
+            if not self._is_sorted(i):
+                # The clock stepped back within this segment
+                mask = np.ones(len(records), dtype=bool)
+                if start is not None:
+                    mask &= timestamps >= start
+                if end is not None:
+                    mask &= timestamps < end
+                if mask.any():
+                    parts.append(records[mask])
+                continue
+            lo = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+            hi = len(records) if end is None else int(np.searchsorted(timestamps, end, side='left'))
+            if hi > lo:
+                parts.append(records[lo:hi])
+        if not parts:
+            dtype = record_dtype(len(self.labels or []))
+            return np.empty(0, dtype=dtype)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def close(self):
+        self.segments = []
+        self._sorted = []
+        for buffer in self._maps:
+            try:
+                buffer.close()
+            except BufferError:
+                # Query results still reference the map; it is freed with them
+                pass
+        for f in self._files:
+            f.close()
+        self._maps = []
+        self._files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def summarize(records, labels):
+    """Counts and mean confidence per label as printable lines"""
+    lines = [f"{len(records)} predictions"]
+    if len(records) > 1:
+        first, last = records['timestamp'].min(), records['timestamp'].max()
+        span = last - first
+        lines[0] += (f" from {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(first))}"
+                     f" to {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last))}"
+                     f" ({len(records) / span:.1f}/s)" if span > 0 else "")
+    counts = np.bincount(records['label'], minlength=len(labels))
+    for i, label in enumerate(labels):
+        mask = records['label'] == i
+        mean = float(records['confidence'][mask].mean()) if counts[i] else 0.0
+        lines.append(f"  {label:<20} {counts[i]:>8}  mean confidence {mean:.3f}")
+    return "\n".join(lines)
+
+
+def benchmark(directory, count, num_classes=5):
+    """Time log() against writing one JSON line per prediction"""
+    labels = [f"class{i}" for i in range(num_classes)]
+    rng = np.random.default_rng(0)
+    probs = rng.dirichlet(np.ones(num_classes), size=count).astype(np.float32).tolist()
+
+    log = PredictionLog(directory, labels, prefix='benchmark')
+    t_start = time.perf_counter()
+    for p in probs:
+        log.log(p)
+    t_log = time.perf_counter() - t_start
+    log.close()
+
+    json_path = os.path.join(directory, 'benchmark.jsonl')
+    t_start = time.perf_counter()
+    with open(json_path, 'w') as f:
+        for p in probs:
+            f.write(json.dumps({'timestamp': time.time(), 'label': int(np.argmax(p)),
+                                'confidence': max(p), 'probs': p}) + "\n")
+            f.flush()
+    t_json = time.perf_counter() - t_start
+
+    with PredictionLogReader(directory, prefix='benchmark') as reader:
+        first, last = reader.time_range()
+        t_start = time.perf_counter()
+        middle = reader.query(first + (last - first) / 4, first + (last - first) * 3 / 4)
+        t_query = time.perf_counter() - t_start
+        log_size = sum(os.path.getsize(p) for p in reader.paths)
+        print(f"{count} predictions, {num_classes} classes")
+        print(f"  log():           {t_log / count * 1e6:8.2f} us per prediction in the loop, "
+              f"{log_size / count:.0f} bytes each")
+        print(f"  JSON line write: {t_json / count * 1e6:8.2f} us per prediction, "
+              f"{os.path.getsize(json_path) / count:.0f} bytes each")
+        print(f"  Time range query of {len(middle)} records: {t_query * 1000:.2f} ms")
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Summarize or benchmark a prediction log")
+    parser.add_argument("directory", type=str, help="Prediction log directory")
+    parser.add_argument("--prefix", type=str, default="predictions",
+                        help="Segment file name prefix (default: predictions)")
+    parser.add_argument("--start", type=float, default=None,
+                        help="Only predictions at or after this Unix time")
+    parser.add_argument("--end", type=float, default=None,
+                        help="Only predictions before this Unix time")
+    parser.add_argument("--last", type=float, default=None,
+                        help="Only predictions of the last N seconds of the log")
+    parser.add_argument("--csv", type=str, default=None,
+                        help="Export the selected predictions to this CSV file")
+    parser.add_argument("--benchmark", type=int, default=None,
+                        help="Benchmark N predictions into the directory instead")
+    return parser.parse_args()
+
+
+def main():
+    """Main application entry point"""
+    args = parse_arguments()
+    if args.benchmark:
+        benchmark(args.directory, args.benchmark)
+        return
+
+    with PredictionLogReader(args.directory, prefix=args.prefix) as reader:
+        if not len(reader):
+            print(f"No predictions in {args.directory}")
+            return
+        start, end = args.start, args.end
+        if args.last:
+            start = reader.time_range()[1] - args.last
+        records = reader.query(start, end)
+        print(f"{len(reader.paths)} segments, {len(reader)} predictions")
+        print(summarize(records, reader.labels))
+        if args.csv:
+            with open(args.csv, 'w') as f:
+                f.write(",".join(['timestamp', 'label', 'confidence'] + reader.labels) + "\n")
+                for r in records:
+                    f.write(f"{r['timestamp']:.6f},{reader.labels[r['label']]},{r['confidence']:.6f},"
+                            + ",".join(f"{p:.6f}" for p in r['probs']) + "\n")
+            print(f"Exported to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+On-demand sampling profiler for long-running capture and inference loops
+
+install() adds two triggers to a running script without changing its loop:
+
+  signal:         kill -USR1 <pid> profiles for the default duration
+  control socket: a Unix socket accepting 'profile [seconds]' and 'status'
+
+While active, a background thread samples the Python stacks every few
+milliseconds with sys._current_frames(). Nothing is traced between samples,
+so the loop runs at full speed; the sampler's own CPU time is reported as
+overhead. Each profile is written as
+
+  <name>-<time>.collapsed  one line per stack, 'outer;...;inner count', the
+                           input of flamegraph.pl or speedscope
+  <name>-<time>.top.txt    the top-k functions by self and total samples
+
+Trigger a profile from another shell with
+
+  python3 sampling_profiler.py --pid <pid>
+  python3 sampling_profiler.py --socket /tmp/dnn-live-inference-profile.sock --seconds 5
+
+or run `python3 sampling_profiler.py --demo` to profile a synthetic-source
+loop in this process.
+"""
+
+import argparse
+import collections
+import errno
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+
+class SamplingProfiler:
+    def __init__(self, name='profile', output_dir='/tmp', interval_ms=5.0, top_k=20,
+                 all_threads=False):
+        """
+        Statistical profiler sampling Python stacks from a background thread
+
+        Args:
+            name: Prefix of the output files
+            output_dir: Directory the profiles are written to
+            interval_ms: Sampling interval
+            top_k: Number of functions in the top list
+            all_threads: Sample every thread (default: only the main thread)
+        """
+        self.name = name
+        self.output_dir = output_dir
+        self.interval = interval_ms / 1000.0
+        self.top_k = top_k
+        self.all_threads = all_threads
+        self.result = None
+        self.error = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._labels = {}
+        # Threads of the profiler itself, never sampled
+        self._own_threads = set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds=10.0):
+        """Start profiling for `seconds` in the background; False if already running"""
+        with self._lock:
+            if self.running:
+                return False
+            self.result = None
+            self.error = None
+            self._done.clear()
+            self._thread = threading.Thread(target=self._run, args=(seconds,),
+                                            name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def wait(self, timeout=None):
+        """Wait for the current profile; returns its result dict (None if it failed)"""
+        self._done.wait(timeout)
+        return self.result
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _stack(self, frame):
+        stack = []
+        while frame is not None:
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def _run(self, seconds):
+        try:
+            self.result = self._sample(seconds)
+            print(self.result['report'])
+        except Exception as e:
+            # E.g. an unwritable output_dir; reported by wait() and the socket
+            self.error = e
+            print(f"Profile of {self.name} failed: {e}")
+        finally:
+            self._done.set()
+
+    def _sample(self, seconds):
+        own = self._own_threads | {threading.get_ident()}
+        main = threading.main_thread().ident
+        counts = collections.Counter()
+        samples = 0
+        sampling_time = 0.0
+        t_start = time.monotonic()
+        next_sample = t_start
+        end = t_start + seconds
+
+        while next_sample < end:
+            t0 = time.perf_counter()
+            names = {t.ident: t.name for t in threading.enumerate()} if self.all_threads else None
+            for ident, frame in sys._current_frames().items():
+                if ident in own or (not self.all_threads and ident != main):
+                    continue
+                stack = self._stack(frame)
+                if self.all_threads:
+                    stack = (names.get(ident, str(ident)),) + stack
+                counts[stack] += 1
+            samples += 1
+            sampling_time += time.perf_counter() - t0
+
+            next_sample += self.interval
+            delay = next_sample - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Fell behind (e.g. the GIL was held); do not burst to catch up
+                next_sample = time.monotonic()
+
+        elapsed = time.monotonic() - t_start
+        return self._write(counts, samples, elapsed, sampling_time)
+
+    def _write(self, counts, samples, elapsed, sampling_time):
+        """Write the collapsed stacks and the top-k list"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir,
+                            f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        collapsed_path = base + ".collapsed"
+        with open(collapsed_path, 'w') as f:
+            for stack, count in counts.most_common():
+                f.write(";".join(stack) + f" {count}\n")
+
+        # Self samples count the innermost frame, total samples every function
+        # on the stack once
+        self_counts = collections.Counter()
+        total_counts = collections.Counter()
+        for stack, count in counts.items():
+            self_counts[stack[-1]] += count
+            for label in set(stack):
+                total_counts[label] += count
+        stack_samples = max(sum(counts.values()), 1)
+
+        lines = [f"Profile of {self.name} (pid {os.getpid()}): {samples} samples in "
+                 f"{elapsed:.1f} s, interval {self.interval * 1000:.1f} ms, "
+                 f"sampler overhead {sampling_time / elapsed * 100:.2f}% of one core",
+                 f"{'self %':>7} {'total %':>8}  function (by self samples)"]
+        for label, count in self_counts.most_common(self.top_k):
+            lines.append(f"{count / stack_samples * 100:>7.1f} "
+                         f"{total_counts[label] / stack_samples * 100:>8.1f}  {label}")
+        lines.append(f"{'self %':>7} {'total %':>8}  function (by total samples)")
+        for label, count in total_counts.most_common(self.top_k):
+            lines.append(f"{self_counts[label] / stack_samples * 100:>7.1f} "
+                         f"{count / stack_samples * 100:>8.1f}  {label}")
+        lines.append(f"Collapsed stacks: {collapsed_path}")
+        report = "\n".join(lines)
+
+        top_path = base + ".top.txt"
+        with open(top_path, 'w') as f:
+            f.write(report + "\n")
+        return {
+            'samples': samples,
+            'elapsed_s': elapsed,
+            'overhead': sampling_time / elapsed if elapsed > 0 else 0.0,
+            'collapsed': collapsed_path,
+            'top': top_path,
+            'report': report,
+        }
+
+    def serve(self, path, default_seconds=10.0):
+        """
+        Accept 'profile [seconds]' and 'status' commands on a Unix socket
+
+        Raises:
+            OSError: Another running process is serving on `path`
+        """
+        if os.path.exists(path):
+            # Only replace a socket left behind by a process that has exited
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(path)
+                    probe.sendall(b"status")
+                except (ConnectionRefusedError, FileNotFoundError):
+                    os.remove(path)
+                else:
+                    raise OSError(errno.EADDRINUSE, f"{path} is in use by a running process")
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen(1)
+        self._socket_path = path
+        self._server = server
+        thread = threading.Thread(target=self._accept_loop, args=(server, default_seconds),
+                                  name="profiler-control", daemon=True)
+        thread.start()
+        self._own_threads.add(thread.ident)
+
+    def _accept_loop(self, server, default_seconds):
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                break
+            with conn:
+                try:
+                    command = conn.recv(256).decode('utf-8', 'replace').split()
+                    try:
+                        reply = self._command(command, default_seconds)
+                    except Exception as e:
+                        # Keep serving; the client gets the error
+                        reply = f"error: {e}\n"
+                    conn.sendall(reply.encode('utf-8'))
+                except OSError:
+                    pass
+
+    def _command(self, command, default_seconds):
+        if not command or command[0] == 'status':
+            return "running\n" if self.running else "idle\n"
+        if command[0] != 'profile':
+            return f"unknown command {command[0]}, use 'profile [seconds]' or 'status'\n"
+        try:
+            seconds = float(command[1]) if len(command) > 1 else default_seconds
+        except ValueError:
+            return f"invalid duration {command[1]}\n"
+        if not self.start(seconds):
+            return "a profile is already running\n"
+        result = self.wait(seconds + 30.0)
+        if result is None:
+            return f"profile failed: {self.error or 'timed out'}\n"
+        return result['report'] + "\n"
+
+    def close(self):
+        """Stop the control socket"""
+        server = getattr(self, '_server', None)
+        if server is not None:
+            server.close()
+            if os.path.exists(self._socket_path):
+                os.remove(self._socket_path)
+            self._server = None
+
+
+def install(name, seconds=10.0, signum=signal.SIGUSR1, socket_path=None, **options):
+    """
+    Make a running script profilable on demand
+
+    Args:
+        name: Prefix of the output files
+        seconds: Profile duration for the signal and for 'profile' without
+            a duration
+        signum: Signal that starts a profile (None to disable)
+        socket_path: Unix control socket (None to disable)
+        **options: Passed to SamplingProfiler
+
+    Returns:
+        The SamplingProfiler; call close() on exit to remove the socket
+    """
+    profiler = SamplingProfiler(name, **options)
+    if signum is not None:
+        signal.signal(signum, lambda *_: profiler.start(seconds))
+    if socket_path:
+        try:
+            profiler.serve(socket_path, seconds)
+        except OSError as e:
+            # The signal still works; a second instance must not take the socket
+            print(f"Profiler control socket disabled: {e}")
+    return profiler
+
+
+def request_profile(path, seconds=None):
+    """Ask a process to profile itself over its control socket; returns its reply"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(path)
+        conn.sendall(f"profile {seconds}".encode('utf-8') if seconds else b"profile")
+        chunks = []
+        while True:
+            chunk = conn.recv(4096)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return b''.join(chunks).decode('utf-8')
+
+
+def demo(seconds, interval_ms):
+    """Profile a synthetic-source capture loop in this process"""
+    import numpy as np
+    from frame_sources import LoopStats, SyntheticSource
+
+    # Stand-in for the runner: a small dense layer
+    weights = np.linspace(-1.0, 1.0, 32 * 32 * 5).reshape(32 * 32, 5)
+
+    def prepare_features(img):
+        return (np.reshape(img[::3, ::3], 32 * 32) / 255.0).tolist()
+
+    def classify(features):
+        return int(np.argmax(np.asarray(features) @ weights))
+
+    def run_loop(duration):
+        source = SyntheticSource(96, 96, fps=0)
+        stats = LoopStats()
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            ret, img = source.read()
+            classify(prepare_features(img))
+            stats.record(source.timestamp)
+        return stats.summary()['fps']
+
+    baseline = run_loop(seconds)
+    profiler = SamplingProfiler("demo", interval_ms=interval_ms)
+    profiler.start(seconds)
+    profiled = run_loop(seconds)
+    profiler.wait()
+    print(f"Loop rate: {baseline:.0f} FPS unprofiled, {profiled:.0f} FPS while profiling "
+          f"({(1 - profiled / baseline) * 100:.1f}% slower)")
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Trigger an on-demand profile")
+    parser.add_argument("--pid", type=int, default=None,
+                        help="Send SIGUSR1 to this process")
+    parser.add_argument("--socket", type=str, default=None,
+                        help="Request a profile over this control socket and print it")
+    parser.add_argument("--seconds", type=float, default=None,
+                        help="Profile duration (default: the process's own default)")
+    parser.add_argument("--demo", action="store_true",
+                        help="Profile a synthetic-source loop in this process")
+    parser.add_argument("--interval-ms", type=float, default=5.0,
+                        help="Sampling interval for --demo (default: 5.0)")
+    return parser.parse_args()
+
+
+def main():
+    """Main application entry point"""
+    args = parse_arguments()
+    if args.demo:
+        demo(args.seconds or 3.0, args.interval_ms)
+    elif args.socket:
+        print(request_profile(args.socket, args.seconds), end="")
+    elif args.pid:
+        os.kill(args.pid, signal.SIGUSR1)
+        print(f"Sent SIGUSR1 to {args.pid}; the profile is printed by that process")
+    else:
+        print("Nothing to do, use --pid, --socket or --demo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Inference Service Load Test
+
+Open several connections to a running inference_service.py and keep a fixed
+number of requests in flight on each for a given duration. Reports
+requests/sec, latency percentiles and how many requests were rejected as BUSY,
+followed by the service's own statistics. A stream that gets BUSY backs off
+(exponentially, up to --max-backoff-ms) before its next request, so the test
+measures the service's backpressure rather than a retry storm.
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from inference_service import InferenceClient, STATUS_OK, STATUS_BUSY
+
+
+async def client_worker(args, frames, latencies, counters, stop_at, index):
+    """Keep `args.concurrency` requests in flight on one connection"""
+    client = await InferenceClient.connect(unix_path=args.unix, host=args.host, port=args.port)
+
+    async def stream(i):
+        # Start each stream at a different frame so they do not send in lockstep
+        backoff = 0.0
+        while time.perf_counter() < stop_at:
+            frame = frames[i % len(frames)]
+            i += 1
+            t_start = time.perf_counter()
+            status, _, _, _ = await client.classify(frame)
+            if status == STATUS_OK:
+                latencies.append(time.perf_counter() - t_start)
+                counters['ok'] += 1
+                backoff = 0.0
+            elif status == STATUS_BUSY:
+                counters['busy'] += 1
+                # Wait before retrying, longer while the service stays busy
+                backoff = min(max(backoff * 2, args.backoff_ms / 1000.0),
+                              args.max_backoff_ms / 1000.0)
+                counters['backoff_s'] += backoff
+                await asyncio.sleep(backoff)
+            else:
+                counters['failed'] += 1
+
+    try:
+        await asyncio.gather(*(stream((index * args.concurrency + k) * 7919)
+                               for k in range(args.concurrency)))
+    finally:
+        await client.close()
+
+
+async def run(args):
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 256, size=(args.distinct, args.height, args.width), dtype=np.uint8)
+    latencies = []
+    counters = {'ok': 0, 'busy': 0, 'failed': 0, 'backoff_s': 0.0}
+
+    t_start = time.perf_counter()
+    stop_at = t_start + args.duration
+    await asyncio.gather(*(client_worker(args, frames, latencies, counters, stop_at, c)
+                           for c in range(args.connections)))
+    elapsed = time.perf_counter() - t_start
+
+    print(f"\nLoad test: {args.connections} connections x {args.concurrency} in flight, "
+          f"{elapsed:.1f} s")
+    print(f"  Completed:    {counters['ok']}")
+    print(f"  Busy:         {counters['busy']} "
+          f"({counters['backoff_s']:.1f} s backing off across all streams)")
+    print(f"  Failed:       {counters['failed']}")
+    print(f"  Requests/sec: {counters['ok'] / elapsed:.1f}")
+    if latencies:
+        lat = np.array(latencies) * 1000.0
+        print(f"  Latency (ms): p50 {np.percentile(lat, 50):.2f} | "
+              f"p95 {np.percentile(lat, 95):.2f} | p99 {np.percentile(lat, 99):.2f} | "
+              f"max {lat.max():.2f}")
+
+    client = await InferenceClient.connect(unix_path=args.unix, host=args.host, port=args.port)
+    stats = await client.stats()
+    await client.close()
+    print("\nService stats:")
+    for key, value in stats.items():
+        print(f"  {key:<18} {value:.3f}" if isinstance(value, float) else f"  {key:<18} {value}")
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Inference service load generator")
+    parser.add_argument("--unix", type=str, default=None,
+                        help="Connect to this Unix socket instead of TCP")
+    parser.add_argument("--host", type=str, default="127.0.0.1",
+                        help="Service address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765,
+                        help="Service port (default: 8765)")
+    parser.add_argument("--connections", type=int, default=4,
+                        help="Number of client connections (default: 4)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Requests in flight per connection (default: 4)")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="Test duration in seconds (default: 10)")
+    parser.add_argument("--distinct", type=int, default=256,
+                        help="Number of distinct random frames to send (default: 256)")
+    parser.add_argument("--backoff-ms", type=float, default=1.0,
+                        help="First wait after a BUSY reply (default: 1)")
+    parser.add_argument("--max-backoff-ms", type=float, default=50.0,
+                        help="Longest wait after repeated BUSY replies (default: 50)")
+    parser.add_argument("--width", type=int, default=28,
+                        help="Frame width (default: 28)")
+    parser.add_argument("--height", type=int, default=28,
+                        help="Frame height (default: 28)")
+    return parser.parse_args()
+
+
+def main():
+    """Main application entry point"""
+    asyncio.run(run(parse_arguments()))
+
+
+if __name__ == "__main__":
+    main()
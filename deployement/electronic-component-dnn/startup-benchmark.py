@@ -0,0 +1,147 @@
+"""
+Startup Benchmark
+
+Measure time-to-first-prediction of the deployment scripts from a cold Python
+process. Each trial runs in a fresh interpreter and reports its startup
+timeline (imports, runner init, warm-up, first frame, first result).
+
+  sequential: import everything, init the runner, then start the camera
+  fast:       start camera and runner init concurrently, lazy imports, warm-up
+
+Use --test-source to replace the camera with GStreamer's videotestsrc.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Settings
+model_file = "modefied.eim"
+res_width = 96
+res_height = 96
+img_width = 28
+img_height = 28
+fps = 30
+
+
+def classify_first_frame(source, runner, timeline):
+    """Read one model-ready frame from the pipeline and classify it"""
+    import numpy as np
+
+    ret, img = source.read()
+    if not ret:
+        raise RuntimeError("Frame read error")
+    timeline.mark("first_frame")
+
+    features = (np.reshape(img, (img_width * img_height)) / 255.0).tolist()
+    runner.classify(features)
+    timeline.mark("first_result")
+
+
+def run_trial(args):
+    """Run one cold start in this process and print its timeline as JSON"""
+    from gst_pipeline import GstPipeline, ModelInputSpec
+    from startup import FastStartup, StartupTimeline
+
+    timeline = StartupTimeline(t0=args.t0)
+    pipeline = GstPipeline(ModelInputSpec(img_width, img_height, 'GRAY8'),
+                           source='test' if args.test_source else 'v4l2',
+                           capture_width=res_width, capture_height=res_height, fps=fps)
+    model_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), model_file)
+
+    if args.trial == "sequential":
+        import cv2  # noqa: F401
+        import numpy  # noqa: F401
+        from edge_impulse_linux.runner import ImpulseRunner
+        timeline.mark("imports_done")
+        runner = ImpulseRunner(model_path)
+        runner.init()
+        timeline.mark("runner_init")
+        source = pipeline.open()
+        timeline.mark("camera_started")
+        try:
+            classify_first_frame(source, runner, timeline)
+        finally:
+            source.release()
+            runner.stop()
+    else:
+        startup = FastStartup(model_path, pipeline.open,
+                              warmup_runs=args.warmup, timeline=timeline)
+        try:
+            startup.start()
+            import cv2  # noqa: F401
+            import numpy  # noqa: F401
+            timeline.mark("imports_done")
+            runner, _ = startup.wait_ready(feature_count=img_width * img_height)
+            classify_first_frame(startup.source, runner, timeline)
+        finally:
+            startup.stop()
+
+    print(json.dumps(timeline.as_dict()))
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Startup time benchmark")
+    parser.add_argument("--trials", type=int, default=5,
+                        help="Cold starts per mode (default: 5)")
+    parser.add_argument("--modes", nargs="+", default=["sequential", "fast"],
+                        choices=["sequential", "fast"],
+                        help="Startup modes to compare (default: both)")
+    parser.add_argument("--warmup", type=int, default=3,
+                        help="Warm-up classifications in fast mode (default: 3)")
+    parser.add_argument("--test-source", action="store_true",
+                        help="Use videotestsrc instead of /dev/video0")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Write all timelines to this JSON file")
+    parser.add_argument("--trial", choices=["sequential", "fast"],
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--t0", type=float, default=None,
+                        help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    """Main application entry point"""
+    args = parse_arguments()
+    if args.trial:
+        run_trial(args)
+        return
+
+    results = {}
+    for mode in args.modes:
+        results[mode] = []
+        for i in range(args.trials):
+            # perf_counter is CLOCK_MONOTONIC, so the child can measure from here
+            command = [sys.executable, os.path.realpath(__file__),
+                       "--trial", mode, "--warmup", str(args.warmup),
+                       "--t0", repr(time.perf_counter())]
+            if args.test_source:
+                command.append("--test-source")
+            out = subprocess.run(command, capture_output=True, text=True)
+            if out.returncode != 0:
+                print(f"{mode} trial {i + 1} failed:\n{out.stderr}")
+                continue
+            results[mode].append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print("\nTime to first prediction (ms):")
+    for mode, timelines in results.items():
+        ttfp = [t["first_result"] * 1000 for t in timelines]
+        if not ttfp:
+            print(f"  {mode:<12} no successful trials")
+            continue
+        print(f"  {mode:<12} median {statistics.median(ttfp):8.1f} | "
+              f"min {min(ttfp):8.1f} | max {max(ttfp):8.1f} | n={len(ttfp)}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Timelines saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Fast startup helpers for the deployment scripts
+
+Defers heavy imports (cv2, numpy, edge_impulse_linux) until they are first
+used, opens the camera while the model runner initializes in a
+background thread, runs a few warm-up classifications and only then reports
+the service as ready. Every step is recorded on a startup timeline so the
+time-to-first-prediction can be measured and compared.
+"""
+
+import importlib
+import json
+import os
+import threading
+import time
+
+# Reference point for the timeline, as close to interpreter start as we can get
+_T0 = time.perf_counter()
+
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def lazy_import(name):
+    """Return a proxy for module `name` that is imported when first used"""
+    return LazyModule(name)
+
+
+def preload(*modules):
+    """Force the import of lazily imported modules now"""
+    for module in modules:
+        if isinstance(module, LazyModule):
+            module._load()
+
+
+class StartupTimeline:
+    def __init__(self, t0=None):
+        """
+        Record named startup events relative to a common start time
+
+        Args:
+            t0: Reference time from time.perf_counter() (default: import time
+                of this module)
+        """
+        self.t0 = _T0 if t0 is None else t0
+        self.events = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        """Record event `name` now, overwriting any earlier value"""
+        with self._lock:
+            self.events[name] = time.perf_counter() - self.t0
+        return self.events[name]
+
+    def mark_once(self, name):
+        """Record event `name` only the first time it happens"""
+        with self._lock:
+            if name not in self.events:
+                self.events[name] = time.perf_counter() - self.t0
+            return self.events[name]
+
+    def as_dict(self):
+        """Events in seconds, ordered by time"""
+        with self._lock:
+            return dict(sorted(self.events.items(), key=lambda item: item[1]))
+
+    def report(self):
+        """Human-readable timeline, one event per line in milliseconds"""
+        lines = ["Startup timeline:"]
+        for name, t in self.as_dict().items():
+            lines.append(f"  {name:<16} {t * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+    def save(self, path):
+        """Write the timeline as JSON"""
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+
+class FastStartup:
+    def __init__(self, model_path, open_source=None,
+                 warmup_runs=3, ready_file=None, timeline=None):
+        """
+        Open the camera and initialize the model runner concurrently
+
+        Args:
+            model_path: Path to the Edge Impulse .eim model
+            open_source: Callable returning the frame source, e.g. a started
+                GStreamer pipeline (None when frames come from elsewhere,
+                e.g. a replayed session)
+            warmup_runs: Number of dummy classifications before reporting ready
+            ready_file: Readiness probe file, created once ready and removed on
+                stop (None to disable)
+            timeline: StartupTimeline to record into (a new one by default)
+        """
+        self.model_path = model_path
+        self.open_source = open_source
+        self.warmup_runs = warmup_runs
+        self.ready_file = ready_file
+        self.timeline = timeline if timeline is not None else StartupTimeline()
+        self.runner = None
+        self.model_info = None
+        self.source = None
+        self._init_thread = None
+        self._init_error = None
+
+    def _init_runner(self):
+        """Import the runner and load the model (runs in a background thread)"""
+        try:
+            from edge_impulse_linux.runner import ImpulseRunner
+            self.timeline.mark("runner_import")
+            self.runner = ImpulseRunner(self.model_path)
+            self.model_info = self.runner.init()
+            self.timeline.mark("runner_init")
+        except Exception as e:
+            self._init_error = e
+
+    def start(self):
+        """Kick off runner init in the background, then open the camera"""
+        self.timeline.mark("start")
+        self._init_thread = threading.Thread(target=self._init_runner, daemon=True)
+        self._init_thread.start()
+        if self.open_source is not None:
+            self.source = self.open_source()
+            self.timeline.mark("camera_started")
+        return self
+
+    def feature_count(self):
+        """Number of input features expected by the model"""
+        params = (self.model_info or {}).get('model_parameters', {})
+        return params.get('input_features_count', 0)
+
+    def wait_ready(self, feature_count=None, timeout=None):
+        """
+        Wait for runner init, run warm-up classifications and report ready
+
+        Args:
+            feature_count: Length of the dummy feature vector (default: taken
+                from the model parameters)
+            timeout: Maximum seconds to wait for runner init
+
+        Returns:
+            (runner, model_info) tuple
+        """
+        self._init_thread.join(timeout)
+        if self._init_thread.is_alive():
+            raise TimeoutError("Model runner did not initialize in time")
+        if self._init_error is not None:
+            raise RuntimeError(f"Could not initialize model: {self._init_error}")
+
+        if feature_count is None:
+            feature_count = self.feature_count()
+        dummy = [0.0] * feature_count
+        for _ in range(self.warmup_runs):
+            self.runner.classify(dummy)
+        self.timeline.mark("warmup_done")
+
+        if self.ready_file:
+            with open(self.ready_file, "w") as f:
+                f.write(f"{os.getpid()}\n")
+        self.timeline.mark("ready")
+        return self.runner, self.model_info
+
+    def stop(self):
+        """Stop the camera and runner and withdraw readiness"""
+        if self.ready_file and os.path.exists(self.ready_file):
+            os.remove(self.ready_file)
+        if self.source is not None:
+            self.source.release()
+        if self._init_thread is not None:
+            self._init_thread.join()
+        if self.runner is not None:
+            self.runner.stop()
@@ -0,0 +1,166 @@
+"""
+AdaptiveController tests with a fake temperature sensor, fake latencies and
+a simulated clock
+"""
+
+import json
+
+from adaptive_control import DEFAULT_LEVELS, AdaptiveController, ThermalSensor
+
+
+class FakeSensor:
+    def __init__(self, temperature=50.0):
+        self.temperature = temperature
+
+    def read(self):
+        return self.temperature
+
+
+class Clock:
+    """Frames at a fixed rate on a simulated clock"""
+
+    def __init__(self, fps=30.0):
+        self.now = 0.0
+        self.period = 1.0 / fps
+
+    def run(self, controller, seconds, latency, queue_depth=0):
+        """Report one frame per period; returns the levels after each change"""
+        levels = []
+        end = self.now + seconds
+        while self.now < end:
+            self.now += self.period
+            if controller.update(latency, queue_depth, now=self.now):
+                levels.append(controller.level)
+        return levels
+
+
+def make_controller(**options):
+    options.setdefault('thermal', FakeSensor())
+    return AdaptiveController(target_latency_ms=50.0, verbose=False, **options)
+
+
+def test_steps_down_while_the_slo_is_missed():
+    controller = make_controller()
+    clock = Clock()
+    assert clock.run(controller, 10.0, latency=0.010) == []
+
+    levels = clock.run(controller, 3.5, latency=0.080)
+    # One level per interval
+    assert len(levels) >= 3 and levels == list(range(1, len(levels) + 1))
+    times = [d['time'] for d in controller.decisions]
+    assert all(b - a >= controller.interval for a, b in zip(times, times[1:]))
+    assert all(d['reason'].startswith("latency p95") for d in controller.decisions)
+    assert controller.setting == DEFAULT_LEVELS[levels[-1]]
+
+
+def test_queue_backlog_acts_immediately():
+    controller = make_controller()
+    clock = Clock()
+    clock.run(controller, 0.5, latency=0.010)
+    # Within one interval of the first frame, so only the queue can trigger it
+    assert clock.run(controller, 0.1, latency=0.010, queue_depth=5) == [1]
+    assert controller.decisions[0]['reason'].startswith("queue depth")
+
+
+def upgrades_after_last_downgrade(controller):
+    """(time of the last step down, decisions stepping up after it)"""
+    last = max(i for i, d in enumerate(controller.decisions) if d['to_level'] > d['from_level'])
+    return controller.decisions[last]['time'], controller.decisions[last + 1:]
+
+
+def test_recovers_after_a_load_spike():
+    controller = make_controller()
+    clock = Clock()
+    clock.run(controller, 2.0, latency=0.010)
+    clock.run(controller, 2.5, latency=0.080)
+    assert controller.level >= 2
+    clock.run(controller, 20.0, latency=0.010)
+
+    # Back to the best level: the first step up upgrade_after_s after the
+    # last step down, then one level per interval
+    assert controller.level == 0
+    downgraded, upgrades = upgrades_after_last_downgrade(controller)
+    assert [d['from_level'] - d['to_level'] for d in upgrades] == [1] * len(upgrades)
+    assert upgrades[0]['time'] - downgraded >= controller.upgrade_after
+    assert upgrades[0]['time'] - downgraded < controller.upgrade_after + 2 * controller.interval
+    times = [d['time'] for d in upgrades]
+    assert all(b - a < 2 * controller.interval for a, b in zip(times, times[1:]))
+
+
+def test_failed_upgrade_waits_longer():
+    controller = make_controller()
+    clock = Clock()
+    clock.run(controller, 2.0, latency=0.010)
+    clock.run(controller, 1.5, latency=0.080)
+    # Run until the first step up
+    while controller.decisions[-1]['to_level'] >= controller.decisions[-1]['from_level']:
+        clock.run(controller, clock.period, latency=0.010)
+    level = controller.level
+
+    # The upgrade is undone at once: the next one waits twice as long
+    clock.run(controller, 1.5, latency=0.080)
+    assert controller.level > level
+    assert controller._hold == 2 * controller.upgrade_after
+    clock.run(controller, 20.0, latency=0.010)
+    downgraded, upgrades = upgrades_after_last_downgrade(controller)
+    assert upgrades[0]['time'] - downgraded >= 2 * controller.upgrade_after
+    assert controller.level == 0
+
+
+def test_temperature_steps_down_and_holds_until_cooled():
+    sensor = FakeSensor(78.0)
+    controller = make_controller(thermal=sensor)
+    clock = Clock()
+    levels = clock.run(controller, 1.5, latency=0.010)
+    assert levels == [1]
+    assert controller.temperature == 78.0
+
+    sensor.temperature = 83.0
+    assert clock.run(controller, 1.0, latency=0.010) == [3]
+
+    # Below temp_limit but within the hysteresis: no step up
+    sensor.temperature = 72.0
+    assert clock.run(controller, 10.0, latency=0.010) == []
+    sensor.temperature = 65.0
+    assert clock.run(controller, 10.0, latency=0.010)[0] == 2
+
+
+def test_missing_sensor_is_ignored(tmp_path):
+    assert ThermalSensor(path=str(tmp_path / "missing")).read() is None
+    controller = make_controller(thermal=ThermalSensor(path=str(tmp_path / "missing")))
+    assert Clock().run(controller, 5.0, latency=0.010) == []
+
+
+def test_thermal_sensor_finds_the_soc_zone(tmp_path):
+    for zone, kind, millidegrees in (("thermal_zone0", "battery", 30000),
+                                     ("thermal_zone1", "cpu-thermal", 61500)):
+        (tmp_path / zone).mkdir()
+        (tmp_path / zone / "type").write_text(kind + "\n")
+        (tmp_path / zone / "temp").write_text(f"{millidegrees}\n")
+    assert ThermalSensor(root=str(tmp_path)).read() == 61.5
+
+
+def test_reject_skips_unsupported_capture_modes(tmp_path):
+    log_file = tmp_path / "decisions.jsonl"
+    controller = make_controller(log_file=str(log_file))
+    clock = Clock()
+    clock.run(controller, 2.0, latency=0.010)
+    clock.run(controller, 2.5, latency=0.080)
+    refused = controller.setting
+    previous = controller.decisions[-1]['from_level']
+
+    # The camera refused the new mode: back to where it came from
+    setting = controller.reject(now=clock.now)
+    assert controller.level == previous and setting == DEFAULT_LEVELS[previous]
+    assert (refused.width, refused.height, refused.fps) in controller.unsupported
+
+    # Later steps down jump over every level using the refused mode
+    clock.run(controller, 3.0, latency=0.080)
+    used = {(d['setting']['width'], d['setting']['height'], d['setting']['fps'])
+            for d in controller.decisions[-3:]}
+    assert (refused.width, refused.height, refused.fps) not in used
+    assert controller.setting != refused
+
+    lines = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert len(lines) == len(controller.decisions)
+    assert any(line['reason'].endswith("not supported") for line in lines)
@@ -0,0 +1,52 @@
+"""
+Session recording and replay tests
+"""
+
+import numpy as np
+
+from frame_sources import ReplaySource, SessionReader, SessionRecorder
+
+
+def record(path, count, chunk_frames=8, shape=(6, 5)):
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 256, (count, *shape), dtype=np.uint8)
+    recorder = SessionRecorder(str(path), shape, chunk_frames=chunk_frames)
+    for i, frame in enumerate(frames):
+        recorder.write(frame, timestamp=i / 30.0)
+    recorder.close()
+    return frames
+
+
+def test_session_round_trip(tmp_path):
+    path = tmp_path / "session.bin"
+    frames = record(path, 20)
+    reader = SessionReader(str(path))
+    assert len(reader) == 20 and not reader.truncated
+    np.testing.assert_array_equal(np.stack([f for _, f in reader]), frames)
+    np.testing.assert_array_equal(reader.frame(13), frames[13])
+    reader.close()
+
+
+def test_truncated_session_keeps_complete_chunks(tmp_path):
+    path = tmp_path / "session.bin"
+    frames = record(path, 20, chunk_frames=8)
+    data = path.read_bytes()
+    chunk_bytes = 4 + 8 * (8 + 6 * 5)
+    header = len(data) - 2 * chunk_bytes - (4 + 4 * (8 + 6 * 5))
+
+    # Cut at every byte of the second chunk: only the first chunk survives
+    for cut in range(header + chunk_bytes, header + 2 * chunk_bytes):
+        path.write_bytes(data[:cut])
+        reader = SessionReader(str(path), use_mmap=False)
+        assert len(reader) == 8
+        assert reader.truncated == (cut > header + chunk_bytes)
+        np.testing.assert_array_equal(reader.frame(7), frames[7])
+        reader.close()
+
+    path.write_bytes(data[:header + 2 * chunk_bytes + 10])
+    source = ReplaySource(str(path), speed=0)
+    replayed = 0
+    while source.read()[0]:
+        replayed += 1
+    source.release()
+    assert replayed == 16
@@ -0,0 +1,182 @@
+"""
+StreamScheduler tests with synthetic and replayed sources standing in for
+cameras, classified by the null backend
+"""
+
+import numpy as np
+import pytest
+
+from frame_sources import ReplaySource, SessionRecorder, SyntheticSource
+from inference_service import NullBackend
+from multi_stream import StreamScheduler
+
+
+def synthetic(frames=None, seed=0):
+    """Unpaced 28x28 source, always ahead of the backend"""
+    return SyntheticSource(28, 28, fps=0, frames=frames, seed=seed)
+
+
+def check_accounting(stream):
+    """Every captured frame was classified, dropped or is still buffered"""
+    c = stream.counters
+    assert c['captured'] == c['inferred'] + c['dropped_buffer'] + c['dropped_stale'] \
+        + len(stream.buffer)
+
+
+class RecordingScheduler(StreamScheduler):
+    """Records, for every scheduling decision, the streams that had a frame waiting"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.decisions = []
+
+    def _select(self):
+        ready = {s.name for s in self.streams if s.buffer}
+        batch = super()._select()
+        for stream, _, _ in batch:
+            self.decisions.append((ready, stream.name))
+            ready = ready - {stream.name} if not stream.buffer else ready
+        return batch
+
+
+def test_round_robin_is_fair():
+    # Checked on the scheduler's decisions, not on throughput, so it holds
+    # however the capture threads are scheduled
+    scheduler = RecordingScheduler(NullBackend(delay_ms=1.0), 'round-robin')
+    streams = [scheduler.add_stream(f"cam{i}", synthetic(frames=30, seed=i), policy='block')
+               for i in range(3)]
+    scheduler.run(duration=30.0)
+
+    assert [s.counters['inferred'] for s in streams] == [30, 30, 30]
+    # A stream with a frame waiting is served before any other stream is
+    # served twice ('block' keeps a waiting frame until it is served)
+    served_while_waiting = {}
+    for ready, chosen in scheduler.decisions:
+        for name in ready - {chosen}:
+            counts = served_while_waiting.setdefault(name, {})
+            counts[chosen] = counts.get(chosen, 0) + 1
+            assert counts[chosen] <= 1, f"{chosen} served twice while {name} waited"
+        served_while_waiting.pop(chosen, None)
+        for name in list(served_while_waiting):
+            if name not in ready:
+                served_while_waiting.pop(name)
+    for stream in streams:
+        check_accounting(stream)
+
+
+def test_round_robin_batches_across_streams():
+    frames_per_call = []
+
+    class RecordingBackend(NullBackend):
+        def classify_batch(self, frames):
+            frames_per_call.append(len(frames))
+            return super().classify_batch(frames)
+
+    scheduler = StreamScheduler(RecordingBackend(delay_ms=1.0), 'round-robin', max_batch=4)
+    streams = [scheduler.add_stream(f"cam{i}", synthetic(frames=40, seed=i), policy='block')
+               for i in range(2)]
+    scheduler.run(duration=10.0)
+
+    assert max(frames_per_call) <= 4
+    assert sum(frames_per_call) == 80
+    assert [s.counters['inferred'] for s in streams] == [40, 40]
+
+
+@pytest.mark.parametrize("policy", ['drop-oldest', 'drop-newest', 'block'])
+def test_drop_policy_counts(policy):
+    frames = 60
+    timestamps = []
+    scheduler = StreamScheduler(NullBackend(delay_ms=5.0),
+                                on_result=lambda s, f, p, t: timestamps.append(t))
+    source = synthetic(frames=frames)
+    stream = scheduler.add_stream("cam", source, policy=policy, depth=2)
+    scheduler.run(duration=10.0)
+
+    c = stream.counters
+    assert c['captured'] == frames
+    check_accounting(stream)
+    assert len(stream.buffer) == 0
+    if policy == 'block':
+        assert c['dropped_buffer'] == 0
+        assert c['inferred'] == frames
+    else:
+        assert c['dropped_buffer'] > 0
+        assert c['inferred'] + c['dropped_buffer'] == frames
+    if policy == 'drop-oldest':
+        # The newest frame always stays buffered, so the last one is classified
+        assert timestamps[-1] == source.timestamp
+
+
+def test_stale_frames_are_dropped():
+    scheduler = StreamScheduler(NullBackend(delay_ms=5.0))
+    stream = scheduler.add_stream("cam", synthetic(frames=50), policy='block', depth=4,
+                                  max_age_ms=1.0)
+    scheduler.run(duration=10.0)
+
+    assert stream.counters['dropped_stale'] > 0
+    assert stream.counters['dropped_buffer'] == 0
+    check_accounting(stream)
+    # Dropping stale frames wakes the blocked capture thread
+    assert scheduler.summary()['elapsed_s'] < 5.0
+
+
+def test_deadline_scheduler_prefers_tight_deadlines():
+    scheduler = RecordingScheduler(NullBackend(delay_ms=1.0), 'deadline')
+    tight = scheduler.add_stream("tight", synthetic(frames=40, seed=0), policy='block',
+                                 deadline_ms=10.0)
+    relaxed = scheduler.add_stream("relaxed", synthetic(frames=40, seed=1), policy='block',
+                                   deadline_ms=1e6)
+    scheduler.run(duration=30.0)
+
+    assert tight.counters['inferred'] == relaxed.counters['inferred'] == 40
+    # Whenever both had a frame waiting, the tight deadline went first
+    contested = [chosen for ready, chosen in scheduler.decisions if len(ready) == 2]
+    assert contested and set(contested) == {"tight"}
+
+
+def test_replay_and_synthetic_streams(tmp_path):
+    session = tmp_path / "session.bin"
+    rng = np.random.default_rng(0)
+    recorder = SessionRecorder(str(session), (28, 28), chunk_frames=16)
+    for i in range(50):
+        recorder.write(rng.integers(0, 256, (28, 28), dtype=np.uint8), timestamp=i / 30.0)
+    recorder.close()
+
+    scheduler = StreamScheduler(NullBackend(delay_ms=1.0))
+    replay = scheduler.add_stream("replay", ReplaySource(str(session), speed=0), policy='block')
+    live = scheduler.add_stream("synthetic", synthetic(frames=30, seed=1), policy='block')
+    scheduler.run(duration=10.0)
+
+    assert replay.counters['inferred'] == 50
+    assert live.counters['inferred'] == 30
+
+    summary = scheduler.summary()
+    assert summary['batches'] == 80
+    for name, stream in (("replay", replay), ("synthetic", live)):
+        stats = summary['streams'][name]
+        assert stats['inferred'] == stream.counters['inferred']
+        assert stats['dropped_buffer'] == 0
+        assert stats['fps'] > 0
+        assert 'error' not in stats
+    report = scheduler.report()
+    assert "replay" in report and "synthetic" in report
+
+
+def test_capture_errors_are_reported():
+    class BrokenSource:
+        timestamp = None
+
+        def read(self):
+            raise OSError("device unplugged")
+
+        def release(self):
+            pass
+
+    scheduler = StreamScheduler(NullBackend())
+    scheduler.add_stream("broken", BrokenSource())
+    healthy = scheduler.add_stream("healthy", synthetic(frames=10), policy='block')
+    scheduler.run(duration=10.0)
+
+    summary = scheduler.summary()['streams']
+    assert "device unplugged" in summary['broken']['error']
+    assert healthy.counters['inferred'] == 10
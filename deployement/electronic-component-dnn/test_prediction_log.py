@@ -0,0 +1,87 @@
+"""
+PredictionLog tests: time range queries, input checks and writer errors
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from prediction_log import PredictionLog, PredictionLogReader
+
+LABELS = ['resistor', 'capacitor', 'diode']
+
+
+def write_log(directory, timestamps, segment_bytes=64 * 1024 * 1024):
+    rng = np.random.default_rng(0)
+    with PredictionLog(str(directory), LABELS, segment_bytes=segment_bytes) as log:
+        for timestamp in timestamps:
+            log.log(rng.dirichlet(np.ones(len(LABELS))), timestamp=timestamp)
+
+
+def test_query_time_range_across_segments(tmp_path):
+    timestamps = np.arange(1000.0, 1100.0, 0.5)
+    # Small segments, so the range spans several files
+    write_log(tmp_path, timestamps, segment_bytes=1024)
+
+    with PredictionLogReader(str(tmp_path)) as reader:
+        assert len(reader.paths) > 2
+        assert len(reader) == len(timestamps)
+        assert reader.time_range() == (1000.0, 1099.5)
+        records = reader.query(1010.0, 1020.0)
+        np.testing.assert_array_equal(records['timestamp'], np.arange(1010.0, 1020.0, 0.5))
+        assert len(reader.query(2000.0)) == 0
+
+
+def test_query_after_clock_steps_back(tmp_path):
+    # NTP corrects the clock by 30 s in the middle of the session
+    timestamps = [1000.0, 1001.0, 1002.0, 1003.0, 975.0, 976.0, 977.0, 1004.0]
+    write_log(tmp_path, timestamps)
+
+    with PredictionLogReader(str(tmp_path)) as reader:
+        assert reader.time_range() == (975.0, 1004.0)
+        assert sorted(reader.query(976.0, 1002.0)['timestamp']) == \
+            [976.0, 977.0, 1000.0, 1001.0]
+        assert list(reader.query(1003.0)['timestamp']) == [1003.0, 1004.0]
+        assert list(reader.query(None, 976.0)['timestamp']) == [975.0]
+
+
+def test_log_rejects_bad_predictions(tmp_path):
+    with PredictionLog(str(tmp_path), LABELS) as log:
+        with pytest.raises(ValueError, match="Expected 3 probabilities"):
+            log.log([0.5, 0.5])
+        with pytest.raises(ValueError, match="out of range"):
+            log.log([0.2, 0.3, 0.5], label=3)
+
+
+def test_writer_keeps_working_after_rejected_prediction(tmp_path):
+    with PredictionLog(str(tmp_path), LABELS, flush_interval=0.01) as log:
+        log.log([0.2, 0.3, 0.5], timestamp=1.0)
+        with pytest.raises(ValueError):
+            log.log([0.5, 0.5], timestamp=2.0)
+        log.flush()
+        time.sleep(0.1)
+        log.log([0.6, 0.3, 0.1], timestamp=3.0)
+
+    with PredictionLogReader(str(tmp_path)) as reader:
+        records = reader.query()
+        assert list(records['timestamp']) == [1.0, 3.0]
+        assert list(records['label']) == [2, 0]
+
+
+def test_writer_errors_reach_the_caller(tmp_path, monkeypatch):
+    log = PredictionLog(str(tmp_path), LABELS, flush_interval=0.01)
+
+    def disk_full(records):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(log, '_write', disk_full)
+    log.log([0.2, 0.3, 0.5])
+    deadline = time.monotonic() + 5.0
+    while log._error is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    with pytest.raises(RuntimeError, match="No space left"):
+        log.log([0.2, 0.3, 0.5])
+    with pytest.raises(RuntimeError, match="No space left"):
+        log.close()
@@ -0,0 +1,143 @@
+"""
+SamplingProfiler tests on a synthetic-source capture loop
+"""
+
+import os
+import signal
+import socket
+import threading
+import time
+
+import numpy as np
+
+from frame_sources import SyntheticSource
+from sampling_profiler import SamplingProfiler, install, request_profile
+
+# Sampler CPU time allowed, as a fraction of one core
+OVERHEAD_BUDGET = 0.05
+
+
+def hot_preprocess(frame):
+    """Deliberately slow per-frame work the profile must point at"""
+    total = 0
+    for row in frame[::2]:
+        total += int(row.sum())
+    return np.sqrt(frame.astype(np.float32)).mean() + total
+
+
+def capture_loop(duration):
+    """Synthetic-source loop like the live scripts; returns frames per second"""
+    source = SyntheticSource(96, 96, fps=0)
+    frames = 0
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        ret, frame = source.read()
+        hot_preprocess(frame)
+        frames += 1
+    return frames / duration
+
+
+def read_collapsed(path):
+    stacks = {}
+    with open(path) as f:
+        for line in f:
+            stack, count = line.rsplit(' ', 1)
+            stacks[stack] = int(count)
+    return stacks
+
+
+def test_profile_finds_hot_function(tmp_path):
+    baseline = capture_loop(1.0)
+    profiler = SamplingProfiler("test", output_dir=str(tmp_path), interval_ms=2.0)
+    assert profiler.start(1.0)
+    profiled = capture_loop(1.0)
+    result = profiler.wait(10.0)
+
+    assert result is not None and result['samples'] > 100
+    assert os.path.exists(result['collapsed']) and os.path.exists(result['top'])
+
+    stacks = read_collapsed(result['collapsed'])
+    total = sum(stacks.values())
+    hot = {stack: count for stack, count in stacks.items() if 'hot_preprocess (' in stack}
+    # Most of the loop runs in hot_preprocess, reached through capture_loop
+    assert sum(hot.values()) / total > 0.5
+    assert all('capture_loop (' in stack for stack in hot)
+
+    with open(result['top']) as f:
+        assert 'hot_preprocess' in f.read()
+
+    assert result['overhead'] < OVERHEAD_BUDGET
+    assert profiled > 0.75 * baseline
+
+
+def test_profile_over_control_socket(tmp_path):
+    path = str(tmp_path / "profile.sock")
+    profiler = SamplingProfiler("socket", output_dir=str(tmp_path), interval_ms=2.0)
+    profiler.serve(path, default_seconds=0.3)
+    try:
+        assert profiler._command(['status'], 0.3) == "idle\n"
+        assert "unknown command" in profiler._command(['bogus'], 0.3)
+        # The socket blocks until the profile is written, so run it from a
+        # thread while the main thread keeps the loop busy
+        replies = []
+        thread = threading.Thread(target=lambda: replies.append(request_profile(path, 0.5)))
+        thread.start()
+        capture_loop(1.0)
+        thread.join(10.0)
+        assert replies and replies[0].startswith("Profile of socket")
+        assert "hot_preprocess" in replies[0]
+    finally:
+        profiler.close()
+    assert not os.path.exists(path)
+
+
+def test_signal_starts_profile(tmp_path):
+    previous = signal.getsignal(signal.SIGUSR1)
+    try:
+        profiler = install("signal", seconds=0.3, socket_path=None,
+                           output_dir=str(tmp_path), interval_ms=2.0)
+        os.kill(os.getpid(), signal.SIGUSR1)
+        capture_loop(0.5)
+        result = profiler.wait(10.0)
+        assert result is not None and result['samples'] > 0
+        assert os.path.dirname(result['collapsed']) == str(tmp_path)
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
+
+
+def test_failed_profile_is_reported_over_socket(tmp_path):
+    # A file where the output directory should be makes writing fail
+    blocked = tmp_path / "not-a-directory"
+    blocked.write_text("")
+    path = str(tmp_path / "profile.sock")
+    profiler = SamplingProfiler("failing", output_dir=str(blocked), interval_ms=2.0)
+    profiler.serve(path)
+    try:
+        assert request_profile(path, 0.1).startswith("profile failed:")
+        assert profiler.wait(1.0) is None and profiler.error is not None
+        # The control thread is still serving
+        assert profiler._command(['status'], 0.1) == "idle\n"
+        assert request_profile(path, 0.1).startswith("profile failed:")
+    finally:
+        profiler.close()
+
+
+def test_serve_does_not_take_a_live_socket(tmp_path):
+    path = str(tmp_path / "profile.sock")
+    first = SamplingProfiler("first", output_dir=str(tmp_path))
+    first.serve(path)
+    try:
+        second = install("second", socket_path=path, signum=None, output_dir=str(tmp_path))
+        assert getattr(second, '_server', None) is None
+        assert os.path.exists(path)
+    finally:
+        first.close()
+
+    # A socket file left behind by an exited process is replaced
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    third = SamplingProfiler("third", output_dir=str(tmp_path))
+    third.serve(path)
+    third.close()
+    assert not os.path.exists(path)
@@ -0,0 +1,20 @@
+"""
+Startup tests: the helpers the live script imports before opening the camera
+must not import numpy (or cv2) themselves
+"""
+
+import os
+import subprocess
+import sys
+
+# Imported by dnn-live-inference-pi-camera.py before the camera is opened
+LIVE_SCRIPT_MODULES = ['adaptive_control', 'frame_sources', 'gst_pipeline', 'prediction_log',
+                       'sampling_profiler', 'startup']
+
+
+def test_live_script_imports_defer_numpy():
+    code = (f"import sys; import {', '.join(LIVE_SCRIPT_MODULES)}; "
+            "print(sorted(m for m in ('numpy', 'cv2') if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    assert result.stdout.strip() == "[]"